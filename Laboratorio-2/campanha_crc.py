@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""
+Campanha de injeção de erros em CRCs.
+
+Na Parte 4 do notebook cada teste monta o quadro corrompido com injetar_erro e
+recalcula o CRC do quadro inteiro. Como o CRC é linear, isso não é necessário:
+um erro E(x) passa despercebido exatamente quando E(x) mod G(x) = 0, seja qual
+for a mensagem (o valor inicial, o XOR final e a reflexão não mudam essa
+condição). Esse resto (a síndrome do erro) é o XOR de x^i mod G(x) para cada bit
+i invertido, valores calculados uma vez por quadro. Assim milhões de padrões são
+testados em lote com NumPy, sem montar quadros, e os lotes são divididos entre
+processos.
+
+Para cada gerador são testados:
+    - rajadas de cada tamanho: primeiro e último bits invertidos, os do meio
+      quaisquer, em qualquer posição do quadro;
+    - erros de k bits em posições quaisquer.
+Cada caso é enumerado por completo quando tem até --exhaustive-limit padrões, e
+amostrado (--samples padrões aleatórios) quando tem mais.
+
+Uso:
+    python campanha_crc.py --crc ccitt-false,modbus --bursts 1-20 --bits 2,3,4
+    python campanha_crc.py --crc 10011 --message-bytes 2 --bursts 1-8 --output campanha.json
+"""
+import json
+import math
+import os
+import platform
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from crc_rapido import CRC8, CRC16_CCITT_FALSE, CRC16_MODBUS, CRC16_XMODEM, CRC32
+
+GENERATORS = {
+    'crc8': CRC8,
+    'ccitt-false': CRC16_CCITT_FALSE,
+    'xmodem': CRC16_XMODEM,
+    'modbus': CRC16_MODBUS,
+    'crc32': CRC32,
+}
+
+# Padrões testados por lote: cada lote usa alguns arrays desse tamanho
+BATCH = 1 << 16
+# Padrões por tarefa enviada a um processo
+TASK_PATTERNS = 1 << 22
+# Maior rajada aceita: os bits do meio de cada rajada cabem em um uint64
+MAX_BURST = 64
+
+
+def parse_generator(name):
+    """
+    Converte o nome de um gerador conhecido ou uma string de bits (ex: '10011',
+    como no notebook) na tupla (largura, polinômio sem o bit mais alto).
+    """
+    if name in GENERATORS:
+        config = GENERATORS[name]
+        return config.width, config.polynomial
+    if len(name) >= 2 and set(name) <= {'0', '1'} and name[0] == '1':
+        width = len(name) - 1
+        return width, int(name, 2) & ((1 << width) - 1)
+    raise ValueError(f"Gerador desconhecido: {name!r} (use {', '.join(GENERATORS)} ou uma string de bits)")
+
+
+def position_syndromes(width, polynomial, n_bits):
+    """
+    Calcula x^i mod G(x) para cada posição i do quadro (bit 0 = último bit transmitido).
+
+    Returns:
+        Array uint64 com n_bits síndromes.
+    """
+    if width > 64:
+        raise ValueError("Geradores de até 64 bits")
+    syndromes = np.empty(n_bits, dtype=np.uint64)
+    top = 1 << width
+    value = 1
+    for i in range(n_bits):
+        syndromes[i] = value
+        value <<= 1
+        if value & top:
+            value ^= top | polynomial
+    return syndromes
+
+
+def burst_count(length, n_bits):
+    """Número de rajadas distintas com exatamente `length` bits em um quadro de n_bits."""
+    if length > n_bits:
+        return 0
+    return (n_bits - length + 1) * (1 << max(0, length - 2))
+
+
+def burst_syndromes(syndromes, starts, middles, length):
+    """
+    Síndromes de um lote de rajadas.
+
+    Args:
+        syndromes: Resultado de position_syndromes.
+        starts: Posição do bit menos significativo de cada rajada.
+        middles: Bits do meio de cada rajada (length - 2 bits).
+        length: Tamanho das rajadas.
+    """
+    result = syndromes[starts].copy()
+    if length >= 2:
+        result ^= syndromes[starts + (length - 1)]
+    for j in range(length - 2):
+        bit = ((middles >> np.uint64(j)) & np.uint64(1)).astype(bool)
+        result ^= np.where(bit, syndromes[starts + (j + 1)], np.uint64(0))
+    return result
+
+
+def bits_syndromes(syndromes, positions):
+    """Síndromes de um lote de erros de k bits (positions: array N x k de posições distintas)."""
+    return np.bitwise_xor.reduce(syndromes[positions], axis=1)
+
+
+def unrank_combinations(ranks, n_bits, size):
+    """
+    Erros de `size` bits a partir dos seus números de ordem, sem enumerar os anteriores.
+
+    Usa a ordem colexicográfica (o sistema numérico combinatório): a combinação
+    c_size > ... > c_1 tem número de ordem soma(comb(c_i, i)). Cada c_i é o maior
+    c com comb(c, i) <= o que resta do número, encontrado por busca binária numa
+    tabela de comb(c, i), para o lote inteiro de uma vez. Assim cada tarefa
+    começa direto no seu primeiro padrão.
+
+    Args:
+        ranks: Array int64 de números de ordem, menores que comb(n_bits, size).
+        n_bits: Tamanho do quadro.
+        size: Número de bits de cada erro.
+
+    Returns:
+        Array N x size de posições distintas.
+    """
+    remaining = np.asarray(ranks, dtype=np.int64).copy()
+    limit = math.comb(n_bits, size)
+    positions = np.empty((len(remaining), size), dtype=np.int64)
+    for i in range(size, 0, -1):
+        # comb(c, i) cresce com c; valores acima do total nunca são escolhidos e
+        # são limitados a ele para caber em int64
+        table = np.array([min(math.comb(c, i), limit) for c in range(n_bits)], dtype=np.int64)
+        chosen = np.searchsorted(table, remaining, side='right') - 1
+        positions[:, i - 1] = chosen
+        remaining -= table[chosen]
+    return positions
+
+
+def _burst_pattern(start, middle, length):
+    """Padrão de uma rajada como inteiro (bit i = posição i do quadro)."""
+    if length == 1:
+        return 1 << start
+    return ((1 << (length - 1)) | (middle << 1) | 1) << start
+
+
+def _run_task(task):
+    """
+    Executa uma tarefa da campanha (em um processo do pool).
+
+    Returns:
+        (padrões testados, padrões não detectados, exemplo de padrão não detectado ou None).
+    """
+    kind, width, polynomial, n_bits, size, first, count, seed = task
+    syndromes = position_syndromes(width, polynomial, n_bits)
+    rng = np.random.default_rng(seed)
+    tested = undetected = 0
+    example = None
+
+    if kind == 'rajada':
+        middle_bits = max(0, size - 2)
+        exhaustive = seed is None
+        for offset in range(0, count, BATCH):
+            n = min(BATCH, count - offset)
+            if exhaustive:
+                index = np.arange(first + offset, first + offset + n, dtype=np.uint64)
+                starts = (index >> np.uint64(middle_bits)).astype(np.int64)
+                middles = index & np.uint64((1 << middle_bits) - 1)
+            else:
+                starts = rng.integers(0, n_bits - size + 1, n)
+                middles = rng.integers(0, 1 << middle_bits, n, dtype=np.uint64, endpoint=False) \
+                    if middle_bits else np.zeros(n, dtype=np.uint64)
+            missed = np.flatnonzero(burst_syndromes(syndromes, starts, middles, size) == 0)
+            tested += n
+            undetected += len(missed)
+            if example is None and len(missed):
+                example = _burst_pattern(int(starts[missed[0]]), int(middles[missed[0]]), size)
+    else:
+        for offset in range(0, count, BATCH):
+            n = min(BATCH, count - offset)
+            if seed is None:
+                positions = unrank_combinations(
+                    np.arange(first + offset, first + offset + n, dtype=np.int64), n_bits, size
+                )
+            else:
+                positions = rng.integers(0, n_bits, (n, size))
+                # Descarta as linhas com posições repetidas (raras em quadros grandes)
+                ordered = np.sort(positions, axis=1)
+                positions = positions[(np.diff(ordered, axis=1) > 0).all(axis=1)]
+            missed = np.flatnonzero(bits_syndromes(syndromes, positions) == 0)
+            tested += len(positions)
+            undetected += len(missed)
+            if example is None and len(missed):
+                example = sum(1 << int(i) for i in positions[missed[0]])
+    return tested, undetected, example
+
+
+def expected_burst_rate(length, width):
+    """Fração de rajadas não detectadas prevista pela teoria para um gerador de grau `width` com termo x^0."""
+    if length <= width:
+        return 0.0
+    if length == width + 1:
+        return 2.0 ** -(width - 1)
+    return 2.0 ** -width
+
+
+def plan_case(kind, width, polynomial, n_bits, size, samples, exhaustive_limit, seed):
+    """
+    Divide um caso (tipo de erro e tamanho) em tarefas.
+
+    Returns:
+        (lista de tarefas, True se o caso é enumerado por completo).
+    """
+    total = burst_count(size, n_bits) if kind == 'rajada' else math.comb(n_bits, size)
+    exhaustive = total <= exhaustive_limit
+    count = total if exhaustive else samples
+    tasks = []
+    for index, first in enumerate(range(0, count, TASK_PATTERNS)):
+        n = min(TASK_PATTERNS, count - first)
+        task_seed = None if exhaustive else [seed, width, polynomial, size, index, int(kind == 'rajada')]
+        tasks.append((kind, width, polynomial, n_bits, size, first, n, task_seed))
+    return tasks, exhaustive
+
+
+def run_campaign(generators, message_bytes, bursts, bits, samples, exhaustive_limit, workers, seed):
+    """
+    Executa a campanha e imprime uma linha por caso.
+
+    Returns:
+        Lista de resultados (um dicionário por gerador, tipo de erro e tamanho).
+    """
+    results = []
+    print(f"{'gerador':<12} {'tipo':<7} {'tam':>4} {'modo':<8} {'testados':>12} {'não det.':>10} "
+          f"{'taxa':>11} {'teórica':>11} {'padrões/s':>11}")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for name in generators:
+            width, polynomial = parse_generator(name)
+            n_bits = 8 * message_bytes + width
+            cases = [('rajada', size) for size in bursts if size <= n_bits] + \
+                    [('bits', size) for size in bits if size <= n_bits]
+            for kind, size in cases:
+                tasks, exhaustive = plan_case(kind, width, polynomial, n_bits, size, samples, exhaustive_limit, seed)
+                started = time.perf_counter()
+                tested = undetected = 0
+                example = None
+                for task_tested, task_undetected, task_example in pool.map(_run_task, tasks):
+                    tested += task_tested
+                    undetected += task_undetected
+                    if example is None:
+                        example = task_example
+                elapsed = time.perf_counter() - started
+
+                rate = undetected / tested if tested else 0.0
+                expected = expected_burst_rate(size, width) if kind == 'rajada' else None
+                result = {
+                    'generator': name,
+                    'width': width,
+                    'polynomial': hex(polynomial),
+                    'frame_bits': n_bits,
+                    'kind': kind,
+                    'size': size,
+                    'exhaustive': exhaustive,
+                    'tested': tested,
+                    'undetected': undetected,
+                    'rate': rate,
+                    'expected_rate': expected,
+                    'example': None if example is None else format(example, f'0{n_bits}b'),
+                    'seconds': elapsed,
+                }
+                results.append(result)
+                print(f"{name:<12} {kind:<7} {size:>4} {'completo' if exhaustive else 'amostra':<8} {tested:>12} "
+                      f"{undetected:>10} {rate:>11.3e} {'-' if expected is None else f'{expected:.3e}':>11} "
+                      f"{tested / elapsed if elapsed else 0:>11.3g}", flush=True)
+    return results
+
+
+def parse_sizes(text):
+    """Converte '1-16,20,24' em [1, ..., 16, 20, 24]."""
+    sizes = []
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            low, high = part.split('-')
+            sizes.extend(range(int(low), int(high) + 1))
+        else:
+            sizes.append(int(part))
+    return sizes
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="Campanha de injeção de erros em CRCs (taxa de erros não detectados)")
+    parser.add_argument('--crc', default='ccitt-false,modbus', help=f"Geradores, separados por vírgula ({', '.join(GENERATORS)} ou string de bits, ex: 10011).")
+    parser.add_argument('--message-bytes', type=int, default=24, help="Tamanho da mensagem em bytes; o quadro tem também os bits do CRC (padrão: MENSAGEM_BASE do notebook).")
+    parser.add_argument('--bursts', default='1-24', help="Tamanhos das rajadas, ex: 1-24 ou 16,17,18 (vazio para não testar).")
+    parser.add_argument('--bits', default='2,3,4,5', help="Números de bits invertidos em posições quaisquer, ex: 2,3,4 (vazio para não testar).")
+    parser.add_argument('--samples', type=int, default=1_000_000, help="Padrões aleatórios por caso quando a enumeração completa passa do limite.")
+    parser.add_argument('--exhaustive-limit', type=int, default=20_000_000, help="Casos com até este número de padrões são enumerados por completo.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Número de processos.")
+    parser.add_argument('--seed', type=int, default=1, help="Semente das amostras aleatórias.")
+    parser.add_argument('--output', help="Grava os resultados em JSON.")
+    args = parser.parse_args()
+
+    generators = [name.strip() for name in args.crc.split(',') if name.strip()]
+    bursts = parse_sizes(args.bursts)
+    if any(not 1 <= size <= MAX_BURST for size in bursts):
+        parser.error(f"rajadas devem ter de 1 a {MAX_BURST} bits")
+    try:
+        for name in generators:
+            parse_generator(name)
+    except ValueError as e:
+        parser.error(str(e))
+
+    started = time.perf_counter()
+    results = run_campaign(generators, args.message_bytes, bursts, parse_sizes(args.bits),
+                           args.samples, args.exhaustive_limit, args.workers, args.seed)
+    total = sum(result['tested'] for result in results)
+    print(f"\n{total} padrões testados em {time.perf_counter() - started:.1f}s com {args.workers} processo(s)")
+
+    if args.output:
+        meta = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parameters': {key: value for key, value in vars(args).items() if key != 'output'}
+        }
+        with open(args.output, mode='w') as outfile:
+            json.dump({'meta': meta, 'results': results}, outfile, indent=2)
+        print(f"Resultados gravados em {args.output}")
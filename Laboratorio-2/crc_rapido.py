@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""
+CRC por tabela, operando direto sobre bytes.
+
+Alternativa à implementação com strings de '0'/'1' do notebook do Laboratório 2
+(calcular_crc_manual): em vez de uma divisão polinomial bit a bit, os bytes da
+mensagem são processados com tabelas de 256 entradas calculadas uma única vez por
+configuração. Com NumPy instalado, mensagens grandes são divididas em várias
+partes processadas em paralelo e encadeadas no final. Aceita qualquer configuração no
+formato do `crc.Configuration` (largura, polinômio, valor inicial, XOR final e
+reflexão da entrada e da saída) e cálculo incremental com update(), para
+mensagens que chegam em partes.
+
+Os padrões que o Python já implementa em C (CRC-16 com polinômio 0x1021 sem
+reflexão, como o CRC-16/CCITT-FALSE, via binascii.crc_hqx, e CRC-32 com
+polinômio 0x04C11DB7 refletido, via zlib.crc32) usam a versão nativa, com
+qualquer valor inicial e XOR final.
+
+Uso:
+    from crc_rapido import CRC16_CCITT_FALSE, CrcEngine, crc_bits
+
+    engine = CrcEngine(CRC16_CCITT_FALSE)
+    engine.checksum(b'123456789')        # 0x29b1
+
+    stream = engine.new()
+    for parte in partes:
+        stream.update(parte)
+    stream.value
+
+    crc_bits("1101011111", "10011")      # '0010', como calcular_crc_manual
+"""
+import binascii
+import functools
+import zlib
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:
+    # NumPy é opcional: sem ele, as mensagens são sempre processadas byte a byte
+    np = None
+
+# Mesmos campos do crc.Configuration: objetos da biblioteca crc também são aceitos
+Configuration = namedtuple(
+    'Configuration',
+    'width polynomial init_value final_xor_value reverse_input reverse_output',
+    defaults=(0, 0, False, False)
+)
+
+CRC8 = Configuration(8, 0x07)
+CRC16_CCITT_FALSE = Configuration(16, 0x1021, 0xFFFF)
+CRC16_XMODEM = Configuration(16, 0x1021)
+CRC16_MODBUS = Configuration(16, 0x8005, 0xFFFF, 0x0000, True, True)
+CRC32 = Configuration(32, 0x04C11DB7, 0xFFFFFFFF, 0xFFFFFFFF, True, True)
+
+# Com NumPy, mensagens a partir deste tamanho são divididas em LANES partes,
+# processadas em paralelo (veja CrcEngine._update_lanes)
+LANES = 4096
+LANES_MIN_BYTES = 256 * 1024
+
+
+def reflect(value, width):
+    """
+    Inverte a ordem dos `width` bits menos significativos de um valor.
+
+    Args:
+        value: O valor a ser refletido.
+        width: O número de bits considerados.
+
+    Returns:
+        O valor com os bits na ordem inversa.
+    """
+    result = 0
+    for _ in range(width):
+        result = (result << 1) | (value & 1)
+        value >>= 1
+    return result
+
+
+class CrcEngine:
+    """
+    Calculadora de CRC para uma configuração fixa.
+
+    As tabelas são montadas no construtor. Sem reflexão, o registrador é alinhado
+    à esquerda num múltiplo de 8 bits (registered_width), o que permite larguras
+    menores que um byte, como o gerador 10011 dos slides. Com reflexão de
+    entrada o registrador é guardado refletido e a tabela usa o polinômio
+    refletido, como no CRC-32 e no CRC-16/MODBUS.
+    """
+
+    def __init__(self, config, native=True):
+        """
+        Args:
+            config: Configuration (ou crc.Configuration) com a largura, o polinômio,
+                    o valor inicial, o XOR final e a reflexão da entrada e da saída.
+            native: Se True, usa binascii/zlib nas configurações que eles suportam.
+        """
+        self.width = config.width
+        self.polynomial = config.polynomial
+        self.init_value = config.init_value
+        self.final_xor_value = config.final_xor_value
+        self.reverse_input = bool(config.reverse_input)
+        self.reverse_output = bool(config.reverse_output)
+        if self.width < 1:
+            raise ValueError("A largura do CRC deve ser de pelo menos 1 bit")
+
+        self._mask = (1 << self.width) - 1
+        if self.reverse_input:
+            self._register_width = self.width
+            self._shift = 0
+        else:
+            self._register_width = max(8, -(-self.width // 8) * 8)
+            self._shift = self._register_width - self.width
+
+        self._table = self._build_table()
+        self._native = self._native_update() if native else None
+
+    def _build_table(self):
+        """Monta a tabela de 256 entradas: o efeito de cada byte sobre o registrador zerado."""
+        register_mask = (1 << self._register_width) - 1
+        table = []
+        if self.reverse_input:
+            polynomial = reflect(self.polynomial & self._mask, self.width)
+            for byte in range(256):
+                register = byte
+                for _ in range(8):
+                    register = (register >> 1) ^ polynomial if register & 1 else register >> 1
+                table.append(register)
+        else:
+            polynomial = (self.polynomial & self._mask) << self._shift
+            top = 1 << (self._register_width - 1)
+            for byte in range(256):
+                register = byte << (self._register_width - 8)
+                for _ in range(8):
+                    register = ((register << 1) ^ polynomial if register & top else register << 1) & register_mask
+                table.append(register)
+        return table
+
+    def _native_update(self):
+        """Retorna a função nativa equivalente a _update para esta configuração, se houver."""
+        if not self.reverse_input and self.width == 16 and self.polynomial == 0x1021:
+            return binascii.crc_hqx
+        if self.reverse_input and self.width == 32 and self.polynomial == 0x04C11DB7:
+            # zlib.crc32 recebe e devolve o registrador com o XOR de 0xFFFFFFFF
+            return lambda data, register: zlib.crc32(data, register ^ 0xFFFFFFFF) ^ 0xFFFFFFFF
+        return None
+
+    @property
+    def initial_register(self):
+        """Valor do registrador antes do primeiro byte."""
+        init = self.init_value & self._mask
+        return reflect(init, self.width) if self.reverse_input else init << self._shift
+
+    def update(self, register, data):
+        """
+        Processa bytes a partir de um valor do registrador.
+
+        Args:
+            register: O registrador atual (initial_register no início da mensagem).
+            data: bytes, bytearray ou memoryview.
+
+        Returns:
+            O novo valor do registrador.
+        """
+        if self._native is not None:
+            return self._native(data, register)
+
+        view = memoryview(data).cast('B')
+        start = 0
+        if np is not None and len(view) >= LANES_MIN_BYTES and self._register_width <= 64:
+            register, start = self._update_lanes(register, view)
+
+        table = self._table
+        if self.reverse_input:
+            for byte in view[start:]:
+                register = (register >> 8) ^ table[(register ^ byte) & 0xFF]
+        else:
+            high = self._register_width - 8
+            register_mask = (1 << self._register_width) - 1
+            for byte in view[start:]:
+                register = ((register << 8) & register_mask) ^ table[(register >> high) ^ byte]
+        return register
+
+    def _update_lanes(self, register, view):
+        """
+        Processa a mensagem em LANES partes de mesmo tamanho ao mesmo tempo, com NumPy.
+
+        O CRC é linear: processar uma parte a partir do registrador R dá o mesmo que
+        avançar R sobre bytes zero (A(R)) e fazer o XOR com o resultado da parte a
+        partir do registrador zerado. Cada coluna do array é uma parte, e todas
+        avançam um byte por iteração com a mesma tabela. Colunas extras, com bytes
+        zero e um único bit ligado no registrador, calculam A sobre cada bit; com
+        elas as partes são encadeadas no final.
+
+        Returns:
+            (novo registrador, número de bytes processados).
+        """
+        length = len(view) // LANES
+        n_bits = self._register_width
+        columns = np.zeros((length, LANES + n_bits), dtype=np.uint8)
+        columns[:, :LANES] = np.frombuffer(view[:length * LANES], dtype=np.uint8).reshape(LANES, length).T
+
+        registers = np.zeros(LANES + n_bits, dtype=np.uint64)
+        registers[LANES:] = np.left_shift(np.uint64(1), np.arange(n_bits, dtype=np.uint64))
+        table = np.array(self._table, dtype=np.uint64)
+        eight = np.uint64(8)
+        if self.reverse_input:
+            for row in columns:
+                registers = (registers >> eight) ^ table[(registers ^ row) & np.uint64(0xFF)]
+        else:
+            high = np.uint64(n_bits - 8)
+            register_mask = np.uint64((1 << n_bits) - 1)
+            for row in columns:
+                registers = ((registers << eight) & register_mask) ^ table[(registers >> high) ^ row]
+
+        # Tabelas por byte do registrador para A: A(R) = XOR de advance[j][byte j de R].
+        # O último byte pode ter menos de 8 bits (ex: CRC-5 refletido), e a tabela
+        # dele só vai até os bits que o registrador tem
+        images = registers[LANES:].tolist()
+        advance = []
+        for j in range(0, n_bits, 8):
+            size = 1 << min(8, n_bits - j)
+            byte_table = [0] * size
+            for byte in range(1, size):
+                low = (byte & -byte).bit_length() - 1
+                byte_table[byte] = byte_table[byte & (byte - 1)] ^ images[j + low]
+            advance.append(byte_table)
+
+        for lane_register in registers[:LANES].tolist():
+            advanced = 0
+            for j, byte_table in enumerate(advance):
+                advanced ^= byte_table[(register >> (8 * j)) & 0xFF]
+            register = advanced ^ lane_register
+        return register, length * LANES
+
+    def finish(self, register):
+        """Converte o registrador no valor final do CRC (reflexão da saída e XOR final)."""
+        value = register >> self._shift
+        if self.reverse_input != self.reverse_output:
+            value = reflect(value, self.width)
+        return value ^ (self.final_xor_value & self._mask)
+
+    def checksum(self, data):
+        """
+        Calcula o CRC de uma mensagem completa.
+
+        Args:
+            data: bytes, bytearray ou memoryview.
+
+        Returns:
+            O CRC como inteiro.
+        """
+        return self.finish(self.update(self.initial_register, data))
+
+    def verify(self, data, expected):
+        """Retorna True se o CRC da mensagem é igual ao esperado."""
+        return self.checksum(data) == expected
+
+    def new(self, data=b''):
+        """Retorna um CrcStream para cálculo incremental, já com os bytes iniciais."""
+        return CrcStream(self).update(data)
+
+
+class CrcStream:
+    """
+    Cálculo incremental do CRC: update() pode ser chamado com partes da
+    mensagem e o resultado é o mesmo de checksum() sobre a mensagem inteira.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._register = engine.initial_register
+
+    def update(self, data):
+        """Processa mais uma parte da mensagem. Retorna o próprio objeto."""
+        self._register = self.engine.update(self._register, data)
+        return self
+
+    @property
+    def value(self):
+        """O CRC dos bytes processados até agora."""
+        return self.engine.finish(self._register)
+
+    def digest(self):
+        """O CRC em bytes, big-endian, com o menor número de bytes que comporta a largura."""
+        return self.value.to_bytes(-(-self.engine.width // 8), 'big')
+
+    def copy(self):
+        """Retorna uma cópia independente do estado atual."""
+        other = CrcStream(self.engine)
+        other._register = self._register
+        return other
+
+
+@functools.lru_cache(maxsize=32)
+def _generator_engine(generator):
+    width = len(generator) - 1
+    return CrcEngine(Configuration(width, int(generator, 2) & ((1 << width) - 1)), native=False)
+
+
+def crc_bits(dados_bits: str, gerador_bits: str) -> str:
+    """
+    Substituto de calcular_crc_manual: mesmo resultado, mas os bytes completos
+    da mensagem são processados pela tabela e só os bits que sobram (quando o
+    tamanho não é múltiplo de 8) são tratados um a um.
+
+    Args:
+        dados_bits: A string binária representando o polinômio da mensagem, M(x).
+        gerador_bits: A string binária representando o polinômio gerador, G(x).
+
+    Returns:
+        A string binária de r bits representando o CRC.
+    """
+    if len(gerador_bits) < 2 or gerador_bits[0] != '1':
+        raise ValueError("O gerador deve ter pelo menos 2 bits e começar com '1'")
+    engine = _generator_engine(gerador_bits)
+    r = engine.width
+
+    full = len(dados_bits) // 8 * 8
+    register = engine.initial_register
+    if full:
+        register = engine.update(register, int(dados_bits[:full], 2).to_bytes(full // 8, 'big'))
+    remainder = engine.finish(register)
+
+    polynomial = engine.polynomial
+    top = 1 << (r - 1)
+    for bit in dados_bits[full:]:
+        feedback = bool(remainder & top) != (bit == '1')
+        remainder = (remainder << 1) & engine._mask
+        if feedback:
+            remainder ^= polynomial
+    return format(remainder, f'0{r}b')
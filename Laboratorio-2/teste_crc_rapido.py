@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import random
+
+import crc_rapido
+from crc_rapido import Configuration, CrcEngine, LANES_MIN_BYTES, crc_bits, reflect
+
+# Configurações com larguras múltiplas de 8 ou não, com e sem reflexão, e o
+# valor de verificação (CRC de b'123456789') dos catálogos de CRC, se houver
+CONFIGURACOES = [
+    ('CRC-3/ROHC', Configuration(3, 0x3, 0x7, 0x0, True, True), 0x6),
+    ('gerador 10011', Configuration(4, 0x3), None),
+    ('CRC-5/USB', Configuration(5, 0x05, 0x1F, 0x1F, True, True), 0x19),
+    ('CRC-5 refletido sem XOR', Configuration(5, 0x05, 0x1F, 0x00, True, False), None),
+    ('CRC-8', crc_rapido.CRC8, 0xF4),
+    ('CRC-12/DECT', Configuration(12, 0x80F), 0xF5B),
+    ('CRC-12 refletido', Configuration(12, 0x80F, 0x000, 0x000, True, True), None),
+    ('CRC-16/MODBUS', crc_rapido.CRC16_MODBUS, 0x4B37),
+    ('CRC-16/CCITT-FALSE', crc_rapido.CRC16_CCITT_FALSE, 0x29B1),
+    ('CRC-32', crc_rapido.CRC32, 0xCBF43926),
+]
+
+
+def crc_bit_a_bit(config, data):
+    """CRC de referência, um bit por vez, direto da definição (modelo Rocksoft)."""
+    mask = (1 << config.width) - 1
+    top = 1 << (config.width - 1)
+    register = config.init_value & mask
+    for byte in data:
+        if config.reverse_input:
+            byte = reflect(byte, 8)
+        for i in range(7, -1, -1):
+            feedback = bool(register & top) != bool((byte >> i) & 1)
+            register = (register << 1) & mask
+            if feedback:
+                register ^= config.polynomial & mask
+    if config.reverse_output:
+        register = reflect(register, config.width)
+    return register ^ (config.final_xor_value & mask)
+
+
+def test_check_values():
+    """Testa o CRC de b'123456789' contra a referência bit a bit e os catálogos"""
+
+    print("=== Teste dos Valores de Verificação ===")
+
+    ok = True
+    for name, config, check in CONFIGURACOES:
+        for native in (True, False):
+            value = CrcEngine(config, native=native).checksum(b'123456789')
+            expected = crc_bit_a_bit(config, b'123456789')
+            if value != expected or (check is not None and value != check):
+                print(f"❌ {name} (native={native}): {value:#x}, esperado {expected:#x}")
+                ok = False
+    if ok:
+        print("✅ Todas as configurações conferem com a referência")
+    return ok
+
+
+def test_lanes():
+    """Testa o processamento em partes paralelas (NumPy) contra a referência bit a bit"""
+
+    print("=== Teste do Processamento em Partes ===")
+
+    if crc_rapido.np is None:
+        print("ℹ️ NumPy não instalado: o processamento em partes não é usado")
+        return True
+
+    # Tamanho que não é múltiplo do número de partes: sobram bytes para o laço comum
+    data = random.Random(1).randbytes(LANES_MIN_BYTES + 5)
+    ok = True
+    for name, config, _ in CONFIGURACOES:
+        engine = CrcEngine(config, native=False)
+        expected = crc_bit_a_bit(config, data)
+        value = engine.checksum(data)
+        # Em duas partes, a segunda começa com o registrador já avançado
+        stream = engine.new(data[:7]).update(data[7:])
+        if value != expected or stream.value != expected:
+            print(f"❌ {name}: {value:#x} / {stream.value:#x}, esperado {expected:#x}")
+            ok = False
+    if ok:
+        print("✅ Processamento em partes igual à referência em todas as configurações")
+    return ok
+
+
+def test_crc_bits():
+    """Testa crc_bits com mensagens de tamanho qualquer (bits que sobram do último byte)"""
+
+    print("=== Teste de crc_bits ===")
+
+    rng = random.Random(2)
+    for gerador in ('10011', '1101', '100000111', '11000000000000101'):
+        for size in (1, 7, 8, 13, 64, 100):
+            dados = ''.join(rng.choice('01') for _ in range(size))
+            # Divisão polinomial de dados seguidos de r zeros, como calcular_crc_manual
+            r = len(gerador) - 1
+            resto = list(dados + '0' * r)
+            for i in range(len(dados)):
+                if resto[i] == '1':
+                    for j, bit in enumerate(gerador):
+                        resto[i + j] = '0' if resto[i + j] == bit else '1'
+            esperado = ''.join(resto[-r:])
+            if crc_bits(dados, gerador) != esperado:
+                print(f"❌ crc_bits({dados!r}, {gerador!r}) = {crc_bits(dados, gerador)}, esperado {esperado}")
+                return False
+    print("✅ crc_bits igual à divisão polinomial")
+    return True
+
+
+if __name__ == '__main__':
+    test_check_values()
+    test_lanes()
+    test_crc_bits()
@@ -0,0 +1,602 @@
+# -*- coding: utf-8 -*-
+"""
+Análise de capturas (pcap/pcapng) do tráfego entre os roteadores.
+
+Em vez de inspecionar a captura à mão no Wireshark (wireshark_tutorial.md), este
+script mapeia o arquivo em memória (mmap) e percorre os registros sem copiá-los,
+remonta as conexões TCP, extrai os POSTs para /receive_update (JSON ou formato
+binário) e monta, para cada roteador:
+    - a linha do tempo das atualizações enviadas (instante, destino, rotas, bytes);
+    - o tamanho da tabela anunciada e o total de bytes enviados;
+    - o instante em que a tabela anunciada parou de mudar (convergência).
+
+Para cada par (roteador, vizinho) guarda-se apenas um resumo (hash) do último
+anúncio, e cada conexão só guarda a requisição em andamento: a memória usada
+depende do número de roteadores e conexões abertas, não do tamanho da captura.
+
+Uso:
+    python analisa_captura.py grupo7/convergence.pcap
+    python analisa_captura.py captura.pcapng --timeline linha_do_tempo.csv --json resumo.json
+"""
+import csv
+import io
+import json
+import mmap
+import struct
+import sys
+from argparse import ArgumentParser
+
+from roteador import BINARY_CONTENT_TYPE, JsonUpdateStream, decode_binary_update
+
+# --- Leitura da captura ---
+
+_PCAP_MAGIC = {
+    b'\xd4\xc3\xb2\xa1': ('<', 1e-6),
+    b'\xa1\xb2\xc3\xd4': ('>', 1e-6),
+    b'\x4d\x3c\xb2\xa1': ('<', 1e-9),
+    b'\xa1\xb2\x3c\x4d': ('>', 1e-9),
+}
+_PCAPNG_SECTION = 0x0A0D0D0A
+
+# Tipos de enlace (LINKTYPE_*) suportados
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_LINUX_SLL2 = 276
+
+# A cada RELEASE_BYTES lidos, as páginas já processadas do mmap são devolvidas ao
+# sistema, para que a memória residente não cresça com o tamanho da captura
+RELEASE_BYTES = 64 * 1024 * 1024
+
+
+class CaptureReader:
+    """
+    Lê um arquivo pcap ou pcapng mapeado em memória.
+
+    packets() produz tuplas (timestamp, tipo de enlace, memoryview do pacote);
+    cada memoryview aponta direto para o mmap, sem cópia, e só vale até o
+    próximo pacote ser lido.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, mode='rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Arquivo vazio não pode ser mapeado
+            self._file.close()
+            raise ValueError(f"Captura vazia: {path}")
+        if hasattr(self._map, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+            # Leitura sequencial: o sistema pode ler adiante
+            self._map.madvise(mmap.MADV_SEQUENTIAL)
+        self._view = memoryview(self._map)
+        self._released = 0
+
+        magic = bytes(self._view[:4])
+        if magic in _PCAP_MAGIC:
+            self.format = 'pcap'
+        elif len(self._view) >= 4 and struct.unpack('<I', magic)[0] == _PCAPNG_SECTION:
+            self.format = 'pcapng'
+        else:
+            self.close()
+            raise ValueError(f"Formato de captura desconhecido: {path}")
+
+    def close(self):
+        self._view.release()
+        try:
+            self._map.close()
+        except BufferError:
+            # Ainda há pacotes (memoryview) em uso, ex: ao sair por uma exceção;
+            # o mapeamento é desfeito quando eles forem coletados
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _release(self, offset):
+        """Devolve ao sistema as páginas antes de offset (são lidas de novo do arquivo se preciso)."""
+        if offset - self._released < RELEASE_BYTES or not hasattr(mmap, 'MADV_DONTNEED'):
+            return
+        end = offset - offset % mmap.PAGESIZE
+        self._map.madvise(mmap.MADV_DONTNEED, self._released, end - self._released)
+        self._released = end
+
+    def packets(self):
+        if self.format == 'pcap':
+            return self._pcap_packets()
+        return self._pcapng_packets()
+
+    def _pcap_packets(self):
+        view = self._view
+        endian, resolution = _PCAP_MAGIC[bytes(view[:4])]
+        (network,) = struct.unpack_from(endian + 'I', view, 20)
+        linktype = network & 0xFFFF
+        record = struct.Struct(endian + 'IIII')
+        offset = 24
+        end = len(view)
+        while offset + record.size <= end:
+            seconds, fraction, captured, _ = record.unpack_from(view, offset)
+            offset += record.size
+            if offset + captured > end:
+                # Registro truncado no fim do arquivo (captura interrompida)
+                break
+            yield seconds + fraction * resolution, linktype, view[offset:offset + captured]
+            offset += captured
+            self._release(offset)
+
+    def _pcapng_packets(self):
+        view = self._view
+        end = len(view)
+        offset = 0
+        endian = '<'
+        # Por interface da seção atual: (tipo de enlace, resolução do timestamp)
+        interfaces = []
+        timestamp = 0.0
+        while offset + 12 <= end:
+            block_type, block_length = struct.unpack_from(endian + 'II', view, offset)
+            if block_type == _PCAPNG_SECTION:
+                # A ordem dos bytes é definida pelo magic de cada seção
+                order = bytes(view[offset + 8:offset + 12])
+                endian = '<' if order == b'\x4d\x3c\x2b\x1a' else '>'
+                (block_length,) = struct.unpack_from(endian + 'I', view, offset + 4)
+                interfaces = []
+            if block_length < 12 or block_length % 4 or offset + block_length > end:
+                break
+            body = offset + 8
+            body_end = offset + block_length - 4
+
+            if block_type == 1:
+                linktype, _, _ = struct.unpack_from(endian + 'HHI', view, body)
+                interfaces.append((linktype, self._tsresol(view, body + 8, body_end, endian)))
+            elif block_type == 6:
+                interface, high, low, captured, _ = struct.unpack_from(endian + 'IIIII', view, body)
+                linktype, resolution = interfaces[interface]
+                timestamp = ((high << 32) | low) * resolution
+                start = body + 20
+                yield timestamp, linktype, view[start:start + captured]
+            elif block_type == 3 and interfaces:
+                # Simple Packet Block: sem timestamp, usa o do pacote anterior
+                start = body + 4
+                (original,) = struct.unpack_from(endian + 'I', view, body)
+                yield timestamp, interfaces[0][0], view[start:start + min(original, body_end - start)]
+            elif block_type == 2:
+                # Packet Block (obsoleto)
+                interface, _, high, low, captured, _ = struct.unpack_from(endian + 'HHIIII', view, body)
+                linktype, resolution = interfaces[interface]
+                timestamp = ((high << 32) | low) * resolution
+                start = body + 20
+                yield timestamp, linktype, view[start:start + captured]
+            offset += block_length
+            self._release(offset)
+
+    @staticmethod
+    def _tsresol(view, offset, end, endian):
+        """Lê a opção if_tsresol de uma Interface Description Block (padrão: microssegundos)."""
+        while offset + 4 <= end:
+            code, length = struct.unpack_from(endian + 'HH', view, offset)
+            if code == 0:
+                break
+            if code == 9 and length >= 1:
+                value = view[offset + 4]
+                return 2.0 ** -(value & 0x7F) if value & 0x80 else 10.0 ** -value
+            offset += 4 + length + (-length % 4)
+        return 1e-6
+
+
+# --- Decodificação dos cabeçalhos ---
+
+_TCP_FIN = 0x01
+_TCP_SYN = 0x02
+_TCP_RST = 0x04
+
+
+def decode_tcp(linktype, frame):
+    """
+    Extrai o segmento TCP de um quadro IPv4.
+
+    :return: Tupla (origem, destino, seq, flags, payload), com origem e destino no
+             formato 'ip:porta' e payload como memoryview, ou None se o quadro
+             não for TCP sobre IPv4.
+    """
+    if linktype in (LINKTYPE_NULL, LINKTYPE_LOOP):
+        # Família do protocolo em 4 bytes (ordem do host que capturou, no NULL)
+        if len(frame) < 4:
+            return None
+        family = frame[0] | frame[3] if linktype == LINKTYPE_NULL else frame[3]
+        if family != 2:
+            return None
+        offset = 4
+    elif linktype == LINKTYPE_ETHERNET:
+        offset = 12
+        ethertype = None
+        while offset + 2 <= len(frame):
+            ethertype = (frame[offset] << 8) | frame[offset + 1]
+            offset += 2
+            if ethertype not in (0x8100, 0x88A8):
+                break
+            # Tag de VLAN
+            offset += 2
+        if ethertype != 0x0800:
+            return None
+    elif linktype in (LINKTYPE_RAW, LINKTYPE_IPV4):
+        offset = 0
+    elif linktype == LINKTYPE_LINUX_SLL:
+        if len(frame) < 16 or (frame[14] << 8 | frame[15]) != 0x0800:
+            return None
+        offset = 16
+    elif linktype == LINKTYPE_LINUX_SLL2:
+        if len(frame) < 20 or (frame[0] << 8 | frame[1]) != 0x0800:
+            return None
+        offset = 20
+    else:
+        return None
+
+    if len(frame) < offset + 20 or frame[offset] >> 4 != 4 or frame[offset + 9] != 6:
+        return None
+    header_length = (frame[offset] & 0x0F) * 4
+    total_length = (frame[offset + 2] << 8) | frame[offset + 3]
+    # Fragmentos (exceto o primeiro sem "more fragments") não são remontados
+    if ((frame[offset + 6] << 8) | frame[offset + 7]) & 0x3FFF:
+        return None
+    source_ip = '.'.join(map(str, frame[offset + 12:offset + 16]))
+    destination_ip = '.'.join(map(str, frame[offset + 16:offset + 20]))
+    ip_end = min(len(frame), offset + total_length) if total_length else len(frame)
+
+    tcp = offset + header_length
+    if ip_end < tcp + 20:
+        return None
+    source_port, destination_port, seq = struct.unpack_from('!HHI', frame, tcp)
+    data_offset = (frame[tcp + 12] >> 4) * 4
+    flags = frame[tcp + 13]
+    return (f"{source_ip}:{source_port}", f"{destination_ip}:{destination_port}",
+            seq, flags, frame[tcp + data_offset:ip_end])
+
+
+# --- Remontagem das requisições HTTP ---
+
+_HTTP_METHODS = (b'GET ', b'POST ', b'PUT ', b'HEAD ', b'DELETE ', b'PATCH ', b'OPTIONS ')
+# Segmentos fora de ordem guardados por conexão antes de desistir da requisição
+MAX_OUT_OF_ORDER = 64
+
+
+class HttpRequestStream:
+    """
+    Remonta um sentido de uma conexão TCP e separa as requisições HTTP.
+
+    Só guarda a requisição em andamento. Sentidos que não começam com uma
+    requisição (ex: as respostas do servidor) são ignorados, e corpos maiores
+    que max_body são descartados sem serem guardados.
+    """
+
+    def __init__(self, max_body):
+        self.max_body = max_body
+        self.next_seq = None
+        self.ignored = False
+        self._buffer = bytearray()
+        self._out_of_order = {}
+        # Requisição atual: (método, caminho, cabeçalhos, tamanho do cabeçalho) depois de lido
+        self._head = None
+        self._skip = 0
+
+    def feed(self, seq, flags, payload):
+        """
+        Processa um segmento.
+
+        :return: Lista de requisições completas (método, caminho, cabeçalhos, corpo, bytes).
+        """
+        if flags & _TCP_SYN:
+            self.next_seq = (seq + 1) & 0xFFFFFFFF
+            return []
+        if self.ignored or not payload:
+            return []
+        if self.next_seq is None:
+            # Captura começou no meio da conexão: sincroniza no primeiro segmento com dados
+            self.next_seq = seq
+
+        delta = (seq - self.next_seq) & 0xFFFFFFFF
+        if delta >= 1 << 31:
+            # Retransmissão (parcial ou total) de dados já recebidos
+            overlap = (self.next_seq - seq) & 0xFFFFFFFF
+            if overlap >= len(payload):
+                return []
+            payload = payload[overlap:]
+        elif delta:
+            if len(self._out_of_order) >= MAX_OUT_OF_ORDER:
+                self._resync()
+                return []
+            self._out_of_order[seq] = bytes(payload)
+            return []
+
+        requests_done = self._append(payload)
+        while self._out_of_order:
+            pending = self._out_of_order.pop(self.next_seq, None)
+            if pending is None:
+                break
+            requests_done.extend(self._append(pending))
+        return requests_done
+
+    def _resync(self):
+        """Descarta a requisição em andamento; volta a ler na próxima que começar num segmento."""
+        self._buffer.clear()
+        self._out_of_order.clear()
+        self._head = None
+        self._skip = 0
+        self.next_seq = None
+
+    def _append(self, payload):
+        self.next_seq = (self.next_seq + len(payload)) & 0xFFFFFFFF
+        if self._skip:
+            skipped = min(self._skip, len(payload))
+            self._skip -= skipped
+            payload = payload[skipped:]
+            if not payload:
+                return []
+        if not self._buffer and self._head is None:
+            start = bytes(payload[:8])
+            # O segmento pode trazer só o começo do método (ex: b'PO')
+            if not any(start.startswith(method) or method.startswith(start) for method in _HTTP_METHODS):
+                if start.startswith(b'HTTP/'):
+                    # Sentido servidor -> cliente
+                    self.ignored = True
+                return []
+        self._buffer += payload
+
+        done = []
+        while True:
+            if self._head is None:
+                end = self._buffer.find(b'\r\n\r\n')
+                if end < 0:
+                    if len(self._buffer) > 64 * 1024:
+                        self._resync()
+                    return done
+                self._head = self._parse_head(bytes(self._buffer[:end]), end + 4)
+                if self._head is None:
+                    self._resync()
+                    return done
+
+            method, path, headers, head_length = self._head
+            body_length = int(headers.get('content-length', 0) or 0)
+            if body_length > self.max_body:
+                # Conta os bytes, mas não guarda o corpo
+                available = len(self._buffer) - head_length
+                self._skip = max(0, body_length - available)
+                done.append((method, path, headers, None, head_length + body_length))
+                del self._buffer[:head_length + min(body_length, available)]
+                self._head = None
+                continue
+            if len(self._buffer) < head_length + body_length:
+                return done
+            body = bytes(self._buffer[head_length:head_length + body_length])
+            del self._buffer[:head_length + body_length]
+            self._head = None
+            done.append((method, path, headers, body, head_length + body_length))
+            if not self._buffer:
+                return done
+
+    @staticmethod
+    def _parse_head(head, head_length):
+        lines = head.decode('latin-1').split('\r\n')
+        parts = lines[0].split(' ')
+        if len(parts) != 3:
+            return None
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            # Os roteadores sempre enviam Content-Length; corpos em chunks não são lidos
+            return None
+        return parts[0], parts[1], headers, head_length
+
+
+def decode_update(headers, body):
+    """
+    Decodifica o corpo de um POST /receive_update.
+
+    :return: (sender_address, iterador de rotas (rede, custo, next_hop)).
+    :raises ValueError: Se o corpo estiver malformado.
+    """
+    content_type = headers.get('content-type', '').split(';')[0].strip()
+    if content_type == BINARY_CONTENT_TYPE:
+        return decode_binary_update(body)
+    stream = JsonUpdateStream(io.BytesIO(body))
+    sender = stream.read_sender()
+    return sender, (route for batch in stream.batches() for route in batch)
+
+
+# --- Linha do tempo e convergência ---
+
+class RouterTimeline:
+    """Estatísticas das atualizações enviadas por um roteador."""
+
+    def __init__(self, address):
+        self.address = address
+        self.updates = 0
+        self.bytes_sent = 0
+        self.first_update = None
+        self.last_update = None
+        self.last_change = None
+        self.changes = 0
+        self.errors = 0
+        # Por vizinho: (hash do último anúncio, número de rotas)
+        self.views = {}
+
+    @property
+    def table_size(self):
+        """Maior número de rotas entre os últimos anúncios a cada vizinho (o Split Horizon omite rotas)."""
+        return max((routes for _, routes in self.views.values()), default=0)
+
+    def record(self, timestamp, destination, digest, routes, size):
+        """Registra um anúncio. Retorna True se ele muda o que este roteador anuncia ao vizinho."""
+        self.updates += 1
+        self.bytes_sent += size
+        if self.first_update is None:
+            self.first_update = timestamp
+        self.last_update = timestamp
+        previous = self.views.get(destination)
+        self.views[destination] = (digest, routes)
+        if previous is None or previous[0] != digest:
+            self.changes += 1
+            self.last_change = timestamp
+            return True
+        return False
+
+
+def table_digest(routes):
+    """
+    Resumo de um anúncio, independente da ordem das rotas: soma dos hashes de
+    cada (rede, custo, next_hop). Não guarda as rotas.
+
+    :return: (resumo, número de rotas).
+    """
+    digest = 0
+    count = 0
+    for route in routes:
+        digest = (digest + hash(route)) & 0xFFFFFFFFFFFFFFFF
+        count += 1
+    return digest, count
+
+
+def analyze(path, timeline_writer=None, max_body=64 * 1024 * 1024, path_filter='/receive_update'):
+    """
+    Percorre a captura e monta a linha do tempo de cada roteador.
+
+    :param timeline_writer: csv.writer que recebe uma linha por atualização, ou None.
+    :return: (dicionário endereço -> RouterTimeline, resumo da captura).
+    """
+    routers = {}
+    summary = {'packets': 0, 'tcp_segments': 0, 'requests': 0, 'updates': 0,
+               'decode_errors': 0, 'start': None, 'end': None}
+
+    with CaptureReader(path) as reader:
+        summary['format'] = reader.format
+        # Em uma função separada, as referências aos pacotes somem antes de fechar o mmap
+        _walk(reader, routers, summary, timeline_writer, max_body, path_filter)
+    return routers, summary
+
+def _walk(reader, routers, summary, timeline_writer, max_body, path_filter):
+    streams = {}
+    for timestamp, linktype, frame in reader.packets():
+        summary['packets'] += 1
+        if summary['start'] is None:
+            summary['start'] = timestamp
+        summary['end'] = timestamp
+
+        segment = decode_tcp(linktype, frame)
+        if segment is None:
+            continue
+        source, destination, seq, flags, payload = segment
+        summary['tcp_segments'] += 1
+
+        key = (source, destination)
+        stream = streams.get(key)
+        if stream is None:
+            stream = streams[key] = HttpRequestStream(max_body)
+        completed = stream.feed(seq, flags, payload)
+        if flags & (_TCP_FIN | _TCP_RST):
+            # Conexão encerrada: nada mais a remontar neste sentido
+            del streams[key]
+
+        for method, request_path, headers, body, size in completed:
+            summary['requests'] += 1
+            if method != 'POST' or request_path.split('?')[0] != path_filter:
+                continue
+            try:
+                if body is None:
+                    raise ValueError("corpo maior que o limite")
+                sender, routes = decode_update(headers, body)
+                digest, count = table_digest(routes)
+            except (ValueError, IndexError, KeyError, TypeError) as e:
+                summary['decode_errors'] += 1
+                print(f"Aviso: atualização de {source} para {destination} ignorada: {e}", file=sys.stderr)
+                continue
+            summary['updates'] += 1
+
+            router = routers.get(sender)
+            if router is None:
+                router = routers[sender] = RouterTimeline(sender)
+            changed = router.record(timestamp, destination, digest, count, size)
+            if timeline_writer is not None:
+                timeline_writer.writerow([
+                    f"{timestamp - summary['start']:.6f}", sender, destination, count, size, int(changed)
+                ])
+
+    summary['open_streams'] = len(streams)
+
+def print_report(routers, summary):
+    start = summary['start'] or 0.0
+    duration = (summary['end'] or start) - start
+    print(f"Captura ({summary['format']}): {summary['packets']} pacotes, {summary['tcp_segments']} segmentos TCP, "
+          f"{duration:.2f}s")
+    print(f"Requisições HTTP: {summary['requests']}, atualizações: {summary['updates']}, "
+          f"com erro: {summary['decode_errors']}\n")
+    if not routers:
+        print("Nenhuma atualização encontrada.")
+        return
+
+    print(f"{'roteador':<22} {'atualiz.':>8} {'mudanças':>8} {'rotas':>6} {'bytes':>11} "
+          f"{'primeira(s)':>11} {'última mud.(s)':>14} {'conv.(s)':>8}")
+    for address in sorted(routers):
+        router = routers[address]
+        print(f"{address:<22} {router.updates:>8} {router.changes:>8} {router.table_size:>6} "
+              f"{router.bytes_sent:>11} {router.first_update - start:>11.2f} {router.last_change - start:>14.2f} "
+              f"{router.last_change - router.first_update:>8.2f}")
+
+    converged = max(router.last_change for router in routers.values())
+    last = max(routers.values(), key=lambda router: router.last_change)
+    print(f"\nÚltima mudança de tabela em {converged - start:.2f}s ({last.address}); "
+          f"a captura continua por mais {(summary['end'] or converged) - converged:.2f}s sem mudanças.")
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="Linha do tempo e convergência dos roteadores a partir de uma captura pcap/pcapng")
+    parser.add_argument('capture', help="Arquivo .pcap ou .pcapng.")
+    parser.add_argument('--timeline', help="Grava uma linha por atualização neste CSV (tempo, origem, destino, rotas, bytes, mudou).")
+    parser.add_argument('--json', dest='json_output', help="Grava o resumo por roteador neste arquivo JSON.")
+    parser.add_argument('--path', default='/receive_update', help="Caminho dos POSTs de atualização.")
+    parser.add_argument('--max-body', type=int, default=64 * 1024 * 1024, help="Corpos maiores são contados, mas não decodificados.")
+    args = parser.parse_args()
+
+    timeline_file = open(args.timeline, mode='w', newline='') if args.timeline else None
+    try:
+        writer = None
+        if timeline_file is not None:
+            writer = csv.writer(timeline_file)
+            writer.writerow(['time', 'sender', 'destination', 'routes', 'bytes', 'changed'])
+        routers, summary = analyze(args.capture, writer, args.max_body, args.path)
+    except (OSError, ValueError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if timeline_file is not None:
+            timeline_file.close()
+
+    print_report(routers, summary)
+
+    if args.json_output:
+        start = summary['start'] or 0.0
+        with open(args.json_output, mode='w') as outfile:
+            json.dump({
+                'summary': summary,
+                'routers': [
+                    {
+                        'address': router.address,
+                        'updates': router.updates,
+                        'changes': router.changes,
+                        'table_size': router.table_size,
+                        'bytes_sent': router.bytes_sent,
+                        'first_update': router.first_update - start,
+                        'last_change': router.last_change - start,
+                        'convergence_time': router.last_change - router.first_update,
+                    }
+                    for _, router in sorted(routers.items())
+                ]
+            }, outfile, indent=2)
+        print(f"Resumo gravado em {args.json_output}")
@@ -0,0 +1,260 @@
+"""
+Benchmark de convergência do protocolo de vetor de distância.
+
+Gera topologias (árvore como a do grupo7, anel, grade e malha aleatória) em
+tamanhos crescentes, executa os roteadores no simulador em processo
+(simulador.py), mede a convergência inicial e a reconvergência após a queda de
+um link, e grava os resultados em JSON ou CSV. Para cada fase são registrados o
+tempo de convergência (virtual), o número de atualizações, os bytes enviados e
+o tempo de CPU por roteador, que concentra o custo de receive_update e
+summarize_routes.
+
+Uso:
+    python benchmark_convergencia.py --sizes 10,50,100 --output resultados.json
+    python benchmark_convergencia.py --baseline resultados.json --tolerance 0.25
+"""
+import csv
+import json
+import math
+import platform
+import random
+import sys
+import time
+from argparse import ArgumentParser
+
+from roteador import setup_logging
+from simulador import Simulator
+
+TOPOLOGIES = ('arvore', 'anel', 'grade', 'malha')
+
+# Métricas comparadas com o baseline (quanto maior, pior)
+REGRESSION_METRICS = ('cpu_total', 'messages', 'bytes', 'time_to_converge')
+# Abaixo deste tempo de CPU (s) a medição é dominada por ruído e não é comparada
+MIN_CPU_COMPARED = 0.05
+
+
+def router_address(index):
+    return f"127.0.0.1:{5000 + index}"
+
+
+def router_network(index, addressing):
+    """
+    Rede do roteador de índice index. 'contiguo' numera as /24 em sequência, como
+    no grupo7 (10.0.1.0/24, 10.0.2.0/24, ...); 'esparso' pula uma /24 entre cada
+    roteador, de modo que a sumarização não junte redes de roteadores diferentes.
+    """
+    block = index if addressing == 'contiguo' else 2 * index
+    return f"{10 + (block >> 16)}.{(block >> 8) & 255}.{block & 255}.0/24"
+
+
+def generate_links(kind, size, rng):
+    """
+    Gera os links (i, j, custo) de uma topologia com size roteadores.
+
+    :param kind: 'arvore' (binária, raiz 0), 'anel', 'grade' (linhas de
+                 ceil(sqrt(size))) ou 'malha' (árvore aleatória mais size/2
+                 links extras).
+    """
+    links = {}
+
+    def connect(i, j):
+        if i != j:
+            links.setdefault((min(i, j), max(i, j)), rng.randint(1, 3))
+
+    if kind == 'arvore':
+        for i in range(1, size):
+            connect(i, (i - 1) // 2)
+    elif kind == 'anel':
+        for i in range(size):
+            connect(i, (i + 1) % size)
+    elif kind == 'grade':
+        width = math.ceil(math.sqrt(size))
+        for i in range(size):
+            if (i + 1) % width and i + 1 < size:
+                connect(i, i + 1)
+            if i + width < size:
+                connect(i, i + width)
+    elif kind == 'malha':
+        for i in range(1, size):
+            connect(i, rng.randrange(i))
+        for _ in range(size // 2):
+            connect(*rng.sample(range(size), 2))
+    else:
+        raise ValueError(f"Topologia desconhecida: {kind}")
+    return [(i, j, cost) for (i, j), cost in sorted(links.items())]
+
+
+def build_topology(links, size, addressing):
+    """Monta as entradas no formato de topologia.json, com os vizinhos embutidos."""
+    neighbors = {i: {} for i in range(size)}
+    for i, j, cost in links:
+        neighbors[i][router_address(j)] = cost
+        neighbors[j][router_address(i)] = cost
+    return [
+        {
+            'name': f"R{i + 1}",
+            'network': router_network(i + 1, addressing),
+            'address': router_address(i),
+            'neighbors': neighbors[i]
+        }
+        for i in range(size)
+    ]
+
+
+def collect(simulator, phase_start, converged_at, wall_seconds):
+    """Resume as métricas da fase que acabou de ser executada."""
+    cpu = [stats['cpu'] for stats in simulator.router_stats.values()]
+    return {
+        'converged': converged_at is not None,
+        'time_to_converge': None if converged_at is None else round(max(0.0, converged_at - phase_start), 6),
+        'messages': simulator.stats['messages'],
+        'bytes': simulator.stats['bytes'],
+        'dropped': simulator.stats['dropped'],
+        'events': simulator.stats['events'],
+        'wall_seconds': round(wall_seconds, 6),
+        'cpu_total': round(sum(cpu), 6),
+        'cpu_per_router_mean': round(sum(cpu) / len(cpu), 6),
+        'cpu_per_router_max': round(max(cpu), 6),
+        'mismatches': len(simulator.verify())
+    }
+
+
+def run_case(kind, size, args, seed):
+    """Executa a convergência inicial e, se pedido, a queda de um link. Retorna a lista de resultados."""
+    rng = random.Random(seed)
+    links = generate_links(kind, size, rng)
+    simulator = Simulator.from_topology(
+        build_topology(links, size, args.addressing),
+        delay=args.delay,
+        loss=args.loss,
+        update_interval=args.interval,
+        triggered_delay=args.triggered_delay,
+        binary=args.binary,
+        split_horizon=None if args.split_horizon == 'off' else args.split_horizon,
+        infinity=args.infinity,
+        seed=seed
+    )
+    base = {'topology': kind, 'size': size, 'links': len(links), 'seed': seed}
+
+    started = time.perf_counter()
+    converged_at = simulator.run_until_converged(max_time=args.max_time)
+    results = [dict(base, phase='inicial', failed_link=None,
+                    **collect(simulator, 0.0, converged_at, time.perf_counter() - started))]
+
+    if args.failures and converged_at is not None:
+        i, j, _ = rng.choice(links)
+        simulator.reset_stats()
+        failed_at = simulator.clock.now
+        simulator.fail_link(router_address(i), router_address(j))
+        simulator.last_change = failed_at
+        # A queda só é percebida quando as rotas expiram (route_timeout)
+        router = simulator.routers[router_address(i)]
+        quiet = 2 * router.refresh_interval + router.route_timeout
+        started = time.perf_counter()
+        converged_at = simulator.run_until_converged(quiet=quiet, max_time=args.max_time)
+        results.append(dict(base, phase='falha', failed_link=f"R{i + 1}-R{j + 1}",
+                            **collect(simulator, failed_at, converged_at, time.perf_counter() - started)))
+    return results
+
+
+def write_results(path, meta, results):
+    """Grava os resultados em CSV (extensão .csv) ou JSON ({'meta', 'results'})."""
+    if path.endswith('.csv'):
+        with open(path, mode='w', newline='') as outfile:
+            writer = csv.DictWriter(outfile, fieldnames=list(results[0].keys()))
+            writer.writeheader()
+            writer.writerows(results)
+    else:
+        with open(path, mode='w') as outfile:
+            json.dump({'meta': meta, 'results': results}, outfile, indent=2)
+
+
+def compare_with_baseline(path, results, tolerance):
+    """
+    Compara os resultados com um JSON anterior deste benchmark.
+
+    :return: Lista de regressões (descrições) em que uma métrica piorou mais que tolerance.
+    """
+    with open(path, mode='r') as infile:
+        baseline = {
+            (r['topology'], r['size'], r['phase']): r
+            for r in json.load(infile)['results']
+        }
+
+    regressions = []
+    for result in results:
+        previous = baseline.get((result['topology'], result['size'], result['phase']))
+        if previous is None:
+            continue
+        label = f"{result['topology']}/{result['size']}/{result['phase']}"
+        if previous['converged'] and not result['converged']:
+            regressions.append(f"{label}: deixou de convergir")
+            continue
+        for metric in REGRESSION_METRICS:
+            old, new = previous.get(metric), result.get(metric)
+            if old is None or new is None or old <= 0:
+                continue
+            if metric == 'cpu_total' and old < MIN_CPU_COMPARED:
+                continue
+            if new > old * (1 + tolerance):
+                regressions.append(f"{label}: {metric} {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="Benchmark de convergência dos roteadores de vetor de distância")
+    parser.add_argument('--topologies', default=','.join(TOPOLOGIES), help=f"Topologias, separadas por vírgula ({', '.join(TOPOLOGIES)}).")
+    parser.add_argument('--sizes', default='10,50,100', help="Números de roteadores, separados por vírgula.")
+    parser.add_argument('--addressing', choices=['esparso', 'contiguo'], default='esparso', help="Numeração das redes dos roteadores (veja router_network).")
+    parser.add_argument('--no-failures', dest='failures', action='store_false', help="Mede só a convergência inicial, sem derrubar links.")
+    parser.add_argument('--delay', type=float, default=0.01, help="Atraso de cada link em segundos.")
+    parser.add_argument('--loss', type=float, default=0.0, help="Probabilidade de perda de cada mensagem.")
+    parser.add_argument('--interval', type=float, default=10, help="Intervalo de atualização periódica em segundos.")
+    parser.add_argument('--triggered-delay', type=float, default=1.0, help="Janela das atualizações disparadas em segundos.")
+    parser.add_argument('--binary', action='store_true', help="Troca as atualizações no formato binário.")
+    parser.add_argument('--split-horizon', choices=['off', 'simple', 'poison'], default='off', help="Split Horizon dos roteadores.")
+    parser.add_argument('--infinity', type=int, default=16, help="Custo que representa uma rede inalcançável.")
+    parser.add_argument('--max-time', type=float, default=3600, help="Tempo virtual máximo de cada fase.")
+    parser.add_argument('--seed', type=int, default=1, help="Semente das topologias e do simulador.")
+    parser.add_argument('--output', default='resultados_convergencia.json', help="Arquivo de saída (.json ou .csv).")
+    parser.add_argument('--baseline', help="JSON de uma execução anterior para detectar regressões.")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Piora relativa tolerada em relação ao baseline.")
+    args = parser.parse_args()
+
+    setup_logging('ERROR', max_per_second=0)
+
+    topologies = [kind.strip() for kind in args.topologies.split(',') if kind.strip()]
+    unknown = [kind for kind in topologies if kind not in TOPOLOGIES]
+    if unknown:
+        parser.error(f"topologia(s) desconhecida(s): {', '.join(unknown)}")
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    print(f"{'topologia':<8} {'n':>5} {'fase':<8} {'conv(s)':>9} {'msgs':>8} {'bytes':>11} "
+          f"{'cpu(s)':>8} {'cpu/rot(ms)':>11} {'div':>4}")
+    results = []
+    for kind in topologies:
+        for size in sizes:
+            for result in run_case(kind, size, args, args.seed):
+                results.append(result)
+                converge = f"{result['time_to_converge']:.2f}" if result['converged'] else '-'
+                print(f"{kind:<8} {size:>5} {result['phase']:<8} {converge:>9} {result['messages']:>8} "
+                      f"{result['bytes']:>11} {result['cpu_total']:>8.2f} "
+                      f"{result['cpu_per_router_mean'] * 1000:>11.2f} {result['mismatches']:>4}", flush=True)
+
+    meta = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')}
+    }
+    write_results(args.output, meta, results)
+    print(f"\nResultados gravados em {args.output}")
+
+    if args.baseline:
+        regressions = compare_with_baseline(args.baseline, results, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regressão(ões) em relação a {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"Nenhuma regressão em relação a {args.baseline} (tolerância {args.tolerance:.0%})")
@@ -0,0 +1,447 @@
+"""
+Hospedeiro de vários roteadores de vetor de distância em uma única máquina.
+
+Executa os roteadores de um topologia.json distribuídos entre alguns processos
+de trabalho (shards), em vez de um processo com servidor Flask por roteador.
+Cada processo mantém seus roteadores com start_threads=False e faz o papel das
+threads deles em um único laço de eventos em tempo real: atualizações
+periódicas, atualizações disparadas e expiração das rotas. As mensagens entre
+roteadores do mesmo processo são entregues diretamente, e as entre processos
+passam por filas (multiprocessing.Queue), sem HTTP. O processo principal
+acompanha a convergência e, ao final, compara as tabelas com os caminhos mínimos.
+
+Uso:
+    python hospedeiro.py grupo7/topologia.json --workers 4 --interval 1
+    python hospedeiro.py topologia_grande.json --workers 8 --interval 2 --show R1
+"""
+import heapq
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import random
+import time
+from argparse import ArgumentParser
+
+from roteador import INFINITY, Router, decode_binary_update, setup_logging
+from simulador import load_topology, route_mismatches, shortest_paths
+
+log = logging.getLogger('roteador')
+
+# Timers vencidos processados antes de cada verificação da fila de entrada
+TIMERS_PER_ROUND = 32
+
+
+class ShardTransport:
+    """
+    Substitui o NeighborSender de um roteador hospedado: as mensagens vão para
+    o ShardHost, que as entrega no próprio processo ou as encaminha ao processo
+    do destino.
+    """
+
+    def __init__(self, host, address, binary):
+        self.host = host
+        self.address = address
+        self.binary = binary
+
+    def mark_alive(self, neighbor_address):
+        pass
+
+    def accepts_binary(self, neighbor_address):
+        return self.binary
+
+    def send(self, messages):
+        """
+        :param messages: Dicionário vizinho -> (content_type, corpo em bytes).
+        :return: Dicionário vizinho -> True se o vizinho está hospedado (a mensagem saiu).
+        """
+        return {
+            neighbor_address: self.host.post(self.address, neighbor_address, content_type, body)
+            for neighbor_address, (content_type, body) in messages.items()
+        }
+
+
+class ShardHost:
+    """
+    Os roteadores de um processo de trabalho e o laço de eventos que os executa.
+
+    Os timers de todos os roteadores ficam em um heap único, como no simulador,
+    mas com o relógio real. Mensagens para outros processos são acumuladas
+    durante cada evento e enviadas em um único put por processo de destino.
+    """
+
+    def __init__(self, index, entries, shard_of, queues, results, update_interval=10,
+                 triggered_delay=1.0, binary=True, absorb_routes=False, split_horizon=None,
+                 infinity=INFINITY, expiry_resolution=0.1, seed=None):
+        """
+        :param index: Número deste processo (índice em queues).
+        :param entries: Entradas da topologia (veja load_topology) deste processo.
+        :param shard_of: Dicionário endereço -> processo de todos os roteadores hospedados.
+        :param queues: Fila de entrada de cada processo.
+        :param results: Fila de respostas ao processo principal.
+        :param expiry_resolution: Granularidade em segundos das verificações de expiração.
+        """
+        self.index = index
+        self.shard_of = shard_of
+        self.queues = queues
+        self.inbox = queues[index]
+        self.results = results
+        self.update_interval = update_interval
+        self.triggered_delay = triggered_delay
+        self.expiry_resolution = expiry_resolution
+        self.random = random.Random(seed)
+
+        self.routers = {}
+        self.names = {}
+        self._timers = []
+        self._sequence = itertools.count()
+        self._expiry_at = {}
+        self._triggered_pending = set()
+        self._local = []
+        self._outgoing = {}
+        self.last_change = time.time()
+        self.stats = {'messages_sent': 0, 'bytes_sent': 0, 'messages_received': 0}
+
+        for entry in entries:
+            address = entry['address']
+            self.routers[address] = Router(
+                my_address=address,
+                neighbors=entry['neighbors'],
+                my_network=entry['network'],
+                update_interval=update_interval,
+                absorb_routes=absorb_routes,
+                triggered_delay=triggered_delay,
+                binary_updates=binary,
+                split_horizon=split_horizon,
+                infinity=infinity,
+                sender=ShardTransport(self, address, binary),
+                start_threads=False
+            )
+            self.names[address] = entry['name']
+
+        now = time.time()
+        for address in self.routers:
+            # Fase aleatória para os roteadores não enviarem todos no mesmo instante
+            self._schedule(now + self.random.uniform(0, self.routers[address].refresh_interval),
+                           self._periodic_update, address)
+            self._request_triggered_update(address)
+            self._watch_expiry(address)
+
+    # --- Transporte ---
+
+    def post(self, source, destination, content_type, body):
+        """Encaminha uma mensagem; chamado pelo ShardTransport do remetente."""
+        shard = self.shard_of.get(destination)
+        if shard is None:
+            return False
+        self.stats['messages_sent'] += 1
+        self.stats['bytes_sent'] += len(body)
+        message = (source, destination, content_type, body)
+        if shard == self.index:
+            self._local.append(message)
+        else:
+            self._outgoing.setdefault(shard, []).append(message)
+        return True
+
+    def _flush(self):
+        """Entrega as mensagens locais e envia as demais aos processos de destino."""
+        while self._local:
+            messages, self._local = self._local, []
+            for message in messages:
+                self._deliver(*message)
+        for shard, messages in self._outgoing.items():
+            self.queues[shard].put(('updates', messages))
+        self._outgoing = {}
+
+    def _deliver(self, source, destination, content_type, body):
+        """Entrega uma mensagem ao destino, como o endpoint /receive_update faria."""
+        router = self.routers[destination]
+        if source not in router.neighbors:
+            return
+        self.stats['messages_received'] += 1
+        if content_type == 'application/json':
+            update_data = json.loads(body)
+            changed = router.apply_update(update_data['sender_address'], update_data['routing_table'])
+        else:
+            sender_address, routes = decode_binary_update(body)
+            changed = router.apply_routes(sender_address, routes)
+        self._after_update(destination, changed)
+
+    # --- Timers ---
+
+    def _schedule(self, at, callback, *args):
+        heapq.heappush(self._timers, (at, next(self._sequence), callback, args))
+
+    def _after_update(self, address, changed):
+        if changed:
+            self.last_change = time.time()
+            self._request_triggered_update(address)
+        self._watch_expiry(address)
+
+    def _periodic_update(self, address):
+        self.routers[address].send_updates_to_neighbors()
+        self._schedule(time.time() + self.routers[address].refresh_interval, self._periodic_update, address)
+
+    def _request_triggered_update(self, address):
+        if self.triggered_delay is None or address in self._triggered_pending:
+            return
+        self._triggered_pending.add(address)
+        self._schedule(time.time() + self.triggered_delay, self._triggered_update, address)
+
+    def _triggered_update(self, address):
+        self._triggered_pending.discard(address)
+        self.routers[address].send_triggered_update()
+
+    def _watch_expiry(self, address):
+        """Agenda a verificação de expiração do roteador para o prazo mais próximo."""
+        deadline = self.routers[address].next_expiry()
+        if deadline is None:
+            return
+        resolution = self.expiry_resolution
+        if resolution:
+            deadline = -(-deadline // resolution) * resolution
+        scheduled = self._expiry_at.get(address)
+        if scheduled is not None and scheduled <= deadline:
+            return
+        self._expiry_at[address] = deadline
+        self._schedule(deadline, self._expire, address, deadline)
+
+    def _expire(self, address, deadline):
+        if self._expiry_at.get(address) != deadline:
+            return
+        del self._expiry_at[address]
+        changed = self.routers[address].expire_routes()
+        self._after_update(address, changed)
+
+    # --- Laço principal ---
+
+    def run(self):
+        """Processa timers, mensagens e comandos até receber 'stop'."""
+        timers = self._timers
+        while True:
+            # Sob carga, no máximo TIMERS_PER_ROUND timers antes de olhar a fila,
+            # para que mensagens e comandos não esperem todos os timers atrasados
+            now = time.time()
+            for _ in range(TIMERS_PER_ROUND):
+                if not timers or timers[0][0] > now:
+                    break
+                _, _, callback, args = heapq.heappop(timers)
+                callback(*args)
+                self._flush()
+
+            timeout = max(0.0, timers[0][0] - time.time()) if timers else None
+            try:
+                command = self.inbox.get(timeout=timeout) if timeout != 0 else self.inbox.get_nowait()
+            except queue.Empty:
+                continue
+            # Esvazia a fila antes de voltar aos timers, processando rajadas de uma vez
+            while command is not None:
+                if not self._handle(command):
+                    return
+                self._flush()
+                try:
+                    command = self.inbox.get_nowait()
+                except queue.Empty:
+                    command = None
+
+    def _handle(self, command):
+        """Executa um comando recebido; retorna False para encerrar o processo."""
+        kind = command[0]
+        if kind == 'updates':
+            for message in command[1]:
+                self._deliver(*message)
+        elif kind == 'status':
+            self.results.put((self.index, {
+                'routers': len(self.routers),
+                'routes': sum(len(router.routing_table) for router in self.routers.values()),
+                'last_change': self.last_change,
+                'cpu': time.process_time(),
+                **self.stats
+            }))
+        elif kind == 'verify':
+            _, neighbors, networks, infinity = command
+            mismatches = []
+            for address, router in self.routers.items():
+                mismatches.extend(route_mismatches(self.names[address], router, networks,
+                                                   shortest_paths(neighbors, address, infinity)))
+            self.results.put((self.index, mismatches))
+        elif kind == 'dump':
+            tables = {
+                self.names[address]: router.routing_table.copy()
+                for address, router in self.routers.items()
+                if self.names[address] in command[1]
+            }
+            self.results.put((self.index, tables))
+        elif kind == 'stop':
+            return False
+        return True
+
+
+def _worker_main(index, entries, shard_of, queues, results, options, log_level):
+    """Ponto de entrada de um processo de trabalho."""
+    setup_logging(log_level, max_per_second=0)
+    ShardHost(index, entries, shard_of, queues, results, **options).run()
+
+
+def assign_shards(entries, workers):
+    """
+    Distribui os roteadores entre os processos em blocos contíguos, na ordem do
+    topologia.json: roteadores vizinhos costumam estar próximos na lista, e no
+    mesmo bloco suas mensagens não saem do processo.
+
+    :return: Dicionário endereço -> índice do processo.
+    """
+    return {entry['address']: i * workers // len(entries) for i, entry in enumerate(entries)}
+
+
+class Host:
+    """Processo principal: inicia os processos de trabalho e conversa com eles."""
+
+    def __init__(self, entries, workers, log_level='WARNING', **options):
+        """
+        :param entries: Entradas da topologia (veja load_topology).
+        :param workers: Número de processos de trabalho.
+        :param options: Parâmetros dos roteadores, repassados ao ShardHost.
+        """
+        workers = max(1, min(workers, len(entries)))
+        self.entries = entries
+        self.infinity = options.get('infinity', INFINITY)
+        self.shard_of = assign_shards(entries, workers)
+        self.queues = [multiprocessing.Queue() for _ in range(workers)]
+        self.results = multiprocessing.Queue()
+
+        shards = [[] for _ in range(workers)]
+        for entry in entries:
+            shards[self.shard_of[entry['address']]].append(entry)
+
+        self.processes = []
+        for index, shard_entries in enumerate(shards):
+            shard_options = dict(options, seed=None if options.get('seed') is None else options['seed'] + index)
+            process = multiprocessing.Process(
+                target=_worker_main,
+                args=(index, shard_entries, self.shard_of, self.queues, self.results, shard_options, log_level),
+                name=f"hospedeiro-{index}",
+                daemon=True
+            )
+            process.start()
+            self.processes.append(process)
+
+    def _ask(self, command):
+        """Envia um comando a todos os processos e retorna as respostas em ordem."""
+        for worker_queue in self.queues:
+            worker_queue.put(command)
+        replies = dict(self.results.get() for _ in self.queues)
+        return [replies[index] for index in range(len(self.queues))]
+
+    def status(self):
+        """Soma os contadores dos processos; last_change é o da mudança mais recente."""
+        replies = self._ask(('status',))
+        total = {key: sum(reply[key] for reply in replies) for key in replies[0] if key != 'last_change'}
+        total['last_change'] = max(reply['last_change'] for reply in replies)
+        total['cpu_per_worker'] = [reply['cpu'] for reply in replies]
+        return total
+
+    def verify(self):
+        """Divergências entre as tabelas e os caminhos mínimos (veja route_mismatches)."""
+        neighbors = {entry['address']: entry['neighbors'] for entry in self.entries}
+        networks = {entry['address']: entry['network'] for entry in self.entries}
+        return [mismatch for reply in self._ask(('verify', neighbors, networks, self.infinity)) for mismatch in reply]
+
+    def tables(self, names):
+        """Tabelas de roteamento dos roteadores com esses nomes."""
+        tables = {}
+        for reply in self._ask(('dump', set(names))):
+            tables.update(reply)
+        return tables
+
+    def stop(self):
+        for worker_queue in self.queues:
+            worker_queue.put(('stop',))
+        for process in self.processes:
+            process.join(timeout=5)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="Executa os roteadores de um topologia.json em alguns processos, sem HTTP")
+    parser.add_argument('topology', help="Arquivo topologia.json (name, network, address, config_file).")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Número de processos de trabalho (padrão: número de CPUs).")
+    parser.add_argument('--interval', type=float, default=10, help="Intervalo de atualização periódica em segundos.")
+    parser.add_argument('--triggered-delay', type=float, default=1.0, help="Janela das atualizações disparadas em segundos.")
+    parser.add_argument('--no-triggered', action='store_true', help="Desativa as atualizações disparadas.")
+    parser.add_argument('--json', action='store_true', help="Troca as atualizações em JSON em vez do formato binário.")
+    parser.add_argument('--absorb', action='store_true', help="Absorve rotas mais específicas ao sumarizar.")
+    parser.add_argument('--split-horizon', choices=['off', 'simple', 'poison'], default='off', help="Split Horizon dos roteadores (veja roteador.py).")
+    parser.add_argument('--infinity', type=int, default=INFINITY, help="Custo que representa uma rede inalcançável.")
+    parser.add_argument('--duration', type=float, help="Executa por este tempo (s) em vez de parar na convergência.")
+    parser.add_argument('--max-time', type=float, default=600, help="Tempo máximo (s) esperando a convergência.")
+    parser.add_argument('--status-interval', type=float, default=2, help="Intervalo (s) entre as linhas de estado.")
+    parser.add_argument('--show', action='append', default=[], metavar='NOME', help="Mostra a tabela final deste roteador.")
+    parser.add_argument('--seed', type=int, help="Semente das fases dos timers.")
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default='WARNING', help="Nível de log dos roteadores.")
+    args = parser.parse_args()
+
+    setup_logging(args.log_level, max_per_second=0)
+
+    entries = load_topology(args.topology)
+    names = {entry['name'] for entry in entries}
+    unknown = [name for name in args.show if name not in names]
+    if unknown:
+        parser.error(f"roteador(es) desconhecido(s): {', '.join(unknown)}")
+
+    started = time.time()
+    host = Host(
+        entries,
+        args.workers,
+        log_level=args.log_level,
+        update_interval=args.interval,
+        triggered_delay=None if args.no_triggered else args.triggered_delay,
+        binary=not args.json,
+        absorb_routes=args.absorb,
+        split_horizon=None if args.split_horizon == 'off' else args.split_horizon,
+        infinity=args.infinity,
+        seed=args.seed
+    )
+    print(f"{len(entries)} roteador(es) de {args.topology} em {len(host.processes)} processo(s)")
+
+    # Convergência: nenhuma tabela mudou em dois intervalos de atualização
+    quiet = 2 * args.interval
+    converged_at = None
+    try:
+        while True:
+            time.sleep(args.status_interval)
+            now = time.time()
+            status = host.status()
+            print(f"  t={now - started:7.1f}s  rotas={status['routes']:<8} mensagens={status['messages_sent']:<9} "
+                  f"bytes={status['bytes_sent']:<11} última mudança há {max(0.0, now - status['last_change']):.1f}s  "
+                  f"cpu por processo={'/'.join(f'{cpu:.1f}' for cpu in status['cpu_per_worker'])}s", flush=True)
+            if args.duration is not None:
+                if now - started >= args.duration:
+                    break
+            elif now - status['last_change'] >= quiet:
+                converged_at = status['last_change']
+                break
+            elif now - started >= args.max_time:
+                break
+    except KeyboardInterrupt:
+        pass
+
+    mismatches = host.verify()
+    if converged_at is not None and not mismatches:
+        print(f"Convergiu em {converged_at - started:.2f}s")
+    elif converged_at is not None:
+        # Tabelas paradas, mas diferentes dos caminhos mínimos: não é convergência
+        print(f"Tabelas estáveis desde {converged_at - started:.2f}s, mas sem convergir para os caminhos mínimos")
+    elif args.duration is None:
+        print(f"Não convergiu em {args.max_time:g}s")
+    print(f"Divergências em relação aos caminhos mínimos: {len(mismatches)}")
+    for name, network, expected, got in mismatches[:10]:
+        print(f"  {name} -> {network}: esperado {expected}, obtido {got}")
+
+    for name, table in sorted(host.tables(args.show).items()):
+        print(f"\nTabela de {name}:")
+        for network, route_info in sorted(table.items()):
+            print(f"  {network:<22} custo {route_info['cost']:<3} via {route_info['next_hop']}")
+
+    host.stop()
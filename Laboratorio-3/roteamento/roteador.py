@@ -1,13 +1,126 @@
 # -*- coding: utf-8 -*-
 
+import asyncio
+import atexit
+import codecs
 import csv
+import heapq
+import io
+import itertools
 import json
+import logging
+import math
+import os
+import re
+import signal
+import struct
+import sys
 import threading
 import time
+import zlib
 from argparse import ArgumentParser
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
+from queue import Queue
+from urllib.parse import unquote, urlencode
 
 import requests
-from flask import Flask, jsonify, request
+from requests.adapters import HTTPAdapter
+from flask import Flask, Response, jsonify, request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+try:
+    import numpy as np
+except ImportError:
+    # NumPy é opcional: sem ele, as atualizações são sempre aplicadas rota a rota
+    np = None
+
+log = logging.getLogger('roteador')
+
+# Custo padrão que representa uma rede inalcançável (como o 16 do RIP; configurável
+# por roteador). Rotas anunciadas com esse custo são retiradas da tabela de quem as recebe.
+INFINITY = 16
+
+# Com atualizações disparadas, as mudanças vão aos vizinhos na hora e a tabela
+# completa só renova as rotas; por padrão ela vai a cada REFRESH_INTERVAL_FACTOR
+# intervalos de atualização (30 s com o --interval padrão, como no RIP)
+REFRESH_INTERVAL_FACTOR = 3
+
+class RateLimitFilter(logging.Filter):
+    """
+    Limita as mensagens abaixo de WARNING a `max_per_second` por segundo
+    (token bucket). As mensagens descartadas são contadas e o total é anexado
+    à próxima mensagem que passar pelo filtro.
+    """
+
+    def __init__(self, max_per_second):
+        super().__init__()
+        self.max_per_second = max_per_second
+        self._tokens = max_per_second
+        self._last = time.monotonic()
+        self._suppressed = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.max_per_second <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.max_per_second, self._tokens + (now - self._last) * self.max_per_second)
+            self._last = now
+            if self._tokens < 1:
+                self._suppressed += 1
+                return False
+            self._tokens -= 1
+            if self._suppressed:
+                record.msg = f"{record.getMessage()} ({self._suppressed} mensagem(ns) suprimida(s))"
+                record.args = None
+                self._suppressed = 0
+        return True
+
+def setup_logging(level='INFO', log_file=None, max_per_second=20):
+    """
+    Configura o logger do roteador.
+
+    :param level: Nível mínimo das mensagens (DEBUG mostra também as tabelas completas).
+    :param log_file: Se informado, as mensagens são gravadas nesse arquivo por uma
+                     thread separada (QueueListener), fora do caminho das requisições.
+    :param max_per_second: Limite de mensagens abaixo de WARNING por segundo (0 = sem limite).
+    """
+    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+    if log_file:
+        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+        file_handler.setFormatter(formatter)
+        queue = Queue(-1)
+        listener = QueueListener(queue, file_handler)
+        listener.start()
+        atexit.register(listener.stop)
+        handler = QueueHandler(queue)
+    else:
+        handler = logging.StreamHandler()
+        handler.setFormatter(formatter)
+    handler.addFilter(RateLimitFilter(max_per_second))
+
+    log.addHandler(handler)
+    log.setLevel(level)
+    log.propagate = False
+
+    # O log de cada requisição do Werkzeug só aparece em modo DEBUG
+    logging.getLogger('werkzeug').setLevel(logging.DEBUG if level == 'DEBUG' else logging.WARNING)
+
+def log_table(title, table):
+    """
+    Registra uma tabela completa em DEBUG, sem custo de formatação nos outros níveis.
+    Uma RoutingTable só é copiada para dicionário se a mensagem for registrada.
+    """
+    if log.isEnabledFor(logging.DEBUG):
+        if isinstance(table, RoutingTable):
+            table = table.copy()
+        log.debug("%s\n%s", title, json.dumps(table, indent=4))
 
 def ip_to_int(ip):
     """Converte um endereço IP para um inteiro de 32 bits."""
@@ -23,124 +136,1733 @@ def parse_network(network):
     ip, prefix = network.split('/')
     return ip, int(prefix)
 
+def is_valid_ip(ip):
+    """Verifica se a string é um endereço IPv4 válido (4 octetos entre 0 e 255)."""
+    parts = ip.split('.')
+    if len(parts) != 4:
+        return False
+    return all(part.isdigit() and int(part) <= 255 for part in parts)
+
+class Prefix(namedtuple('Prefix', 'network length')):
+    """
+    Prefixo IPv4 canônico: rede como inteiro de 32 bits, com os bits de host
+    zerados, e o tamanho do prefixo. Como é uma tupla, continua valendo
+    `rede_int, prefixo = p` e a comparação com (rede_int, prefixo).
+    """
+
+    __slots__ = ()
+
+    def __str__(self):
+        return prefix_text(self.network, self.length)
+
+    def contains(self, other):
+        """Verifica se `other` é igual a este prefixo ou está contido nele."""
+        return self.length <= other.length and (other.network ^ self.network) >> (32 - self.length) == 0
+
+def network_to_int(network):
+    """
+    Converte uma rede 'ip/prefixo' para o Prefix (rede_int, prefixo), com os bits
+    de host zerados. Retorna None se a chave não for uma rede (ex: '127.0.0.1:5001').
+    Nos caminhos frequentes a rede já chega convertida: a RoutingTable guarda
+    cada rota pela chave inteira (veja route_key) e os lotes (RouteBatch) são
+    convertidos de uma vez pelo NumPy.
+    """
+    try:
+        ip, prefix = network.split('/')
+        a, b, c, d = map(int, ip.split('.'))
+        prefix = int(prefix)
+    except ValueError:
+        return None
+    # Octetos fora de 0-255 (inclusive negativos) têm bits além dos 8 menores
+    if (a | b | c | d) >> 8 or not 0 <= prefix <= 32:
+        return None
+    mask = ((1 << 32) - 1) ^ ((1 << (32 - prefix)) - 1)
+    return Prefix(((a << 24) | (b << 16) | (c << 8) | d) & mask, prefix)
+
+def prefix_text(network_int, prefix):
+    """Formata (rede_int, prefixo) como 'ip/prefixo'."""
+    return f"{int_to_ip(network_int)}/{prefix}"
+
 def can_summarize(network1, network2):
     """Verifica se duas redes podem ser sumarizadas."""
-    ip1, prefix1 = parse_network(network1)
-    ip2, prefix2 = parse_network(network2)
-    
-    # Só pode sumarizar redes com o mesmo prefixo
-    if prefix1 != prefix2:
+    prefix1 = network_to_int(network1)
+    prefix2 = network_to_int(network2)
+
+    # Só pode sumarizar redes válidas com o mesmo prefixo
+    if prefix1 is None or prefix2 is None or prefix1.length != prefix2.length:
         return False, None
-    
-    # Converte para inteiros
-    ip1_int = ip_to_int(ip1)
-    ip2_int = ip_to_int(ip2)
-    
-    # Verifica se são adjacentes
-    mask = (1 << (32 - prefix1)) - 1
-    network1_addr = ip1_int & ~mask
-    network2_addr = ip2_int & ~mask
-    
+
     # Verifica se são adjacentes (diferença de exatamente um bloco de rede)
-    if abs(network1_addr - network2_addr) == (1 << (32 - prefix1)):
+    # e se a menor delas está alinhada ao prefixo da super-rede
+    block = 1 << (32 - prefix1.length)
+    lower = min(prefix1.network, prefix2.network)
+    if abs(prefix1.network - prefix2.network) == block and not lower & block:
         # Calcula a nova rede sumarizada
-        if network1_addr < network2_addr:
-            new_prefix = prefix1 - 1
-            new_network = int_to_ip(network1_addr) + f"/{new_prefix}"
-        else:
-            new_prefix = prefix1 - 1
-            new_network = int_to_ip(network2_addr) + f"/{new_prefix}"
-        return True, new_network
-    
+        return True, prefix_text(lower, prefix1.length - 1)
+
     return False, None
 
-def summarize_routes(routing_table):
-    """Aplica sumarização de rotas na tabela de roteamento."""
-    if len(routing_table) < 2:
-        return routing_table
-    
-    # Cria uma cópia da tabela
-    summarized_table = routing_table.copy()
-    
-    # Agrupa rotas por next_hop
+def aggregate_prefixes(prefixes, absorb=False):
+    """
+    Agrega uma coleção de prefixos na menor lista equivalente (colapso CIDR).
+
+    :param prefixes: Iterável de tuplas (rede_int, prefixo, custo).
+    :param absorb: Se True, prefixos contidos em outro prefixo da coleção são
+                   absorvidos por ele (super-rede), mesmo sem formar pares.
+    :return: Lista de tuplas (rede_int, prefixo, custo) ordenada por endereço.
+             O custo de cada agregado é o maior custo entre as rotas que ele substitui.
+
+    Ordena uma única vez e usa uma pilha: cada prefixo novo é comparado com o
+    topo e, enquanto os dois últimos forem blocos irmãos (mesmo tamanho,
+    adjacentes e o menor alinhado ao prefixo mais curto), são fundidos em
+    cascata. Um bloco fundido pode coincidir com o prefixo abaixo dele na pilha
+    (ex: 10.0.0.0/23 já presente e 10.0.0.0/24 + 10.0.1.0/24): o agregado
+    substitui esse prefixo e fica com o custo das rotas fundidas. Se estiver
+    contido nele com absorb, é absorvido como as demais sub-redes.
+    Depois da ordenação o custo é linear.
+    """
+    stack = []
+    for network, prefix, cost in sorted(prefixes):
+        if stack:
+            top_network, top_prefix, top_cost = stack[-1]
+            # Como a ordenação coloca a super-rede antes das suas sub-redes,
+            # basta comparar com o topo da pilha
+            if top_prefix <= prefix and (absorb or top_prefix == prefix) and \
+                    (network ^ top_network) >> (32 - top_prefix) == 0:
+                stack[-1] = (top_network, top_prefix, max(top_cost, cost))
+                continue
+
+        stack.append((network, prefix, cost))
+
+        while len(stack) >= 2:
+            network2, prefix2, cost2 = stack[-1]
+            network1, prefix1, cost1 = stack[-2]
+            if prefix1 <= prefix2 and (absorb or prefix1 == prefix2) and \
+                    (network1 ^ network2) >> (32 - prefix1) == 0:
+                stack.pop()
+                # Um bloco fundido igual a um prefixo já presente o substitui:
+                # o custo vem só das rotas fundidas, não da rota que já existia
+                stack[-1] = (network1, prefix1, cost2 if prefix1 == prefix2 else max(cost1, cost2))
+                continue
+            if prefix1 != prefix2 or prefix1 == 0:
+                break
+            block = 1 << (32 - prefix1)
+            # Blocos irmãos: adjacentes e o primeiro alinhado ao prefixo - 1
+            if network1 + block != network2 or network1 & block:
+                break
+            stack.pop()
+            stack[-1] = (network1, prefix1 - 1, max(cost1, cost2))
+
+    return stack
+
+def summarize_routes(routing_table, absorb=False):
+    """
+    Aplica sumarização de rotas na tabela de roteamento ({rede: {'cost', 'next_hop', ...}}
+    ou RoutingTable, cujas redes já estão convertidas). Veja summarize_entries.
+    """
+    if isinstance(routing_table, RoutingTable):
+        return summarize_entries(routing_table.entries(), absorb=absorb)
+    return summarize_entries(
+        ((network, network_to_int(network), route_info['cost'], route_info['next_hop'])
+         for network, route_info in routing_table.items()),
+        absorb=absorb
+    )
+
+def summarize_entries(entries, absorb=False, infinity=INFINITY):
+    """
+    Sumariza rotas no formato de RoutingTable.entries().
+
+    As rotas são agrupadas por next_hop e cada grupo é agregado com
+    aggregate_prefixes. Rotas que não mudaram são mantidas como estão; as
+    agregadas recebem o maior custo entre as rotas que substituem. Se um
+    agregado coincide com o prefixo de uma rota de outro next_hop, é anunciada
+    a de menor custo.
+
+    :param entries: Iterável de tuplas (rede, (rede_int, prefixo) ou None, custo, next_hop).
+    :param infinity: Custo a partir do qual uma rota é inalcançável.
+    :return: Tabela sumarizada {rede: {'cost', 'next_hop'}}, pronta para ser anunciada.
+    """
+    summarized_table = {}
+
+    def advertise(network, cost, next_hop):
+        # Um agregado pode coincidir com uma rota para o mesmo prefixo aprendida
+        # por outro vizinho (ex: o próprio resumo devolvido por ele); fica a de
+        # menor custo, senão o custo em laço dessa rota seria o anunciado
+        current = summarized_table.get(network)
+        if current is None or cost < current['cost']:
+            summarized_table[network] = {'cost': cost, 'next_hop': next_hop}
+
+    # Agrupa rotas por next_hop, pela rede já convertida para inteiros
     routes_by_next_hop = {}
-    for network, route_info in summarized_table.items():
-        if '/' not in network:
+    for network, parsed, cost, next_hop in entries:
+        # Rotas envenenadas (custo infinito) não entram na agregação, senão o
+        # custo máximo envenenaria as redes vizinhas que ainda são alcançáveis
+        if parsed is None or cost >= infinity:
+            advertise(network, cost, next_hop)
             continue
-        next_hop = route_info['next_hop']
         if next_hop not in routes_by_next_hop:
-            routes_by_next_hop[next_hop] = []
-        routes_by_next_hop[next_hop].append((network, route_info))
-    
-    # Tenta sumarizar rotas para cada next_hop
+            routes_by_next_hop[next_hop] = {}
+        routes_by_next_hop[next_hop][parsed] = (network, cost)
+
     for next_hop, routes in routes_by_next_hop.items():
         if len(routes) < 2:
+            for network, cost in routes.values():
+                advertise(network, cost, next_hop)
             continue
-        
-        # Ordena as redes para facilitar a busca por adjacentes
-        routes.sort(key=lambda x: ip_to_int(parse_network(x[0])[0]))
-        
-        i = 0
-        while i < len(routes) - 1:
-            network1, route1 = routes[i]
-            network2, route2 = routes[i + 1]
-            
-            can_sum, new_network = can_summarize(network1, network2)
-            
-            if can_sum:
-                # Remove as duas redes originais
-                del summarized_table[network1]
-                del summarized_table[network2]
-                
-                # Adiciona a rede sumarizada
-                max_cost = max(route1['cost'], route2['cost'])
-                summarized_table[new_network] = {
-                    'cost': max_cost,
-                    'next_hop': next_hop
-                }
-                
-                # Remove as rotas processadas da lista
-                routes.pop(i)
-                routes.pop(i)
-                
-                # Adiciona a nova rota sumarizada
-                routes.insert(i, (new_network, {'cost': max_cost, 'next_hop': next_hop}))
-                
-                print(f"Sumarização: {network1} + {network2} -> {new_network}")
-            else:
-                i += 1
-    
+
+        aggregated = aggregate_prefixes(
+            ((network, prefix, cost) for (network, prefix), (_, cost) in routes.items()),
+            absorb=absorb
+        )
+
+        for network_int, prefix, cost in aggregated:
+            original = routes.get((network_int, prefix))
+            if original is not None and original[1] == cost:
+                advertise(original[0], cost, next_hop)
+                continue
+
+            new_network = prefix_text(network_int, prefix)
+            advertise(new_network, cost, next_hop)
+            log.debug("Sumarização: %s (custo %s) via %s", new_network, cost, next_hop)
+
     return summarized_table
 
+class UpdateTooLarge(ValueError):
+    """A atualização recebida passa do número máximo de rotas aceito."""
+
+# --- Formato binário das atualizações ---
+# Alternativa compacta ao JSON, usada apenas com vizinhos que anunciam suportá-la
+# (cabeçalho Accept-Post na resposta de /receive_update). Layout, em big-endian:
+#
+#   cabeçalho: 'DV', versão (uint8), flags (uint8), nº de strings (uint16), nº de rotas (uint32)
+#   corpo:     tabela de strings (uint16 tamanho + UTF-8); a string 0 é o sender_address
+#              rotas: rede (uint32), prefixo (uint8), custo (uint16), next_hop (uint16,
+#              índice na tabela de strings)
+#
+# Chaves que não são redes (ex: '127.0.0.1:5001') ou que não estão na forma canônica
+# (ex: '10.0.0.5/24') vão com prefixo 0xFF e, no lugar da rede, o índice da chave
+# na tabela de strings. Custos fora de 0-65535 são limitados a essa faixa. Com a flag BINARY_FLAG_ZLIB o
+# corpo vai comprimido com zlib. Como o nº de strings é um uint16, cabem no máximo
+# 65535 strings distintas (next_hops e chaves que não são redes), cada uma com
+# até 65535 bytes; tabelas maiores são recusadas por encode_binary_update.
+
+BINARY_CONTENT_TYPE = 'application/x-dv-routes'
+BINARY_FLAG_ZLIB = 0x01
+_BINARY_HEADER = struct.Struct('!2sBBHI')
+_BINARY_ROUTE = struct.Struct('!IBHH')
+_BINARY_STRING_LEN = struct.Struct('!H')
+_BINARY_KEY_PREFIX = 0xFF
+
+_BINARY_MAX_STRINGS = 0xFFFF
+
+def encode_binary_update(sender_address, routing_table, compress_threshold=4096):
+    """
+    Codifica uma atualização (sender_address + tabela no formato do JSON) no
+    formato binário. O corpo é comprimido quando passa de compress_threshold bytes.
+
+    :raises ValueError: Se a tabela tiver mais strings distintas, ou strings mais
+                        longas, do que o formato comporta (veja acima); quem envia
+                        usa JSON nesse caso.
+    """
+    strings = [sender_address]
+    string_index = {sender_address: 0}
+
+    def intern(value):
+        index = string_index.get(value)
+        if index is None:
+            if len(strings) >= _BINARY_MAX_STRINGS:
+                raise ValueError(f"Formato binário comporta no máximo {_BINARY_MAX_STRINGS} strings distintas")
+            index = string_index[value] = len(strings)
+            strings.append(value)
+        return index
+
+    networks = list(routing_table)
+    routes = [routing_table[network] for network in networks]
+    if np is not None and len(networks) >= BATCH_MIN_ROUTES:
+        net_ints, prefixes, canonical = _parse_networks(networks, canonical=True)
+        array = np.zeros(len(networks), dtype=_BINARY_ROUTE_DTYPE)
+        array['network'] = net_ints
+        array['prefix'] = prefixes
+        costs = np.fromiter((route_info['cost'] for route_info in routes), np.int64, len(routes))
+        array['cost'] = np.clip(costs, 0, 0xFFFF)
+        # Chaves fora da forma canônica (ex: '10.0.0.5/24', com bits de host) vão
+        # como string, para chegarem com a mesma chave que teriam no JSON. As
+        # strings entram na tabela na ordem das rotas, como no laço abaixo
+        next_hops, strings_at = [], []
+        for i, (route_info, exact) in enumerate(zip(routes, canonical.tolist())):
+            next_hops.append(intern(route_info['next_hop']))
+            if not exact:
+                strings_at.append((i, intern(networks[i])))
+        array['next_hop'] = next_hops
+        for i, index in strings_at:
+            array['network'][i] = index
+            array['prefix'][i] = _BINARY_KEY_PREFIX
+        # Registros em ordem de rede comprimem melhor (a ordem dos campos do
+        # dtype é a mesma dos bytes big-endian)
+        array.sort()
+        records = [array.tobytes()]
+        count = len(array)
+    else:
+        records = []
+        for network, route_info in zip(networks, routes):
+            cost = min(max(route_info['cost'], 0), 0xFFFF)
+            next_hop = intern(route_info['next_hop'])
+            parsed = network_to_int(network)
+            if parsed is None or prefix_text(*parsed) != network:
+                records.append(_BINARY_ROUTE.pack(intern(network), _BINARY_KEY_PREFIX, cost, next_hop))
+            else:
+                records.append(_BINARY_ROUTE.pack(parsed[0], parsed[1], cost, next_hop))
+        records.sort()
+        count = len(records)
+
+    parts = []
+    for value in strings:
+        encoded = value.encode('utf-8')
+        if len(encoded) > 0xFFFF:
+            raise ValueError(f"String com mais de 65535 bytes no formato binário: {value[:40]!r}...")
+        parts.append(_BINARY_STRING_LEN.pack(len(encoded)))
+        parts.append(encoded)
+    body = b''.join(parts) + b''.join(records)
+
+    flags = 0
+    if len(body) > compress_threshold:
+        body = zlib.compress(body, 1)
+        flags |= BINARY_FLAG_ZLIB
+    return _BINARY_HEADER.pack(b'DV', 1, flags, len(strings), count) + body
+
+def decode_binary_update(payload, max_routes=None):
+    """
+    Decodifica uma atualização binária.
+
+    :return: (sender_address, rotas), onde rotas é um iterador de tuplas
+             (rede, custo, next_hop) lido direto do buffer, sem dicionários
+             intermediários. Com NumPy disponível e mensagens de pelo menos
+             BATCH_MIN_ROUTES rotas, rotas é um RouteBatch (também iterável).
+    :raises UpdateTooLarge: Se a mensagem tiver mais de max_routes rotas.
+    :raises ValueError: Se a mensagem estiver malformada.
+    """
+    strings, records = _split_binary_update(payload, max_routes)
+
+    if np is not None and len(records) >= BATCH_MIN_ROUTES * _BINARY_ROUTE.size:
+        return strings[0], RouteBatch.from_binary(strings, records)
+
+    def routes():
+        for network, prefix, cost, next_hop in _BINARY_ROUTE.iter_unpack(records):
+            if prefix == _BINARY_KEY_PREFIX:
+                yield strings[network], cost, strings[next_hop]
+            else:
+                yield prefix_text(network, prefix), cost, strings[next_hop]
+
+    # Índices fora da tabela de strings só aparecem ao consumir o iterador
+    # (IndexError); quem consome trata como mensagem malformada
+    return strings[0], routes()
+
+def _split_binary_update(payload, max_routes=None):
+    """
+    Valida o cabeçalho de uma atualização binária e separa o corpo.
+
+    :return: (tabela de strings, buffer com os registros das rotas).
+    :raises ValueError: Se a mensagem estiver malformada.
+    """
+    view = memoryview(payload)
+    try:
+        magic, version, flags, n_strings, n_routes = _BINARY_HEADER.unpack_from(view, 0)
+    except struct.error as e:
+        raise ValueError(f"Cabeçalho binário inválido: {e}")
+    if magic != b'DV' or version != 1 or n_strings == 0:
+        raise ValueError("Mensagem binária com cabeçalho desconhecido")
+    if max_routes is not None and n_routes > max_routes:
+        # Verificado antes de descomprimir o corpo
+        raise UpdateTooLarge(f"Atualização com mais de {max_routes} rotas")
+
+    body = view[_BINARY_HEADER.size:]
+    if flags & BINARY_FLAG_ZLIB:
+        try:
+            body = memoryview(zlib.decompress(body))
+        except zlib.error as e:
+            raise ValueError(f"Corpo comprimido inválido: {e}")
+
+    strings = []
+    offset = 0
+    try:
+        for _ in range(n_strings):
+            (length,) = _BINARY_STRING_LEN.unpack_from(body, offset)
+            offset += _BINARY_STRING_LEN.size
+            strings.append(str(body[offset:offset + length], 'utf-8'))
+            offset += length
+    except (struct.error, UnicodeDecodeError) as e:
+        raise ValueError(f"Tabela de strings inválida: {e}")
+    if offset + n_routes * _BINARY_ROUTE.size != len(body):
+        raise ValueError("Tamanho da mensagem binária não confere com o número de rotas")
+
+    return strings, body[offset:]
+
+# --- Snapshots da tabela ---
+# Para o warm start, a tabela é gravada periodicamente em disco no formato binário
+# das atualizações (sender_address = o próprio roteador), precedido de um cabeçalho
+# com o horário da gravação: 'DVSN', versão (uint8), horário (double, segundos).
+# A gravação é atômica: o arquivo temporário só substitui o anterior depois de
+# escrito por completo, então um snapshot interrompido nunca é lido pela metade.
+
+_SNAPSHOT_HEADER = struct.Struct('!4sBd')
+
+def write_snapshot(path, sender_address, routing_table, created_at):
+    """Grava a tabela (no formato do JSON) em path, de forma atômica."""
+    payload = _SNAPSHOT_HEADER.pack(b'DVSN', 1, created_at) + encode_binary_update(sender_address, routing_table)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, mode='wb') as outfile:
+        outfile.write(payload)
+        outfile.flush()
+        os.fsync(outfile.fileno())
+    os.replace(tmp_path, path)
+
+def read_snapshot(path):
+    """
+    Lê um snapshot gravado por write_snapshot.
+
+    :return: (horário da gravação, sender_address, lista de tuplas (rede, custo, next_hop)).
+    :raises OSError: Se o arquivo não puder ser lido.
+    :raises ValueError: Se o arquivo estiver malformado.
+    """
+    with open(path, mode='rb') as infile:
+        payload = infile.read()
+    try:
+        magic, version, created_at = _SNAPSHOT_HEADER.unpack_from(payload, 0)
+    except struct.error as e:
+        raise ValueError(f"Cabeçalho do snapshot inválido: {e}")
+    if magic != b'DVSN' or version != 1:
+        raise ValueError("Arquivo não é um snapshot de tabela de roteamento")
+
+    sender_address, routes = decode_binary_update(memoryview(payload)[_SNAPSHOT_HEADER.size:])
+    try:
+        return created_at, sender_address, list(routes)
+    except IndexError:
+        raise ValueError("Snapshot com índice fora da tabela de strings")
+
+# --- Leitura incremental de atualizações JSON ---
+# request.json monta o corpo inteiro como um dicionário antes de qualquer rota ser
+# aplicada. Para corpos grandes, JsonUpdateStream lê o corpo em pedaços e produz as
+# rotas de routing_table uma a uma, de modo que só um lote de rotas fica em memória
+# por vez. O tamanho máximo do corpo é limitado pelo Flask (MAX_CONTENT_LENGTH) e o
+# número de rotas pelo próprio leitor.
+
+# Corpos JSON acima deste tamanho (ou sem Content-Length) são lidos em streaming
+STREAMING_MIN_BYTES = 256 * 1024
+# Rotas aplicadas por vez (a tabela é liberada entre um lote e outro)
+STREAMING_BATCH_ROUTES = 1024
+
+_JSON_WHITESPACE = ' \t\n\r'
+# Uma rota completa no formato de json.dumps: "rede": {"cost": N, "next_hop": "..."},
+_JSON_ROUTE_RE = re.compile(
+    r'[ \t\n\r]*"([^"\\\x00-\x1f]*)"[ \t\n\r]*:[ \t\n\r]*\{[ \t\n\r]*"cost"[ \t\n\r]*:[ \t\n\r]*'
+    r'(0|[1-9][0-9]*)[ \t\n\r]*,[ \t\n\r]*"next_hop"[ \t\n\r]*:[ \t\n\r]*"([^"\\\x00-\x1f]*)"'
+    r'[ \t\n\r]*\}[ \t\n\r]*([,}])'
+)
+# Fim do buffer que ainda pode ser parte de um número (ex: '.' de '-1.5e3')
+_JSON_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*\Z')
+
+def route_error(network, route_info):
+    """
+    Valida uma rota recebida em JSON ({'cost', 'next_hop'}).
+
+    :return: A mensagem de erro, ou None se a rota é válida. O custo deve ser um
+             inteiro não negativo (custos negativos chegariam à tabela e não
+             caberiam no formato binário).
+    """
+    if not isinstance(route_info, dict):
+        return f"Rota inválida para {network}: esperado {{'cost': int, 'next_hop': str}}"
+    cost = route_info.get('cost')
+    if type(cost) is not int or cost < 0:
+        return f"Rota inválida para {network}: custo deve ser um inteiro não negativo"
+    return None
+
+class JsonUpdateStream:
+    """
+    Lê uma atualização {"sender_address": ..., "routing_table": {...}} de um
+    stream binário, em pedaços de chunk_size bytes.
+
+    read_sender() lê o objeto até encontrar o sender_address; batches() produz
+    as rotas em listas de tuplas (rede, custo, next_hop). Se routing_table vier
+    antes do sender_address, as rotas ficam guardadas (até max_routes) até o
+    remetente ser conhecido.
+    """
+
+    def __init__(self, stream, max_routes=None, chunk_size=64 * 1024):
+        self._stream = stream
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._chunk_size = chunk_size
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self.max_routes = max_routes
+        self.route_count = 0
+        self.sender_address = None
+        self._pending = None
+        self._table_open = False
+
+    def _read_more(self):
+        """Lê mais um pedaço do stream; retorna False no fim do corpo."""
+        if self._eof:
+            return False
+        chunk = self._stream.read(self._chunk_size)
+        try:
+            text = self._utf8.decode(chunk, final=not chunk)
+        except UnicodeDecodeError as e:
+            raise ValueError(f"Corpo não está em UTF-8: {e}")
+        if not chunk:
+            self._eof = True
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        return bool(chunk)
+
+    def _next_char(self):
+        """Pula espaços e consome o próximo caractere ('' no fim do corpo)."""
+        while True:
+            buffer = self._buffer
+            while self._pos < len(buffer) and buffer[self._pos] in _JSON_WHITESPACE:
+                self._pos += 1
+            if self._pos < len(buffer):
+                self._pos += 1
+                return buffer[self._pos - 1]
+            if not self._read_more():
+                return ''
+
+    def _expect(self, expected):
+        char = self._next_char()
+        if not char or char not in expected:
+            raise ValueError(f"JSON inválido: esperado {expected!r}, encontrado {char or 'fim do corpo'!r}")
+        return char
+
+    def _value(self):
+        """Decodifica o próximo valor JSON, lendo mais do stream se ele estiver incompleto."""
+        # Confere o início do valor e o devolve ao buffer para o raw_decode
+        self._expect('"{[-0123456789tfn')
+        self._pos -= 1
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as e:
+                if self._read_more():
+                    continue
+                raise ValueError(f"JSON inválido: {e}")
+            # Um número no fim do buffer pode continuar no próximo pedaço, mesmo
+            # depois de um trecho que o raw_decode não aceita sozinho ('-1.', '2e')
+            if _JSON_NUMBER_TAIL.match(self._buffer, end) and self._read_more():
+                continue
+            self._pos = end
+            return value
+
+    def _key(self):
+        key = self._value()
+        if not isinstance(key, str):
+            raise ValueError("JSON inválido: chave de objeto deve ser string")
+        self._expect(':')
+        return key
+
+    def _table_routes(self):
+        """Produz as rotas do objeto routing_table, validando cada uma."""
+        self._expect('{')
+        if self._expect('}"') == '}':
+            return
+        self._pos -= 1
+        match_route = _JSON_ROUTE_RE.match
+        while True:
+            # Caminho rápido para o formato que os roteadores enviam; chaves em
+            # outra ordem, escapes ou uma rota cortada no fim do buffer caem no
+            # caminho geral, que lê mais do stream se preciso
+            match = match_route(self._buffer, self._pos)
+            if match is not None:
+                network, cost, next_hop, end = match.groups()
+                cost = int(cost)
+                self._pos = match.end()
+            else:
+                network = self._key()
+                route_info = self._value()
+                error = route_error(network, route_info)
+                if error is None and not isinstance(route_info.get('next_hop'), str):
+                    error = f"Rota inválida para {network}: next_hop deve ser string"
+                if error is not None:
+                    raise ValueError(error)
+                cost, next_hop = route_info['cost'], route_info['next_hop']
+                end = self._expect(',}')
+            self.route_count += 1
+            if self.max_routes is not None and self.route_count > self.max_routes:
+                raise UpdateTooLarge(f"Atualização com mais de {self.max_routes} rotas")
+            yield network, cost, next_hop
+            if end == '}':
+                return
+
+    def _skip_to(self, stop_at_table, first):
+        """
+        Percorre as chaves do objeto principal guardando o sender_address. Para
+        em routing_table (retornando True) se stop_at_table e o remetente já for
+        conhecido; caso contrário guarda as rotas e continua até o fim do objeto.
+
+        :param first: Se a próxima chave é a primeira do objeto (sem vírgula antes).
+        """
+        while True:
+            char = self._expect('}"' if first else '},')
+            if char == '}':
+                return False
+            if first:
+                self._pos -= 1
+            first = False
+            key = self._key()
+            if key == 'sender_address':
+                self.sender_address = self._value()
+            elif key == 'routing_table' and self._pending is None and not self._table_open:
+                if stop_at_table and isinstance(self.sender_address, str):
+                    self._table_open = True
+                    return True
+                self._pending = list(self._table_routes())
+            else:
+                self._value()
+
+    def read_sender(self):
+        """
+        Lê o corpo até conhecer o remetente.
+
+        :return: O sender_address.
+        :raises ValueError: Se o JSON estiver malformado ou faltar um dos campos.
+        """
+        self._expect('{')
+        if not self._skip_to(stop_at_table=True, first=True):
+            if self._pending is None:
+                raise ValueError("Missing sender_address or routing_table")
+            if self._next_char():
+                raise ValueError("JSON inválido: conteúdo após o fim do objeto")
+        if not isinstance(self.sender_address, str) or not self.sender_address:
+            raise ValueError("Missing sender_address or routing_table")
+        return self.sender_address
+
+    def batches(self, size=STREAMING_BATCH_ROUTES):
+        """Produz as rotas em listas de até size tuplas, até o fim do corpo."""
+        if self._pending is not None:
+            for start in range(0, len(self._pending), size):
+                yield self._pending[start:start + size]
+            self._pending = []
+            return
+
+        batch = []
+        for route in self._table_routes():
+            batch.append(route)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+        # O resto do objeto é validado, mas só o sender_address importa
+        self._table_open = False
+        self._skip_to(stop_at_table=False, first=False)
+        if self._next_char():
+            raise ValueError("JSON inválido: conteúdo após o fim do objeto")
+
+# --- Relaxação vetorizada (NumPy) ---
+# Atualizações com pelo menos BATCH_MIN_ROUTES rotas são convertidas em arrays
+# paralelos (rede, prefixo, custo) e relaxadas de uma vez: o cálculo do novo custo,
+# as comparações com a tabela atual e o filtro das redes que contêm a rede local
+# são operações sobre o lote inteiro. Abaixo disso, montar os arrays custa mais
+# do que o laço rota a rota, que converte cada rede para a chave da tabela.
+
+BATCH_MIN_ROUTES = 128
+
+# Prefixo usado nos arrays para chaves que não são redes (ex: '127.0.0.1:5001')
+_BATCH_NOT_NETWORK = 0xFF
+
+if np is not None:
+    # Mesmo layout de _BINARY_ROUTE, para ler os registros direto do buffer
+    _BINARY_ROUTE_DTYPE = np.dtype([('network', '>u4'), ('prefix', 'u1'), ('cost', '>u2'), ('next_hop', '>u2')])
+    _POWERS_OF_TEN = 10 ** np.arange(19, dtype=np.int64)
+
+class RouteBatch:
+    """
+    Lote de rotas recebidas em arrays paralelos do NumPy: networks (chaves da
+    tabela), net_ints e prefixes (rede como inteiro e tamanho do prefixo;
+    _BATCH_NOT_NETWORK para chaves que não são redes), costs e next_hops.
+    Iterar sobre o lote produz as mesmas tuplas (rede, custo, next_hop) do
+    decodificador rota a rota.
+
+    O roteador usa as chaves da RoutingTable (keys()); no lote lido do formato
+    binário, as redes em texto só são montadas se alguém ler networks.
+    """
+
+    def __init__(self, networks, net_ints, prefixes, costs, next_hops, keys=None):
+        self._networks = networks
+        self.net_ints = net_ints
+        self.prefixes = prefixes
+        self.costs = costs
+        self.next_hops = next_hops
+        self._keys = keys
+
+    @property
+    def networks(self):
+        if self._networks is None:
+            self._networks = list(map(key_network, self._keys))
+        return self._networks
+
+    @classmethod
+    def from_table(cls, table):
+        """Monta o lote a partir de uma tabela no formato do JSON ({rede: {'cost', 'next_hop'}})."""
+        networks = list(table)
+        routes = table.values()
+        net_ints, prefixes = _parse_networks(networks)
+        return cls(
+            networks,
+            net_ints,
+            prefixes,
+            np.fromiter((route_info['cost'] for route_info in routes), np.int64, len(networks)),
+            [route_info.get('next_hop') for route_info in routes]
+        )
+
+    @classmethod
+    def from_routes(cls, routes):
+        """Monta o lote a partir de uma lista de tuplas (rede, custo, next_hop)."""
+        networks, costs, next_hops = zip(*routes)
+        net_ints, prefixes = _parse_networks(list(networks))
+        return cls(list(networks), net_ints, prefixes, np.array(costs, dtype=np.int64), list(next_hops))
+
+    @classmethod
+    def from_binary(cls, strings, records):
+        """
+        Monta o lote direto dos registros de uma atualização binária.
+
+        :raises ValueError: Se algum índice estiver fora da tabela de strings.
+        """
+        array = np.frombuffer(records, dtype=_BINARY_ROUTE_DTYPE)
+        net_ints = array['network'].astype(np.int64)
+        prefixes = array['prefix'].astype(np.int64)
+        # Prefixos inválidos (> 32) também não são tratados como redes
+        network = prefixes <= 32
+        try:
+            keys = _network_keys(net_ints, prefixes, network)
+            for i in np.flatnonzero(~network).tolist():
+                net_int, prefix = int(net_ints[i]), int(prefixes[i])
+                keys[i] = strings[net_int] if prefix == _BINARY_KEY_PREFIX else prefix_text(net_int, prefix)
+            next_hops = [strings[index] for index in array['next_hop'].tolist()]
+        except IndexError:
+            raise ValueError("Índice fora da tabela de strings")
+        prefixes[~network] = _BATCH_NOT_NETWORK
+        return cls(None, net_ints, prefixes, array['cost'].astype(np.int64), next_hops, keys)
+
+    def __len__(self):
+        return len(self.costs)
+
+    def __iter__(self):
+        return zip(self.networks, self.costs.tolist(), self.next_hops)
+
+    def keys(self):
+        """Chaves das rotas do lote na RoutingTable (veja route_key), calculadas no NumPy."""
+        if self._keys is None:
+            network = self.prefixes != _BATCH_NOT_NETWORK
+            keys = _network_keys(self.net_ints, self.prefixes, network)
+            for i in np.flatnonzero(~network).tolist():
+                keys[i] = self._networks[i]
+            self._keys = keys
+        return self._keys
+
+    def deduplicated(self):
+        """
+        Retorna o lote com uma única rota por rede (pelas chaves de keys()), a
+        de menor custo (a primeira, em caso de empate), na ordem em que as redes
+        aparecem. Se não houver redes repetidas, retorna o próprio lote.
+        """
+        keys = self.keys()
+        if len(set(keys)) == len(keys):
+            return self
+        best = {}
+        costs = self.costs.tolist()
+        for i, key in enumerate(keys):
+            j = best.get(key)
+            if j is None or costs[i] < costs[j]:
+                best[key] = i
+        keep = sorted(best.values())
+        index = np.array(keep, dtype=np.int64)
+        return RouteBatch(
+            None if self._networks is None else [self._networks[i] for i in keep],
+            self.net_ints[index],
+            self.prefixes[index],
+            self.costs[index],
+            [self.next_hops[i] for i in keep],
+            [keys[i] for i in keep]
+        )
+
+def _network_keys(net_ints, prefixes, network):
+    """
+    Chaves de route_key das linhas marcadas em `network`, com os bits de host
+    zerados (o formato binário não impede que venham ligados). As demais
+    linhas ficam com 0, para quem chama preencher.
+    """
+    prefixes = np.where(network, prefixes, 32)
+    host_bits = (np.int64(1) << (32 - prefixes)) - 1
+    return np.where(network, ((net_ints & ~host_bits) << 6) | prefixes, 0).tolist()
+
+def _decimal_fields(data):
+    """
+    Lê de uma vez os números de um texto em bytes (array uint8) que só tem
+    dígitos e separadores ('.', '/' e espaço), como '10.0.1.0/24 10.0.2.0/24'.
+
+    :return: Array int64 com os números na ordem do texto, ou None se houver
+             outro caractere ou um número com mais de 18 dígitos.
+    """
+    digit = (data >= ord('0')) & (data <= ord('9'))
+    if not (digit | (data == ord('.')) | (data == ord('/')) | (data == ord(' '))).all():
+        return None
+    # Início e fim de cada sequência de dígitos
+    edges = np.diff(digit.view(np.int8), prepend=np.int8(0), append=np.int8(0))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if len(starts) == 0 or (ends - starts).max() > 18:
+        return None
+    # Cada dígito vezes a potência de 10 da sua posição, contada do fim do número
+    position = np.flatnonzero(digit)
+    weights = _POWERS_OF_TEN[np.repeat(ends, ends - starts) - 1 - position]
+    return np.add.reduceat((data[position] - ord('0')) * weights, np.searchsorted(position, starts))
+
+def _parse_networks(networks, canonical=False):
+    """
+    Converte uma lista de chaves 'ip/prefixo' nos arrays (rede, prefixo) de um
+    RouteBatch, com o mesmo resultado de network_to_int. As chaves com formato
+    de rede são juntadas em um único texto e lidas de uma vez pelo NumPy (veja
+    _decimal_fields); se algum campo não for numérico, cai na conversão chave a chave.
+
+    :param canonical: Se True, retorna também um array booleano que marca as
+                      chaves na forma canônica, iguais ao texto de prefix_text
+                      (sem bits de host e sem zeros à esquerda).
+    """
+    n = len(networks)
+    net_ints = np.zeros(n, dtype=np.int64)
+    prefixes = np.full(n, _BATCH_NOT_NETWORK, dtype=np.int64)
+    exact = np.zeros(n, dtype=bool)
+    result = (net_ints, prefixes, exact) if canonical else (net_ints, prefixes)
+
+    # Só chaves com 3 pontos e 1 barra podem ser redes (descarta ex: '127.0.0.1:5001')
+    shaped = np.fromiter(map(str.count, networks, itertools.repeat('.')), np.int64, n) == 3
+    shaped &= np.fromiter(map(str.count, networks, itertools.repeat('/')), np.int64, n) == 1
+    index = np.flatnonzero(shaped)
+    if len(index) == 0:
+        return result
+
+    selected = [networks[i] for i in index.tolist()]
+    text = ' '.join(selected).encode('utf-8')
+    fields = None
+    # Um espaço dentro de uma chave dividiria um campo em dois
+    if text.count(b' ') == len(index) - 1:
+        fields = _decimal_fields(np.frombuffer(text, dtype=np.uint8))
+    if fields is None or len(fields) != 5 * len(index):
+        # Algum campo vazio ou não numérico (ex: '1..2.3/4')
+        for i, network in enumerate(networks):
+            parsed = network_to_int(network)
+            if parsed is not None:
+                net_ints[i], prefixes[i] = parsed
+                exact[i] = canonical and prefix_text(*parsed) == network
+        return result
+
+    fields = fields.reshape(-1, 5)
+    octets, prefix = fields[:, :4], fields[:, 4]
+    # A barra deve vir depois dos três pontos (descarta ex: '10/0.1.0.24')
+    slash = np.fromiter(map(str.find, selected, itertools.repeat('/')), np.int64, len(index))
+    last_dot = np.fromiter(map(str.rfind, selected, itertools.repeat('.')), np.int64, len(index))
+    valid = ((octets >> 8) == 0).all(axis=1) & (prefix <= 32) & (slash > last_dot)
+    prefix = np.where(valid, prefix, 32)
+    address = (octets[:, 0] << 24) | (octets[:, 1] << 16) | (octets[:, 2] << 8) | octets[:, 3]
+    # Zera os bits de host, como network_to_int
+    host_bits = (np.int64(1) << (32 - prefix)) - 1
+    net_ints[index[valid]] = (address & ~host_bits)[valid]
+    prefixes[index[valid]] = prefix[valid]
+    if canonical:
+        # Com a barra no lugar, o texto só tem o tamanho mínimo se nenhum campo
+        # tem zeros à esquerda
+        length = (1 + (fields >= 10) + (fields >= 100)).sum(axis=1) + 4
+        sizes = np.fromiter(map(len, selected), np.int64, len(index))
+        exact[index] = valid & ((address & host_bits) == 0) & (sizes == length)
+    return result
+
 def is_subnet(subnet_str, network_str):
     """Verifica se subnet_str é uma sub-rede de network_str."""
-    try:
-        ip_sub, prefix_sub = parse_network(subnet_str)
-        ip_net, prefix_net = parse_network(network_str)
+    subnet = network_to_int(subnet_str)
+    network = network_to_int(network_str)
+    # Formato inválido (ex: '127.0.0.1:5001') não é sub-rede de nada
+    if subnet is None or network is None:
+        return False
+    # Uma sub-rede deve ter um prefixo maior (mais específico)
+    return subnet.length > network.length and network.contains(subnet)
+
+# Máscara de rede de cada tamanho de prefixo (0 a 32)
+_PREFIX_MASKS = [((1 << 32) - 1) ^ ((1 << (32 - prefix_len)) - 1) for prefix_len in range(33)]
+
+def route_key(network):
+    """
+    Chave de uma rota na RoutingTable. Para redes 'ip/prefixo' é o inteiro
+    (rede_int << 6) | prefixo, com os bits de host zerados, então '10.0.1.5/24'
+    e '10.0.1.0/24' são a mesma rota e a ordem dos inteiros é a ordem
+    (rede_int, prefixo). Chaves que não são redes (ex: '127.0.0.1:5001')
+    continuam como string. Uma chave já convertida é devolvida sem mudança.
+    """
+    if network.__class__ is int:
+        return network
+    parsed = network_to_int(network)
+    return network if parsed is None else (parsed.network << 6) | parsed.length
+
+def key_network(key):
+    """Inverso de route_key: a rede 'ip/prefixo' (canônica) ou a própria string."""
+    if key.__class__ is str:
+        return key
+    return prefix_text(key >> 6, key & 63)
+
+class RoutingTable(MutableMapping):
+    """
+    Tabela de roteamento indexada pela rede de destino ('ip/prefixo').
+
+    Funciona como um dicionário de rotas {'cost', 'next_hop', 'timestamp'}, mas
+    guarda por rota só uma entrada de dicionário, da chave inteira (veja
+    route_key) para um número de entrada nas colunas compactas (array), e cada
+    next_hop uma única vez, referenciado por um id. As strings das redes e os
+    dicionários de rota são montados apenas quando alguém os lê (ex: /routes);
+    o roteador usa get_entry, set_route e entries, que não criam dicionários.
+
+    As redes são normalizadas: ao ler, a chave é sempre a forma canônica. A
+    busca do maior prefixo ("qual rota atende o endereço X") consulta o mesmo
+    dicionário uma vez por tamanho de prefixo presente na tabela, então não há
+    um índice separado a manter. Chaves que não são redes (ex: o endereço
+    'ip:porta' de um vizinho) ficam fora dessa busca.
+
+    Os métodos que recebem uma rede também aceitam a chave já convertida.
+
+    O atributo `version` é incrementado a cada inserção, alteração ou remoção,
+    permitindo reaproveitar resultados calculados sobre uma versão da tabela.
+    """
+
+    def __init__(self):
+        # Chave -> número da entrada nas colunas, e a chave de cada entrada (None
+        # nas removidas, que são reaproveitadas)
+        self._slots = {}
+        self._keys = []
+        self._free = []
+
+        # Colunas: custo, id do next_hop, timestamp e prazo de expiração (inf se
+        # a rota não tem prazo, veja set_deadlines)
+        self._costs = array('i')
+        self._next_hops = array('I')
+        self._timestamps = array('d')
+        self._deadlines = array('d')
+
+        # Next hops internados: string -> id e id -> string
+        self._next_hop_ids = {}
+        self._next_hop_names = []
+
+        # Número de redes de cada tamanho de prefixo e os tamanhos presentes, do
+        # maior para o menor (os únicos testados por lookup)
+        self._length_counts = [0] * 33
+        self._lengths = []
+
+        self.version = 0
+
+        # Chaves em ordem de rede (veja select), recalculadas quando a versão muda
+        self._order = None
+
+    def _next_hop_id(self, next_hop):
+        next_hop_id = self._next_hop_ids.get(next_hop)
+        if next_hop_id is None:
+            next_hop_id = self._next_hop_ids[next_hop] = len(self._next_hop_names)
+            self._next_hop_names.append(next_hop)
+        return next_hop_id
+
+    def _route_info(self, slot):
+        return {
+            'cost': self._costs[slot],
+            'next_hop': self._next_hop_names[self._next_hops[slot]],
+            'timestamp': self._timestamps[slot]
+        }
+
+    def __getitem__(self, network):
+        return self._route_info(self._slots[route_key(network)])
+
+    def __setitem__(self, network, route_info):
+        self.set_route(network, route_info['cost'], route_info['next_hop'], route_info.get('timestamp', 0.0))
+
+    def __delitem__(self, network):
+        key = route_key(network)
+        slot = self._slots.pop(key)
+        self._keys[slot] = None
+        self._deadlines[slot] = math.inf
+        self._free.append(slot)
+        self.version += 1
+        if key.__class__ is int:
+            prefix_len = key & 63
+            self._length_counts[prefix_len] -= 1
+            if not self._length_counts[prefix_len]:
+                self._lengths.remove(prefix_len)
+
+    def __iter__(self):
+        return map(key_network, self._slots)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, network):
+        return route_key(network) in self._slots
+
+    def get(self, network, default=None):
+        slot = self._slots.get(route_key(network))
+        return default if slot is None else self._route_info(slot)
+
+    def get_entry(self, network):
+        """Retorna a tupla (custo, next_hop) da rota, ou None, sem montar o dicionário."""
+        slot = self._slots.get(route_key(network))
+        if slot is None:
+            return None
+        return self._costs[slot], self._next_hop_names[self._next_hops[slot]]
+
+    def get_entries(self, keys):
+        """get_entry de várias rotas de uma vez, a partir das chaves (veja route_key)."""
+        slots = self._slots
+        costs, next_hops, names = self._costs, self._next_hops, self._next_hop_names
+        return [
+            None if slot is None else (costs[slot], names[next_hops[slot]])
+            for slot in map(slots.get, keys)
+        ]
+
+    def set_route(self, network, cost, next_hop, timestamp):
+        """
+        Grava (ou substitui) uma rota sem criar o dicionário da rota. Uma rota
+        nova não tem prazo de expiração até set_deadlines.
+
+        :return: A chave da rota (veja route_key).
+        """
+        key = route_key(network)
+        slot = self._slots.get(key)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+                self._keys[slot] = key
+            else:
+                slot = len(self._keys)
+                self._keys.append(key)
+                self._costs.append(0)
+                self._next_hops.append(0)
+                self._timestamps.append(0.0)
+                self._deadlines.append(math.inf)
+            self._slots[key] = slot
+            if key.__class__ is int:
+                prefix_len = key & 63
+                if not self._length_counts[prefix_len]:
+                    self._lengths.append(prefix_len)
+                    self._lengths.sort(reverse=True)
+                self._length_counts[prefix_len] += 1
+
+        self._costs[slot] = cost
+        self._next_hops[slot] = self._next_hop_id(next_hop)
+        self._timestamps[slot] = timestamp
+        self.version += 1
+        return key
+
+    def touch(self, keys, timestamp):
+        """
+        Atualiza o timestamp de várias rotas (chaves de route_key) sem alterar a
+        versão da tabela, já que renovar uma rota não muda o que é anunciado aos vizinhos.
+        """
+        slots, timestamps = self._slots, self._timestamps
+        for key in keys:
+            timestamps[slots[key]] = timestamp
+
+    def set_deadlines(self, keys, deadline):
+        """
+        Grava o mesmo prazo de expiração em várias rotas (chaves de route_key).
+
+        :return: Os números das entradas das rotas, para guardar no lugar das
+                 chaves (são os mesmos objetos int da tabela, sem cópia por rota).
+        """
+        slots, deadlines = self._slots, self._deadlines
+        entries = [slots[key] for key in keys]
+        for slot in entries:
+            deadlines[slot] = deadline
+        return entries
+
+    def due(self, slots, deadline):
+        """
+        Retorna as chaves das entradas (de set_deadlines) cujo prazo vigente
+        ainda é `deadline`. Entradas renovadas, removidas ou reaproveitadas por
+        outra rota com outro prazo ficam de fora.
+        """
+        deadlines, keys = self._deadlines, self._keys
+        return [keys[slot] for slot in slots if deadlines[slot] == deadline]
+
+    def deadlines(self):
+        """Retorna {prazo: [entradas]} das rotas que têm prazo de expiração."""
+        by_deadline = {}
+        deadlines = self._deadlines
+        for slot in self._slots.values():
+            deadline = deadlines[slot]
+            if deadline != math.inf:
+                slots = by_deadline.get(deadline)
+                if slots is None:
+                    by_deadline[deadline] = [slot]
+                else:
+                    slots.append(slot)
+        return by_deadline
+
+    def entries(self):
+        """
+        Retorna a lista de tuplas (rede, (rede_int, prefixo) ou None, custo, next_hop)
+        de todas as rotas, com a rede já convertida, sem criar dicionários.
+        Quem altera a tabela em outras threads deve estar bloqueado durante a chamada.
+        """
+        names = self._next_hop_names
+        costs, next_hops = self._costs, self._next_hops
+        entries = []
+        for key, slot in self._slots.items():
+            if key.__class__ is int:
+                net_int, prefix_len = key >> 6, key & 63
+                entries.append((prefix_text(net_int, prefix_len), (net_int, prefix_len),
+                                costs[slot], names[next_hops[slot]]))
+            else:
+                entries.append((key, None, costs[slot], names[next_hops[slot]]))
+        return entries
+
+    def copy(self):
+        """Retorna uma cópia da tabela como um dicionário comum de rotas."""
+        # list() copia os pares de uma vez, sem o risco de a iteração ver o
+        # dicionário mudar de tamanho; entradas reaproveitadas no meio do caminho
+        # são ignoradas
+        slots = self._slots
+        return {
+            key_network(key): self._route_info(slot)
+            for key, slot in list(slots.items())
+            if slots.get(key) == slot
+        }
+
+    def _ordered_keys(self):
+        """
+        Retorna (chaves em ordem, número de redes): as redes em ordem numérica
+        (rede_int, prefixo), seguidas das chaves que não são redes, em ordem
+        alfabética. É ordenada uma vez por versão da tabela.
+        """
+        if self._order is None or self._order[0] != self.version:
+            networks = sorted(key for key in self._slots if key.__class__ is int)
+            others = sorted(key for key in self._slots if key.__class__ is str)
+            self._order = (self.version, networks + others, len(networks))
+        return self._order[1], self._order[2]
+
+    def select(self, within=None, next_hop=None, after=None, limit=None):
+        """
+        Seleciona rotas em ordem de rede (veja _ordered_keys) sem montar os
+        dicionários das rotas que ficam de fora. Deve ser chamado com a tabela
+        bloqueada.
+
+        A ordem é mantida entre as chamadas enquanto a tabela não muda, então
+        cada página custa uma busca binária mais as rotas percorridas. Como as
+        redes contidas em um prefixo são contíguas nessa ordem, `within` também
+        é uma faixa encontrada por busca binária.
+
+        :param within: Tupla (rede_int, prefixo): só as redes contidas nesse prefixo.
+        :param next_hop: Só as rotas com esse next_hop.
+        :param after: Só as rotas depois dessa chave na ordem (cursor de paginação;
+                      a chave não precisa mais existir na tabela).
+        :param limit: Número máximo de rotas retornadas.
+        :return: (lista de (rede, info_da_rota), chave a partir da qual continuar
+                 ou None se não há mais rotas).
+        """
+        ordered, n_networks = self._ordered_keys()
+        slots = self._slots
+
+        low, high = 0, len(ordered)
+        if within is not None:
+            # Redes com endereço no bloco e prefixo pelo menos tão longo: a
+            # faixa começa em (rede, prefixo) e termina no fim do bloco
+            within_int, within_len = within
+            low = bisect_left(ordered, (within_int << 6) | within_len, 0, n_networks)
+            high = bisect_left(ordered, (within_int + (1 << (32 - within_len))) << 6, 0, n_networks)
+        start = low
+        if after is not None:
+            # Redes e strings não se comparam: cada uma é buscada na sua parte da lista
+            after = route_key(after)
+            if after.__class__ is int:
+                start = max(low, bisect_right(ordered, after, 0, n_networks))
+            else:
+                start = max(low, bisect_right(ordered, after, n_networks, len(ordered)))
+
+        if next_hop is None:
+            end = high if limit is None else min(high, start + limit)
+            page = [(key_network(key), self._route_info(slots[key])) for key in ordered[start:end]]
+            next_cursor = page[-1][0] if page and end < high else None
+            return page, next_cursor
+
+        next_hop_id = self._next_hop_ids.get(next_hop)
+        if next_hop_id is None:
+            return [], None
+        next_hops = self._next_hops
+        page = []
+        for position in range(start, high):
+            key = ordered[position]
+            if next_hops[slots[key]] != next_hop_id:
+                continue
+            if limit is not None and len(page) == limit:
+                # Há pelo menos mais uma rota depois da página
+                return page, page[-1][0]
+            page.append((key_network(key), self._route_info(slots[key])))
+        return page, None
+
+    def lookup(self, ip_int, usable=None):
+        """
+        Busca a rota de maior prefixo que contém o endereço (inteiro de 32 bits).
+        Retorna a tupla (rede, info_da_rota) ou None.
+
+        Testa só os tamanhos de prefixo presentes na tabela, do maior para o
+        menor: no máximo 33 consultas ao dicionário, independente do tamanho da tabela.
+
+        :param usable: Função opcional que recebe a info da rota e diz se ela pode
+                       ser usada; rotas recusadas dão lugar ao próximo prefixo mais curto.
+        """
+        slots = self._slots
+        for prefix_len in self._lengths:
+            key = ((ip_int & _PREFIX_MASKS[prefix_len]) << 6) | prefix_len
+            slot = slots.get(key)
+            if slot is None:
+                continue
+            route_info = self._route_info(slot)
+            if usable is None or usable(route_info):
+                return key_network(key), route_info
+        return None
+
+# --- Métricas ---
+# Contadores e histogramas expostos em /metrics no formato de texto do Prometheus.
+# Registrar uma observação custa uma busca binária nos limites dos buckets e um
+# lock curto, então as métricas ficam sempre ativas.
+
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Limites (le) dos histogramas de tempo, em segundos, e de quantidade de rotas
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000)
+
+class Metrics:
+    """
+    Registro de contadores e histogramas. Cada métrica é declarada uma vez com
+    describe(); as séries são identificadas pelos rótulos passados como kwargs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}
+        self._series = {}
+
+    def describe(self, name, kind, help_text, buckets=None):
+        """Declara uma métrica 'counter' ou 'histogram' (este com os limites dos buckets)."""
+        self._meta[name] = (kind, help_text, tuple(buckets or ()))
+        self._series[name] = {}
+
+    def inc(self, name, value=1, **labels):
+        """Soma value a um contador."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series[name]
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Registra uma observação em um histograma."""
+        buckets = self._meta[name][2]
+        index = bisect_left(buckets, value)
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series[name]
+            data = series.get(key)
+            if data is None:
+                # Uma contagem por bucket, mais o bucket +Inf e a soma das observações
+                data = series[key] = [0] * (len(buckets) + 1) + [0.0]
+            data[index] += 1
+            data[-1] += value
+
+    def render(self, gauges=()):
+        """
+        Retorna as métricas no formato de texto do Prometheus.
+
+        :param gauges: Tuplas (nome, ajuda, valor) calculadas na hora da coleta.
+        """
+        with self._lock:
+            snapshot = {
+                name: {key: list(value) if isinstance(value, list) else value for key, value in series.items()}
+                for name, series in self._series.items()
+            }
+
+        lines = []
+        for name, (kind, help_text, buckets) in self._meta.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in sorted(snapshot[name].items()):
+                if kind == 'counter':
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+                    continue
+                cumulative = 0
+                for le, count in zip(buckets + (float('inf'),), value):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', _format_value(le)),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(value[-1])}")
+                lines.append(f"{name}_count{_format_labels(key)} {cumulative}")
+        for name, help_text, value in gauges:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+def _format_labels(key):
+    if not key:
+        return ''
+    escaped = (
+        f'{label}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for label, value in key
+    )
+    return '{' + ','.join(escaped) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(value)
+
+def router_metrics():
+    """Cria o registro com as métricas do roteador."""
+    metrics = Metrics()
+    metrics.describe('roteador_receive_update_seconds', 'histogram',
+                     "Tempo de processamento de /receive_update (decodificação e relaxação).", LATENCY_BUCKETS)
+    metrics.describe('roteador_receive_update_errors_total', 'counter',
+                     "Atualizações recusadas (malformadas ou de vizinhos desconhecidos).")
+    metrics.describe('roteador_routes_changed_per_update', 'histogram',
+                     "Rotas novas, alteradas ou retiradas por atualização recebida.", COUNT_BUCKETS)
+    metrics.describe('roteador_summarize_seconds', 'histogram',
+                     "Tempo de sumarização da tabela para os anúncios.", LATENCY_BUCKETS)
+    metrics.describe('roteador_neighbor_send_seconds', 'histogram',
+                     "Tempo de envio de uma atualização a um vizinho.", LATENCY_BUCKETS)
+    metrics.describe('roteador_neighbor_send_failures_total', 'counter',
+                     "Envios a um vizinho que falharam (conexão ou prazo).")
+    metrics.describe('roteador_route_expiries_total', 'counter',
+                     "Rotas vencidas: envenenadas por falta de atualizações ou removidas após o hold-down.")
+    metrics.describe('roteador_link_cost_changes_total', 'counter',
+                     "Mudanças no custo dinâmico de um enlace (veja LinkCostEstimator).")
+    metrics.describe('roteador_route_flaps_total', 'counter',
+                     "Oscilações de rotas penalizadas pelo amortecimento (retiradas e reanúncios).")
+    metrics.describe('roteador_route_suppressions_total', 'counter',
+                     "Rotas suprimidas pelo amortecimento (penalidade acima do limite de supressão).")
+    return metrics
+
+# --- Custos dinâmicos dos enlaces ---
+# Com custos dinâmicos, o custo de cada enlace deixa de ser só o do CSV: o tempo
+# de resposta dos envios de atualizações e as falhas de envio alimentam uma
+# média móvel por vizinho, e o custo derivado dela só é aplicado quando se
+# afasta do atual por mais que a histerese, evitando oscilações de rotas.
+
+# Segundos de RTT suavizado que valem um ponto de custo
+LINK_RTT_UNIT = 0.05
+# Pontos de custo somados com 100% de perda
+LINK_LOSS_WEIGHT = 8
+# Peso de cada nova amostra na média móvel (o mesmo alfa do SRTT do TCP)
+LINK_EWMA_ALPHA = 0.125
+# Diferença mínima entre o custo estimado e o atual para trocar o custo
+LINK_COST_HYSTERESIS = 1.5
+
+class LinkCostEstimator:
+    """
+    Estimativa do custo de um enlace a partir do RTT e das perdas medidos.
+
+    RTT e taxa de perda são suavizados por médias móveis exponenciais (EWMA).
+    O custo estimado é o custo do CSV mais um ponto a cada rtt_unit segundos de
+    RTT suavizado e loss_weight pontos com 100% de perda. O custo vigente só
+    muda quando o estimado se afasta dele por pelo menos `hysteresis`; assim,
+    um RTT que oscila perto da fronteira entre dois custos não troca as rotas
+    a cada amostra. O custo nunca fica abaixo do custo do CSV nem chega a
+    max_cost.
+    """
+
+    def __init__(self, base_cost, rtt_unit=LINK_RTT_UNIT, loss_weight=LINK_LOSS_WEIGHT,
+                 alpha=LINK_EWMA_ALPHA, hysteresis=LINK_COST_HYSTERESIS, max_cost=None):
+        """
+        :param base_cost: Custo do enlace no CSV, usado como piso.
+        :param rtt_unit: Segundos de RTT que valem um ponto de custo.
+        :param loss_weight: Pontos de custo somados com 100% de perda.
+        :param alpha: Peso de cada nova amostra nas médias móveis (0 a 1).
+        :param hysteresis: Diferença mínima entre o custo estimado e o vigente para trocá-lo.
+        :param max_cost: Limite (exclusivo) do custo, ex: o infinito do roteador. None não limita.
+        """
+        if not 0 < alpha <= 1:
+            raise ValueError(f"alpha inválido: {alpha}")
+        if rtt_unit <= 0:
+            raise ValueError(f"rtt_unit inválido: {rtt_unit}")
+        self.base_cost = base_cost
+        self.rtt_unit = rtt_unit
+        self.loss_weight = loss_weight
+        self.alpha = alpha
+        self.hysteresis = hysteresis
+        self.max_cost = max_cost
+        self.srtt = None
+        self.loss = 0.0
+        self.samples = 0
+        self.cost = base_cost
+
+    @property
+    def estimate(self):
+        """Custo estimado (não arredondado) com as médias atuais."""
+        srtt = self.srtt or 0.0
+        return self.base_cost + srtt / self.rtt_unit + self.loss * self.loss_weight
+
+    def observe(self, rtt):
+        """
+        Registra uma amostra: o RTT em segundos de um envio concluído, ou None
+        para um envio perdido (erro de conexão ou sem resposta no prazo).
+
+        :return: O novo custo, se ele mudou; None caso contrário.
+        """
+        self.samples += 1
+        alpha = self.alpha
+        if rtt is None:
+            self.loss += alpha * (1.0 - self.loss)
+        else:
+            self.loss -= alpha * self.loss
+            # A primeira amostra inicializa a média, como o SRTT do TCP
+            self.srtt = rtt if self.srtt is None else self.srtt + alpha * (rtt - self.srtt)
+
+        estimate = self.estimate
+        if abs(estimate - self.cost) < self.hysteresis:
+            return None
+        cost = max(self.base_cost, int(round(estimate)))
+        if self.max_cost is not None:
+            cost = min(cost, self.max_cost - 1)
+        if cost == self.cost:
+            return None
+        self.cost = cost
+        return cost
+
+    def as_dict(self):
+        """Estado da estimativa, para o /routes."""
+        return {
+            'base_cost': self.base_cost,
+            'cost': self.cost,
+            'srtt_ms': None if self.srtt is None else round(self.srtt * 1000, 3),
+            'loss': round(self.loss, 4),
+            'samples': self.samples
+        }
+
+# --- Amortecimento de oscilações (route flap damping) ---
+# Como no BGP (RFC 2439): cada oscilação de uma rede soma uma penalidade que
+# decai exponencialmente; acima do limite de supressão, a rede deixa de ser
+# anunciada aos vizinhos até a penalidade cair abaixo do limite de reuso.
+
+# Penalidade de uma retirada (rota envenenada) e de um reanúncio (rota em
+# hold-down ou removida que volta a ser alcançável)
+DAMPING_WITHDRAW_PENALTY = 1000
+DAMPING_READVERTISE_PENALTY = 500
+# Limites de supressão e de reuso
+DAMPING_SUPPRESS_LIMIT = 2000
+DAMPING_REUSE_LIMIT = 750
+# Meia-vida da penalidade e tempo máximo de supressão, em segundos
+DAMPING_HALF_LIFE = 60
+DAMPING_MAX_SUPPRESS = 240
+
+class RouteDamping:
+    """
+    Penalidades de oscilação por rede, com decaimento exponencial.
+
+    A penalidade é guardada com o instante em que foi calculada e só é decaída
+    quando lida (penalidade * 2^(-Δt / meia-vida)), então redes estáveis não
+    custam nada. Uma rede passa a ser suprimida quando a penalidade passa de
+    suppress_limit e volta a ser anunciada quando ela cai abaixo de reuse_limit
+    (verificado por release, a cada anúncio). A penalidade é limitada de forma
+    que nenhuma rede fique suprimida mais que max_suppress segundos depois da
+    última oscilação, e o registro é descartado quando ela cai abaixo da
+    metade de reuse_limit.
+
+    O atributo `version` muda sempre que o conjunto de redes suprimidas muda,
+    para invalidar os anúncios já montados.
+    """
+
+    def __init__(self, half_life=DAMPING_HALF_LIFE, suppress_limit=DAMPING_SUPPRESS_LIMIT,
+                 reuse_limit=DAMPING_REUSE_LIMIT, withdraw_penalty=DAMPING_WITHDRAW_PENALTY,
+                 readvertise_penalty=DAMPING_READVERTISE_PENALTY, max_suppress=DAMPING_MAX_SUPPRESS):
+        """
+        :param half_life: Segundos para a penalidade cair pela metade.
+        :param suppress_limit: Penalidade a partir da qual a rede é suprimida.
+        :param reuse_limit: Penalidade abaixo da qual uma rede suprimida é liberada.
+        :param withdraw_penalty: Penalidade de cada retirada.
+        :param readvertise_penalty: Penalidade de cada reanúncio depois de uma retirada.
+        :param max_suppress: Tempo máximo de supressão em segundos (define o teto da penalidade).
+        """
+        if half_life <= 0:
+            raise ValueError(f"half_life inválido: {half_life}")
+        if not 0 < reuse_limit < suppress_limit:
+            raise ValueError("reuse_limit deve ser positivo e menor que suppress_limit")
+        self.half_life = half_life
+        self.suppress_limit = suppress_limit
+        self.reuse_limit = reuse_limit
+        self.withdraw_penalty = withdraw_penalty
+        self.readvertise_penalty = readvertise_penalty
+        self.max_penalty = reuse_limit * 2 ** (max_suppress / half_life)
+        # Rede -> [penalidade, instante do cálculo]
+        self._penalties = {}
+        self.suppressed = set()
+        self.version = 0
+
+    def _decayed(self, record, now):
+        return record[0] * 2 ** (-max(0.0, now - record[1]) / self.half_life)
+
+    def penalize(self, network, penalty, now):
+        """
+        Soma uma penalidade à rede.
+
+        :return: True se a rede acabou de ser suprimida.
+        """
+        record = self._penalties.get(network)
+        value = penalty if record is None else self._decayed(record, now) + penalty
+        self._penalties[network] = [min(value, self.max_penalty), now]
+        if value >= self.suppress_limit and network not in self.suppressed:
+            self.suppressed.add(network)
+            self.version += 1
+            return True
+        return False
+
+    def known(self, network):
+        """Indica se a rede tem penalidade registrada (oscilou recentemente)."""
+        return network in self._penalties
+
+    def release(self, now):
+        """
+        Libera as redes suprimidas cuja penalidade caiu abaixo de reuse_limit e
+        descarta os registros que já decaíram o suficiente.
+
+        :return: Lista das redes liberadas.
+        """
+        released = []
+        if not self._penalties:
+            return released
+        forget = self.reuse_limit / 2
+        for network, record in list(self._penalties.items()):
+            value = self._decayed(record, now)
+            if network in self.suppressed and value < self.reuse_limit:
+                self.suppressed.discard(network)
+                released.append(network)
+            if value < forget and network not in self.suppressed:
+                del self._penalties[network]
+        if released:
+            self.version += 1
+        return released
+
+    def status(self, now):
+        """
+        Retorna {rede: {'penalty', 'suppressed', 'reuse_in'}} das redes com
+        penalidade, em que reuse_in é o tempo em segundos até a liberação (0 se
+        a rede não está suprimida).
+        """
+        result = {}
+        for network, record in self._penalties.items():
+            value = self._decayed(record, now)
+            suppressed = network in self.suppressed
+            reuse_in = 0.0
+            if suppressed and value > self.reuse_limit:
+                reuse_in = self.half_life * math.log2(value / self.reuse_limit)
+            result[network] = {
+                'penalty': round(value, 1),
+                'suppressed': suppressed,
+                'reuse_in': round(reuse_in, 1)
+            }
+        return result
+
+class NeighborSender:
+    """
+    Envia mensagens aos vizinhos em paralelo.
+
+    Cada vizinho tem sua própria requests.Session, que mantém a conexão TCP
+    aberta (keep-alive) entre um ciclo e outro. Os envios são disparados em um
+    pool com uma thread por vizinho e cada um tem o seu prazo; send() não espera
+    as respostas, então um vizinho fora do ar não atrasa os demais nem o ciclo
+    de atualização. Uma mensagem para um vizinho com envio em andamento espera
+    ele terminar e sai em seguida, na ordem (uma atualização disparada não se
+    perde atrás da tabela completa). Vizinhos que falham entram em backoff
+    exponencial e só voltam a ser tentados depois do intervalo de espera; as
+    mensagens que esperavam são descartadas, e o vizinho recebe a tabela
+    completa no próximo envio periódico.
+    """
+
+    def __init__(self, neighbors, timeout=5, backoff_base=1, backoff_max=30, metrics=None, on_result=None):
+        """
+        :param neighbors: Endereços (ip:porta) dos vizinhos.
+        :param timeout: Prazo em segundos de cada envio (conexão e resposta).
+        :param backoff_base: Espera em segundos após a primeira falha; dobra a cada falha seguida.
+        :param backoff_max: Espera máxima em segundos entre tentativas para um vizinho.
+        :param metrics: Registro (veja router_metrics) onde medir os envios, ou None.
+        :param on_result: Função chamada ao fim de cada envio com o vizinho e o tempo
+                          de resposta em segundos, ou None se o envio falhou
+                          (ex: Router.observe_link, para os custos dinâmicos).
+        """
+        self.timeout = timeout
+        self.metrics = metrics
+        self.on_result = on_result
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._state = {}
+        for neighbor_address in neighbors:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+            session.mount('http://', adapter)
+            self._sessions[neighbor_address] = session
+            self._state[neighbor_address] = {
+                'failures': 0, 'retry_at': 0.0, 'in_flight': False, 'binary': False, 'pending': []
+            }
+        # Uma thread por vizinho: com no máximo um envio pendente por vizinho, um
+        # envio nunca espera na fila do pool por outro que está no prazo
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, len(neighbors)),
+            thread_name_prefix='envio-vizinhos'
+        )
+
+    def mark_alive(self, neighbor_address):
+        """Zera o backoff de um vizinho (ex: ao receber uma atualização dele)."""
+        with self._lock:
+            state = self._state.get(neighbor_address)
+            if state is not None:
+                state['failures'] = 0
+                state['retry_at'] = 0.0
+
+    def accepts_binary(self, neighbor_address):
+        """Indica se o vizinho anunciou suporte ao formato binário (Accept-Post)."""
+        state = self._state.get(neighbor_address)
+        return state is not None and state['binary']
+
+    def send(self, messages):
+        """
+        Dispara os envios em paralelo e retorna sem esperar as respostas. O
+        resultado de cada envio atualiza o backoff do vizinho, as métricas e
+        on_result quando a resposta chega (ou o prazo acaba).
+
+        :param messages: Dicionário vizinho -> (content_type, corpo em bytes).
+        :return: Lista dos vizinhos cuja mensagem foi disparada ou ficou esperando
+                 o envio em andamento. Vizinhos em backoff não aparecem.
+        """
+        now = time.monotonic()
+        dispatched = []
+        with self._lock:
+            for neighbor_address, (content_type, body) in messages.items():
+                state = self._state.get(neighbor_address)
+                if state is None or now < state['retry_at']:
+                    continue
+                if state['in_flight']:
+                    state['pending'].append((content_type, body))
+                else:
+                    state['in_flight'] = True
+                    self._executor.submit(self._post, neighbor_address, content_type, body)
+                dispatched.append(neighbor_address)
+        return dispatched
+
+    def _post(self, neighbor_address, content_type, body):
+        """Executa um envio e atualiza o estado de backoff do vizinho."""
+        url = f'http://{neighbor_address}/receive_update'
+        binary = None
+        started = time.perf_counter()
+        elapsed = None
+        try:
+            response = self._sessions[neighbor_address].post(
+                url, data=body, headers={'Content-Type': content_type}, timeout=self.timeout
+            )
+            ok = True
+            elapsed = time.perf_counter() - started
+            # Roteadores que aceitam o formato binário listam o tipo no Accept-Post
+            binary = BINARY_CONTENT_TYPE in response.headers.get('Accept-Post', '')
+        except requests.exceptions.RequestException:
+            # Para o experimento de falha, é melhor simplesmente ignorar
+            # os erros de conexão com o roteador que foi derrubado.
+            ok = False
+
+        if self.metrics is not None:
+            self.metrics.observe('roteador_neighbor_send_seconds', time.perf_counter() - started, neighbor=neighbor_address)
+            if not ok:
+                self.metrics.inc('roteador_neighbor_send_failures_total', neighbor=neighbor_address)
+
+        with self._lock:
+            state = self._state[neighbor_address]
+            if ok:
+                state['failures'] = 0
+                state['retry_at'] = 0.0
+                state['binary'] = binary
+            else:
+                state['failures'] += 1
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (state['failures'] - 1))
+                state['retry_at'] = time.monotonic() + delay
+            next_message = state['pending'].pop(0) if ok and state['pending'] else None
+            if next_message is None:
+                state['pending'].clear()
+                state['in_flight'] = False
+
+        if self.on_result is not None:
+            # O tempo do POST inclui o processamento da atualização pelo vizinho,
+            # então um vizinho sobrecarregado também parece um enlace mais lento
+            self.on_result(neighbor_address, elapsed)
+        if next_message is not None:
+            self._executor.submit(self._post, neighbor_address, *next_message)
+        return ok
+
+class AdvertisementViews:
+    """
+    Visões por vizinho de uma tabela a anunciar, para o Split Horizon.
+
+    A tabela é separada, em uma única passada, nas rotas aprendidas de cada
+    vizinho (next_hop igual ao vizinho) e nas demais. A visão de um vizinho é a
+    tabela sem as rotas aprendidas dele (split horizon simples) ou com elas
+    anunciadas com custo infinito (poisoned reverse). No JSON, cada grupo é
+    codificado uma única vez e a mensagem de cada vizinho junta os trechos.
+    """
+
+    def __init__(self, sender_address, table, neighbors, poison, infinity):
+        self.sender_address = sender_address
+        self.poison = poison
+        self.infinity = infinity
+
+        self._shared = {}
+        self._learned = {neighbor_address: {} for neighbor_address in neighbors}
+        for network, route_info in table.items():
+            group = self._learned.get(route_info['next_hop'])
+            (self._shared if group is None else group)[network] = route_info
+
+        # Trechos JSON ('"rede": {...}, ...') de cada grupo, codificados sob demanda
+        self._fragments = None
 
-        # Uma sub-rede deve ter um prefixo maior (mais específico)
-        if prefix_sub <= prefix_net:
-            return False
+    def _poisoned(self, neighbor_address):
+        return {
+            network: {'cost': self.infinity, 'next_hop': route_info['next_hop']}
+            for network, route_info in self._learned[neighbor_address].items()
+        }
 
-        # Converte IPs para inteiros
-        ip_sub_int = ip_to_int(ip_sub)
-        ip_net_int = ip_to_int(ip_net)
+    def view(self, neighbor_address):
+        """Retorna a tabela a anunciar para o vizinho."""
+        view = dict(self._shared)
+        for other_address, routes in self._learned.items():
+            if other_address != neighbor_address:
+                view.update(routes)
+        if self.poison:
+            view.update(self._poisoned(neighbor_address))
+        return view
 
-        # Cria a máscara de rede para a rede maior (network_str)
-        mask_net = ((1 << 32) - 1) << (32 - prefix_net)
+    def json_payload(self, neighbor_address):
+        """Retorna a mensagem JSON para o vizinho, no mesmo formato de json.dumps."""
+        if self._fragments is None:
+            self._fragments = {None: json.dumps(self._shared)[1:-1]}
+            for other_address, routes in self._learned.items():
+                self._fragments[other_address] = json.dumps(routes)[1:-1]
 
-        # Verifica se o endereço de rede de ambos é o mesmo quando a máscara maior é aplicada
-        return (ip_sub_int & mask_net) == (ip_net_int & mask_net)
-    except (ValueError, IndexError):
-        # Retorna False se o formato for inválido (ex: '127.0.0.1:5001')
-        return False
+        parts = [fragment for other_address, fragment in self._fragments.items()
+                 if other_address != neighbor_address and fragment]
+        if self.poison and self._learned[neighbor_address]:
+            parts.append(json.dumps(self._poisoned(neighbor_address))[1:-1])
+        return ('{"sender_address": %s, "routing_table": {%s}}' % (
+            json.dumps(self.sender_address), ', '.join(parts))).encode('utf-8')
 
 class Router:
     """
     Representa um roteador que executa o algoritmo de Vetor de Distância.
     """
 
-    def __init__(self, my_address, neighbors, my_network, update_interval=1):
+    def __init__(self, my_address, neighbors, my_network, update_interval=1, absorb_routes=False,
+                 triggered_delay=1.0, refresh_interval=None, binary_updates=True, clock=time.time, sender=None,
+                 start_threads=True, split_horizon=None, infinity=INFINITY,
+                 snapshot_file=None, snapshot_interval=30, warm_start=False, dynamic_costs=None,
+                 damping=None):
         """
         Inicializa o roteador.
 
@@ -150,71 +1872,632 @@ class Router:
         :param my_network: A rede que este roteador administra diretamente.
                            Ex: '10.0.1.0/24'
         :param update_interval: O intervalo em segundos para enviar atualizações, o tempo que o roteador espera 
-                                antes de enviar atualizações para os vizinhos.        """
+                                antes de enviar atualizações para os vizinhos. Com as atualizações
+                                disparadas ativas, é a base do refresh_interval padrão.
+        :param absorb_routes: Se True, a sumarização também absorve rotas mais específicas
+                              contidas em uma super-rede com o mesmo next_hop.
+        :param triggered_delay: Janela em segundos para agrupar mudanças em uma atualização
+                                disparada (apenas com as rotas alteradas). None desativa as
+                                atualizações disparadas, mantendo só as periódicas.
+        :param refresh_interval: Intervalo em segundos entre os envios da tabela completa,
+                                 que renovam as rotas nos vizinhos; os prazos de expiração
+                                 são múltiplos dele. None usa update_interval sem
+                                 atualizações disparadas e REFRESH_INTERVAL_FACTOR vezes
+                                 update_interval com elas.
+        :param binary_updates: Se True, usa o formato binário com os vizinhos que o suportam;
+                               os demais continuam recebendo JSON.
+        :param clock: Função que retorna o horário atual em segundos (usada nos timestamps
+                      e prazos de expiração). O simulador passa um relógio virtual.
+        :param sender: Objeto com a interface de NeighborSender (send, mark_alive,
+                       accepts_binary). Por padrão, envia por HTTP.
+        :param start_threads: Se False, não inicia as threads de atualização e de
+                              expiração; quem usa o roteador chama send_updates_to_neighbors,
+                              send_triggered_update e expire_routes (ex: o simulador).
+        :param split_horizon: None (desativado), 'simple' (não anuncia a um vizinho as rotas
+                              aprendidas dele) ou 'poison' (anuncia essas rotas com custo
+                              infinito, poisoned reverse).
+        :param infinity: Custo que representa uma rede inalcançável (16, como no RIP).
+        :param snapshot_file: Arquivo onde a tabela é gravada a cada snapshot_interval
+                              segundos (se mudou) e ao encerrar. None desativa os snapshots.
+        :param snapshot_interval: Intervalo em segundos entre os snapshots.
+        :param warm_start: Se True, carrega as rotas de snapshot_file na inicialização
+                           (veja load_snapshot) e as anuncia imediatamente.
+        :param dynamic_costs: None mantém os custos do CSV. Um dicionário (vazio para os
+                              padrões) com os parâmetros de LinkCostEstimator ativa os
+                              custos dinâmicos: os custos em `neighbors` passam a ser
+                              derivados do RTT e das perdas dos envios a cada vizinho
+                              (veja observe_link).
+        :param damping: None desativa o amortecimento de oscilações. Um dicionário (vazio
+                        para os padrões) com os parâmetros de RouteDamping o ativa: redes
+                        que oscilam demais deixam de ser anunciadas até estabilizarem.
+        """
         self.my_address = my_address
         self.neighbors = neighbors
         self.my_network = my_network
         self.update_interval = update_interval
+        self.absorb_routes = absorb_routes
+        self.triggered_delay = triggered_delay
+        if refresh_interval is None:
+            refresh_interval = update_interval * (1 if triggered_delay is None else REFRESH_INTERVAL_FACTOR)
+        self.refresh_interval = refresh_interval
+        self.binary_updates = binary_updates
+        self.clock = clock
+        if split_horizon not in (None, 'simple', 'poison'):
+            raise ValueError(f"split_horizon inválido: {split_horizon}")
+        self.split_horizon = split_horizon
+        self.infinity = infinity
+        self.snapshot_file = snapshot_file
+        self.snapshot_interval = snapshot_interval
 
-        # Inicializa a tabela de roteamento
-        self.routing_table = {}
-        
-        # Adiciona a rota para a rede local (custo 0)
-        self.routing_table[self.my_network] = {
-            'cost': 0,
-            'next_hop': self.my_network,
-            'timestamp': time.time()
-        }
-        
-        # Adiciona as rotas para os vizinhos diretos
-        for neighbor_address, cost in self.neighbors.items():
-            # Para vizinhos diretos, assumimos que eles administram suas próprias redes
-            # Como não sabemos exatamente qual rede cada vizinho administra,
-            # vamos criar uma entrada temporária que será atualizada quando recebermos
-            # as informações deles
-            self.routing_table[neighbor_address] = {
-                'cost': cost,
-                'next_hop': neighbor_address,
-                'timestamp': time.time()
+        # Estimativas de custo por vizinho (custos dinâmicos); vazio com os custos fixos
+        self.link_estimators = {}
+        if dynamic_costs is not None:
+            self.link_estimators = {
+                neighbor_address: LinkCostEstimator(cost, max_cost=infinity, **dynamic_costs)
+                for neighbor_address, cost in neighbors.items()
             }
+        self._links_lock = threading.Lock()
+        # Incrementada a cada medida registrada (entra na ETag do /routes)
+        self.links_version = 0
+
+        # Penalidades de oscilação por rede (alteradas com table_lock)
+        self.damping = RouteDamping(**damping) if damping is not None else None
+
+        # Rede local já convertida, para filtrar sem reprocessar a string a cada rota
+        # as rotas sumarizadas recebidas que a contêm
+        self._my_network_key = network_to_int(my_network)
+        self._my_route_key = route_key(my_network)
+
+        # Uma rota sem atualizações por route_timeout segundos é envenenada (custo
+        # infinito) e anunciada assim por gc_timeout segundos antes de ser removida.
+        # As rotas que não mudam só são renovadas pela tabela completa, então os
+        # prazos acompanham o refresh_interval
+        self.route_timeout = refresh_interval * 4
+        self.gc_timeout = refresh_interval * 4
+        # Rotas carregadas de um snapshot precisam ser confirmadas pelos vizinhos
+        # dentro deste prazo, ou expiram como qualquer rota sem atualizações
+        self.stale_timeout = refresh_interval * 2
+
+        # Serializa as alterações na tabela de roteamento (atualizações e timeouts)
+        self.table_lock = threading.RLock()
+
+        # Prazos de expiração: heap de (prazo, entradas da tabela), um item por
+        # prazo, e _expiry_lists com a lista de entradas de cada prazo no heap (as
+        # rotas gravadas na mesma atualização entram na mesma lista). O prazo
+        # vigente de cada rota fica na coluna de prazos da tabela; renovar uma
+        # rota a coloca na lista do novo prazo, e as entradas antigas são
+        # descartadas quando não batem mais com a coluna. _scheduled conta as
+        # entradas no heap, para compactá-lo quando as antigas se acumulam.
+        self._expiry_heap = []
+        self._expiry_lists = {}
+        self._scheduled = 0
+        self._expiry_cond = threading.Condition(self.table_lock)
+
+        # Atualizações recebidas desde o último ciclo periódico (para o resumo no log)
+        self._updates_received = 0
+        self._updates_changed = 0
+
+        # Último anúncio enviado aos vizinhos, base para calcular as atualizações disparadas
+        self._last_advertised = {}
+        self._advertise_lock = threading.Lock()
+        self._triggered_event = threading.Event()
+
+        # Cache do anúncio: [versão da tabela, tabela sumarizada, mensagens já montadas]
+        # (as mensagens são montadas sob demanda, veja _build_messages)
+        self._advertisement = None
+
+        # Versão da tabela gravada no último snapshot (só grava de novo se mudou)
+        self._snapshot_version = None
+        self._snapshot_lock = threading.Lock()
+
+        # Métricas expostas em /metrics; last_change é o horário da última mudança na tabela
+        self.metrics = router_metrics()
+        self.last_change = self.clock()
+        self._summary_ratio = 1.0
 
-        print("Tabela de roteamento inicial:")
-        print(json.dumps(self.routing_table, indent=4))
+        # Envio paralelo com conexões persistentes para cada vizinho
+        self.sender = sender if sender is not None else NeighborSender(
+            self.neighbors, metrics=self.metrics,
+            on_result=self.observe_link if self.link_estimators else None
+        )
+
+        # Inicializa a tabela de roteamento
+        self.routing_table = RoutingTable()
+        now = self.clock()
+
+        with self.table_lock:
+            # Adiciona a rota para a rede local (custo 0), que nunca expira
+            self.routing_table.set_route(self.my_network, 0, self.my_network, now)
+
+            # Adiciona as rotas para os vizinhos diretos
+            for neighbor_address, cost in self.neighbors.items():
+                # Para vizinhos diretos, assumimos que eles administram suas próprias redes
+                # Como não sabemos exatamente qual rede cada vizinho administra,
+                # vamos criar uma entrada temporária que será atualizada quando recebermos
+                # as informações deles
+                self._set_route(neighbor_address, cost, neighbor_address, now)
+
+        warm = bool(warm_start and self.snapshot_file and self.load_snapshot())
+
+        log.info("Tabela de roteamento inicial com %d rota(s)", len(self.routing_table))
+        log_table("Tabela de roteamento inicial:", self.routing_table)
+
+        if not start_threads:
+            return
 
         # Inicia o processo de atualização periódica em uma thread separada
         self._start_periodic_updates()
 
-        timeout_thread = threading.Thread(target=self._check_route_timeouts)
-        timeout_thread.daemon = True
-        timeout_thread.start()
+        expiry_thread = threading.Thread(target=self._expiry_loop)
+        expiry_thread.daemon = True
+        expiry_thread.start()
 
-    def _check_route_timeouts(self):
-        """Verifica e remove rotas expiradas periodicamente."""
-        # Define o timeout como 4 vezes o intervalo de atualização
-        TIMEOUT_DURATION = self.update_interval * 4
+        if self.triggered_delay is not None:
+            triggered_thread = threading.Thread(target=self._triggered_update_loop)
+            triggered_thread.daemon = True
+            triggered_thread.start()
+            if not warm:
+                # Anuncia a tabela inicial sem esperar o primeiro ciclo periódico
+                self._schedule_triggered_update()
 
-        while True:
-            time.sleep(TIMEOUT_DURATION)
+        if warm:
+            # Anuncia as rotas do snapshot já, sem a janela das disparadas, para
+            # que os vizinhos as confirmem (ou corrijam) em uma rodada
+            announce_thread = threading.Thread(target=self.send_updates_to_neighbors)
+            announce_thread.daemon = True
+            announce_thread.start()
 
-            # Cria uma cópia das chaves para poder modificar o dicionário
-            routes_to_check = list(self.routing_table.keys())
-            table_changed = False
+        if self.snapshot_file:
+            snapshot_thread = threading.Thread(target=self._snapshot_loop)
+            snapshot_thread.daemon = True
+            snapshot_thread.start()
+            atexit.register(self._save_snapshot_logged)
 
-            for network in routes_to_check:
-                # Não remove a rota para a própria rede local
-                if self.routing_table[network]['cost'] == 0:
-                    continue
+    def lookup(self, ip):
+        """
+        Retorna a melhor rota (maior prefixo) para o endereço IP informado, no
+        formato {'network', 'cost', 'next_hop'}, ou None se nenhuma rede o contém.
+        """
+        # Rotas em hold-down (custo infinito) não servem para encaminhar
+        match = self.routing_table.lookup(ip_to_int(ip), usable=lambda route: route['cost'] < self.infinity)
+        if match is None:
+            return None
+        network, route_info = match
+        return {
+            'network': network,
+            'cost': route_info['cost'],
+            'next_hop': route_info['next_hop']
+        }
+
+    def _set_route(self, network, cost, next_hop, now):
+        """
+        Grava uma rota e agenda sua expiração. Deve ser chamado com table_lock.
+        Rotas com custo infinito ficam em hold-down até serem removidas.
+
+        :param network: A rede ou sua chave na tabela (veja route_key).
+        """
+        key = route_key(network)
+        if self.damping is not None and key != self._my_route_key:
+            self._record_flap(key_network(key), cost, now)
+        self.routing_table.set_route(key, cost, next_hop, now)
+        self._schedule_expiries((key,), now + (self.gc_timeout if cost >= self.infinity else self.route_timeout))
+
+    def _record_flap(self, network, cost, now):
+        """
+        Penaliza a rede se a nova rota é uma oscilação: uma retirada (rota
+        alcançável que passa a infinita) ou um reanúncio (rota em hold-down, ou
+        removida com penalidade ainda registrada, que volta a ser alcançável).
+        Mudanças de custo ou de next_hop de uma rota alcançável não contam.
+        Deve ser chamado com table_lock, antes de gravar a rota.
+        """
+        current = self.routing_table.get_entry(network)
+        if cost >= self.infinity:
+            if current is None or current[0] >= self.infinity:
+                return
+            kind, penalty = 'withdraw', self.damping.withdraw_penalty
+        else:
+            if current is not None and current[0] < self.infinity:
+                return
+            if current is None and not self.damping.known(network):
+                return
+            kind, penalty = 'readvertise', self.damping.readvertise_penalty
+
+        self.metrics.inc('roteador_route_flaps_total', kind=kind)
+        if self.damping.penalize(network, penalty, now):
+            self.metrics.inc('roteador_route_suppressions_total')
+            log.info("Rota para %s suprimida por oscilar demais; deixa de ser anunciada", network)
+
+    def damping_status(self):
+        """Retorna as penalidades de oscilação (veja RouteDamping.status), ou {} sem amortecimento."""
+        if self.damping is None:
+            return {}
+        with self.table_lock:
+            return self.damping.status(self.clock())
+
+    def _refresh_routes(self, keys, now):
+        """
+        Renova rotas anunciadas de novo sem mudanças (chaves de route_key): só
+        adia os prazos. Todas recebem o mesmo prazo, registrado de uma vez no heap.
+        """
+        self.routing_table.touch(keys, now)
+        self._schedule_expiries(keys, now + self.route_timeout)
+
+    def _remove_route(self, network):
+        """Remove uma rota da tabela; o prazo dela sai junto, na coluna da tabela."""
+        del self.routing_table[network]
+
+    def _schedule_expiries(self, keys, deadline):
+        """Registra o mesmo prazo de expiração para várias rotas (chaves de route_key)."""
+        if not keys:
+            return
+        with self._expiry_cond:
+            slots = self.routing_table.set_deadlines(keys, deadline)
+            pending = self._expiry_lists.get(deadline)
+            if pending is None:
+                pending = self._expiry_lists[deadline] = []
+                heapq.heappush(self._expiry_heap, (deadline, pending))
+            pending.extend(slots)
+            self._scheduled += len(slots)
+
+            # Compacta o heap quando as entradas antigas (renovadas) se acumulam:
+            # só as rotas no seu prazo vigente continuam
+            if self._scheduled > 2 * len(self.routing_table) + 64:
+                self._expiry_lists = self.routing_table.deadlines()
+                self._expiry_heap = list(self._expiry_lists.items())
+                heapq.heapify(self._expiry_heap)
+                self._scheduled = sum(map(len, self._expiry_lists.values()))
+
+            # Acorda a thread de expiração se este passou a ser o prazo mais próximo
+            if self._expiry_heap[0][0] == deadline:
+                self._expiry_cond.notify()
+
+    def _expiry_loop(self):
+        """Thread que dorme até o próximo prazo do heap e processa as rotas vencidas."""
+        with self._expiry_cond:
+            while True:
+                self._expire_routes(self.clock())
+                timeout = self._expiry_heap[0][0] - self.clock() if self._expiry_heap else None
+                self._expiry_cond.wait(timeout)
+
+    def next_expiry(self):
+        """Retorna o prazo de expiração mais próximo no heap, ou None se não houver."""
+        with self.table_lock:
+            return self._expiry_heap[0][0] if self._expiry_heap else None
+
+    def expire_routes(self, now=None):
+        """
+        Processa as rotas vencidas até o instante now (padrão: o relógio do roteador),
+        para quando o roteador é executado sem threads.
+
+        :return: True se a tabela de roteamento mudou.
+        """
+        with self.table_lock:
+            return self._expire_routes(self.clock() if now is None else now)
+
+    def _expire_routes(self, now):
+        """
+        Processa as rotas com prazo vencido. Deve ser chamado com table_lock.
+
+        Uma rota ativa que venceu é envenenada (custo infinito) e entra em hold-down,
+        sendo anunciada assim aos vizinhos; uma rota em hold-down que venceu é removida.
+
+        :return: True se alguma rota foi envenenada ou removida.
+        """
+        poisoned = removed = 0
+        table = self.routing_table
+        # _set_route pode compactar o heap, trocando a lista: lida de novo a cada item
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            deadline, slots = heapq.heappop(self._expiry_heap)
+            del self._expiry_lists[deadline]
+            self._scheduled -= len(slots)
+            # Entradas com prazo antigo (rotas renovadas ou removidas) ficam de fora
+            for key in table.due(slots, deadline):
+                cost, next_hop = table.get_entry(key)
+                if cost >= self.infinity:
+                    log.debug("Rota para %s saiu do hold-down. Removendo.", key_network(key))
+                    self._remove_route(key)
+                    removed += 1
+                else:
+                    log.debug("Rota para %s expirou (sem atualizações). Envenenando.", key_network(key))
+                    self._set_route(key, self.infinity, next_hop, now)
+                    poisoned += 1
+
+        if poisoned or removed:
+            self.last_change = now
+            if poisoned:
+                self.metrics.inc('roteador_route_expiries_total', poisoned, kind='poisoned')
+            if removed:
+                self.metrics.inc('roteador_route_expiries_total', removed, kind='removed')
+            log.info("%d rota(s) expiraram e foram envenenadas, %d removida(s) após o hold-down; "
+                     "tabela com %d rota(s)", poisoned, removed, len(self.routing_table))
+            log_table("Nova tabela de roteamento após timeouts:", self.routing_table)
+            if poisoned:
+                self._schedule_triggered_update()
+        return bool(poisoned or removed)
+
+    def apply_update(self, sender_address, sender_table):
+        """
+        Aplica a tabela recebida de um vizinho no formato do JSON
+        ({rede: {'cost', 'next_hop'}}). Veja apply_routes.
+
+        :return: True se a tabela de roteamento mudou.
+        """
+        if np is not None and len(sender_table) >= BATCH_MIN_ROUTES:
+            return self.apply_routes(sender_address, RouteBatch.from_table(sender_table))
+        return self.apply_routes(
+            sender_address,
+            ((network, route_info['cost'], route_info.get('next_hop'))
+             for network, route_info in sender_table.items())
+        )
+
+    def apply_routes(self, sender_address, routes):
+        """
+        Aplica as rotas recebidas de um vizinho (Bellman-Ford).
+
+        Rotas anunciadas com custo infinito (ou que chegariam a ele somando o
+        custo do link) são tratadas como retiradas: se a rota atual usa esse
+        vizinho como next_hop, ela é envenenada e entra em hold-down. Rotas
+        anunciadas de novo sem mudanças têm apenas o prazo de expiração renovado.
 
-                route_age = time.time() - self.routing_table[network]['timestamp']
+        :param routes: Iterável de tuplas (rede, custo anunciado, next_hop do vizinho),
+                       ou um RouteBatch, relaxado de forma vetorizada.
+        :return: True se a tabela de roteamento mudou.
+        """
+        return self.apply_route_batches(sender_address, (routes,))
+
+    def apply_route_batches(self, sender_address, batches):
+        """
+        Aplica uma atualização recebida em lotes (ex: lida em streaming por
+        JsonUpdateStream). Cada lote é relaxado com a tabela bloqueada, e o lock
+        é liberado entre um lote e outro, então atualizações de outros vizinhos
+        e timeouts não esperam a atualização inteira. Os lotes são consumidos
+        fora do lock. Se um lote falhar (ex: corpo malformado), os anteriores
+        continuam aplicados, como se o vizinho tivesse enviado uma atualização menor.
+
+        :param batches: Iterável de lotes no formato de apply_routes.
+        :return: True se a tabela de roteamento mudou.
+        """
+        # O vizinho está respondendo: volta a enviar para ele sem esperar o backoff
+        self.sender.mark_alive(sender_address)
 
-                if route_age > TIMEOUT_DURATION:
-                    print(f"INFO: Rota para {network} expirou (sem atualizações). Removendo.")
-                    del self.routing_table[network]
-                    table_changed = True
+        # Todas as alterações da tabela passam pelo mesmo lock, serializando
+        # atualizações concorrentes e a verificação de timeouts
+        with self.table_lock:
+            # Receber a atualização também confirma a rota direta para o próprio vizinho
+            added, updated, withdrawn = self._relax_routes(
+                sender_address, [(sender_address, 0, sender_address)], self.clock()
+            )
 
+        try:
+            for routes in batches:
+                if np is not None and isinstance(routes, list) and len(routes) >= BATCH_MIN_ROUTES:
+                    routes = RouteBatch.from_routes(routes)
+                with self.table_lock:
+                    now = self.clock()
+                    if isinstance(routes, RouteBatch):
+                        counts = self._relax_batch(sender_address, routes, now)
+                    else:
+                        counts = self._relax_routes(sender_address, routes, now)
+                    added += counts[0]
+                    updated += counts[1]
+                    withdrawn += counts[2]
+        finally:
+            table_changed = bool(added or updated or withdrawn)
+            self._updates_received += 1
+            self._updates_changed += table_changed
             if table_changed:
-                print("Nova tabela de roteamento após timeouts:")
-                print(json.dumps(self.routing_table, indent=4))
+                self.last_change = self.clock()
+                # Lotes já aplicados são anunciados mesmo se um lote seguinte falhar
+                self._schedule_triggered_update()
+
+        self.metrics.observe('roteador_routes_changed_per_update', added + updated + withdrawn)
+
+        if table_changed:
+            log.info("Atualização de %s: %d nova(s), %d alterada(s), %d retirada(s); tabela com %d rota(s)",
+                     sender_address, added, updated, withdrawn, len(self.routing_table))
+        return table_changed
+
+    def _contains_my_network(self, key):
+        """
+        Equivalente a is_subnet(my_network, rede), a partir da chave da rota
+        (veja route_key) e da rede local já convertida, sem interpretar texto.
+        """
+        if key.__class__ is not int or self._my_network_key is None:
+            return False
+        my_int, my_prefix = self._my_network_key
+        prefix_len = key & 63
+        return prefix_len < my_prefix and ((key >> 6) ^ my_int) >> (32 - prefix_len) == 0
+
+    def observe_link(self, neighbor_address, rtt):
+        """
+        Registra uma medida do enlace com um vizinho: o tempo de resposta em segundos
+        de um envio, ou None se ele falhou. Chamado pelo NeighborSender a cada envio
+        quando os custos dinâmicos estão ativos; com outro sender, quem mede chama
+        diretamente. Sem custos dinâmicos, não faz nada.
+
+        :return: True se o custo do enlace mudou (veja set_link_cost).
+        """
+        estimator = self.link_estimators.get(neighbor_address)
+        if estimator is None:
+            return False
+        with self._links_lock:
+            cost = estimator.observe(rtt)
+            self.links_version += 1
+        if cost is None:
+            return False
+        return self.set_link_cost(neighbor_address, cost)
+
+    def link_status(self):
+        """Retorna o estado da estimativa de custo de cada enlace (custos dinâmicos)."""
+        with self._links_lock:
+            return {
+                neighbor_address: estimator.as_dict()
+                for neighbor_address, estimator in self.link_estimators.items()
+            }
+
+    def set_link_cost(self, neighbor_address, cost):
+        """
+        Troca o custo do enlace com um vizinho e reaplica a diferença às rotas que
+        passam por ele, sem esperar a próxima atualização do vizinho. Rotas que
+        chegariam ao infinito são envenenadas; as demais mantêm o prazo de
+        expiração, já que a mudança não confirma que o vizinho ainda as anuncia.
+        Rotas por outros vizinhos que ficarem melhores por este são trocadas
+        na próxima atualização dele.
+
+        :return: True se o custo mudou.
+        """
+        with self.table_lock:
+            old_cost = self.neighbors.get(neighbor_address)
+            if old_cost is None or old_cost == cost:
+                return False
+            self.neighbors[neighbor_address] = cost
+            delta = cost - old_cost
+            now = self.clock()
+
+            changed = 0
+            for network, _, route_cost, next_hop in self.routing_table.entries():
+                if next_hop != neighbor_address or route_cost >= self.infinity:
+                    continue
+                new_cost = route_cost + delta
+                if new_cost >= self.infinity:
+                    self._set_route(network, self.infinity, next_hop, now)
+                else:
+                    timestamp = self.routing_table[network]['timestamp']
+                    self.routing_table.set_route(network, new_cost, next_hop, timestamp)
+                changed += 1
+
+            if changed:
+                self.last_change = now
+                self._schedule_triggered_update()
+
+        self.metrics.inc('roteador_link_cost_changes_total', neighbor=neighbor_address,
+                         direction='up' if delta > 0 else 'down')
+        log.info("Custo do enlace com %s: %d -> %d; %d rota(s) ajustada(s)",
+                 neighbor_address, old_cost, cost, changed)
+        return True
+
+    def _relax_routes(self, sender_address, routes, now):
+        """
+        Relaxa as rotas uma a uma. Deve ser chamado com table_lock.
+
+        :return: Tupla (novas, alteradas, retiradas).
+        """
+        # Obtém o custo do link direto para este vizinho
+        direct_link_cost = self.neighbors[sender_address]
+        added = updated = withdrawn = 0
+        # Rotas só renovadas, registradas de uma vez no heap de expiração ao final
+        refreshed = []
+
+        # Processa cada rota na tabela recebida
+        for network, cost, _ in routes:
+
+            if network == self.my_address:
+                continue
+
+            key = route_key(network)
+            if self._contains_my_network(key):
+                log.debug("Ignorando rota sumarizada '%s' de %s pois contém minha rede local.", network, sender_address)
+                continue
+
+            # Calcula o novo custo para chegar à rede através deste vizinho
+            new_cost = direct_link_cost + cost
+            current_route = self.routing_table.get_entry(key)
+
+            if new_cost >= self.infinity:
+                # Rede inalcançável por este vizinho: só importa se é por ele que chegamos
+                # lá e se a rota ainda não está em hold-down
+                if current_route is not None and current_route[1] == sender_address \
+                        and current_route[0] < self.infinity:
+                    self._set_route(key, self.infinity, sender_address, now)
+                    withdrawn += 1
+                    log.debug("Rota retirada: %s inalcançável via %s", network, sender_address)
+                continue
+
+            # Verifica se já conhecemos esta rede
+            if current_route is not None:
+                current_cost, current_next_hop = current_route
+
+                # Atualiza se o novo caminho for melhor OU se o next_hop for o sender
+                if (new_cost < current_cost) or (current_next_hop == sender_address):
+                    if new_cost != current_cost or current_next_hop != sender_address:
+                        self._set_route(key, new_cost, sender_address, now)
+                        updated += 1
+                        log.debug("Rota atualizada: %s -> custo %s via %s", network, new_cost, sender_address)
+                    else:
+                        refreshed.append(key)
+            else:
+                # Nova rede descoberta
+                self._set_route(key, new_cost, sender_address, now)
+                added += 1
+                log.debug("Nova rota descoberta: %s -> custo %s via %s", network, new_cost, sender_address)
+
+        self._refresh_routes(refreshed, now)
+        return added, updated, withdrawn
+
+    def _relax_batch(self, sender_address, batch, now):
+        """
+        Mesma relaxação de _relax_routes sobre um RouteBatch inteiro: o estado atual
+        das redes do lote é lido da tabela em uma passada, as decisões (retirar,
+        adicionar, atualizar, só renovar) são máscaras calculadas pelo NumPy e só
+        as rotas selecionadas voltam ao Python para serem gravadas. Deve ser
+        chamado com table_lock.
+
+        :return: Tupla (novas, alteradas, retiradas).
+        """
+        # Uma rede repetida no lote (possível no binário e no JSON em streaming)
+        # fica só com a rota de menor custo, senão a última gravada venceria
+        batch = batch.deduplicated()
+        n = len(batch)
+        if n == 0:
+            return 0, 0, 0
+        # As redes em texto não são usadas: a tabela é consultada pelas chaves
+        keys = batch.keys()
+        new_cost = batch.costs + self.neighbors[sender_address]
+
+        # Filtro das rotas sumarizadas que contêm a rede local (is_subnet vetorizado)
+        prefixes = batch.prefixes
+        skip = np.zeros(n, dtype=bool)
+        if self._my_network_key is not None:
+            my_int, my_prefix = self._my_network_key
+            candidates = prefixes < my_prefix
+            shift = np.where(candidates, 32 - prefixes, 0)
+            skip = candidates & ((batch.net_ints >> shift) == (my_int >> shift))
+            if skip.any() and log.isEnabledFor(logging.DEBUG):
+                for i in np.flatnonzero(skip).tolist():
+                    log.debug("Ignorando rota sumarizada '%s' de %s pois contém minha rede local.",
+                              key_network(keys[i]), sender_address)
+
+        # Estado atual das redes do lote
+        current = self.routing_table.get_entries(keys)
+        exists = np.fromiter((route is not None for route in current), bool, n)
+        current_cost = np.fromiter((route[0] if route is not None else 0 for route in current), np.int64, n)
+        via_sender = np.fromiter(
+            (route is not None and route[1] == sender_address for route in current), bool, n)
+        # Rotas para o próprio endereço (raras) são localizadas pela busca da lista, em C
+        start = 0
+        while True:
+            try:
+                start = keys.index(self.my_address, start)
+            except ValueError:
+                break
+            skip[start] = True
+            start += 1
+
+        reachable = ~skip & (new_cost < self.infinity)
+        withdraw = ~skip & ~reachable & exists & via_sender & (current_cost < self.infinity)
+        add = reachable & ~exists
+        accept = reachable & exists & ((new_cost < current_cost) | via_sender)
+        change = accept & ((new_cost != current_cost) | ~via_sender)
+        refresh = accept & ~change
+
+        for i in np.flatnonzero(withdraw).tolist():
+            self._set_route(keys[i], self.infinity, sender_address, now)
+        costs = new_cost.tolist()
+        for i in np.flatnonzero(add | change).tolist():
+            self._set_route(keys[i], costs[i], sender_address, now)
+        self._refresh_routes([keys[i] for i in np.flatnonzero(refresh).tolist()], now)
+
+        return int(add.sum()), int(change.sum()), int(withdraw.sum())
 
     def _start_periodic_updates(self):
         """Inicia uma thread para enviar atualizações periodicamente."""
@@ -223,61 +2506,430 @@ class Router:
         thread.start()
 
     def _periodic_update_loop(self):
-        """Loop que envia atualizações de roteamento em intervalos regulares."""
+        """Loop que envia a tabela completa a cada refresh_interval segundos."""
         while True:
-            time.sleep(self.update_interval)
-            print(f"[{time.ctime()}] Enviando atualizações periódicas para os vizinhos...")
+            time.sleep(self.refresh_interval)
+            # Resumo do ciclo em uma linha, no lugar de uma mensagem por atualização
+            log.info("Enviando atualizações periódicas: tabela com %d rota(s); %d atualização(ões) "
+                     "recebida(s) desde o último ciclo, %d com mudanças",
+                     len(self.routing_table), self._updates_received, self._updates_changed)
+            self._updates_received = self._updates_changed = 0
             try:
                 self.send_updates_to_neighbors()
             except Exception as e:
-                print(f"Erro durante a atualização periódida: {e}")
+                log.error("Erro durante a atualização periódica: %s", e)
 
-    def send_updates_to_neighbors(self):
+    def _get_advertisement(self):
         """
-        Envia a tabela de roteamento para todos os vizinhos.
-        Esta versão NÃO usa Split Horizon, para permitir a simulação de falhas.
+        Retorna a tabela sumarizada da versão atual da tabela de roteamento. Ela só
+        é recalculada quando a tabela muda; enquanto isso, a mesma tabela (e as
+        mensagens montadas a partir dela) é reaproveitada entre os ciclos de
+        atualização e entre os vizinhos.
         """
-        # Aplica sumarização na cópia da tabela
-        tabela_para_enviar = summarize_routes(self.routing_table)
+        damping = self.damping
+        if damping is not None:
+            with self.table_lock:
+                released = damping.release(self.clock())
+            if released:
+                log.info("%d rota(s) liberada(s) pelo amortecimento: %s", len(released), ', '.join(released))
 
-        payload = {
-            "sender_address": self.my_address,
-            "routing_table": tabela_para_enviar
-        }
+        version = (self.routing_table.version, damping.version if damping is not None else 0)
+        if self._advertisement is None or self._advertisement[0] != version:
+            # Sumariza a partir de um retrato das rotas (sem dicionários por rota),
+            # tirado com a tabela bloqueada
+            with self.table_lock:
+                version = (self.routing_table.version, damping.version if damping is not None else 0)
+                entries = self.routing_table.entries()
+                if damping is not None and damping.suppressed:
+                    # Redes suprimidas ficam fora do anúncio; nas disparadas, as que
+                    # já tinham sido anunciadas vão com custo infinito
+                    suppressed = damping.suppressed
+                    entries = [entry for entry in entries if entry[0] not in suppressed]
+            started = time.perf_counter()
+            tabela_para_enviar = summarize_entries(entries, absorb=self.absorb_routes, infinity=self.infinity)
+            self.metrics.observe('roteador_summarize_seconds', time.perf_counter() - started)
+            self._summary_ratio = len(tabela_para_enviar) / len(entries) if entries else 1.0
+            self._advertisement = [version, tabela_para_enviar, {}]
+        return self._advertisement[1]
+
+    def _build_messages(self, table, cache=None):
+        """
+        Monta a mensagem de cada vizinho: binária para quem a aceita, JSON para os
+        demais. Com Split Horizon, cada vizinho recebe a sua visão da tabela
+        (veja AdvertisementViews); sem ele, todos recebem a mesma mensagem.
 
+        :param cache: Dicionário onde guardar as mensagens montadas, para
+                      reaproveitá-las enquanto a tabela não mudar.
+        """
+        if cache is None:
+            cache = {}
+        views = None
+        messages = {}
         for neighbor_address in self.neighbors:
-            url = f'http://{neighbor_address}/receive_update'
+            binary = self.binary_updates and self.sender.accepts_binary(neighbor_address)
+            key = (neighbor_address if self.split_horizon else None, binary)
+            message = cache.get(key)
+            if message is None:
+                if self.split_horizon and views is None:
+                    views = AdvertisementViews(self.my_address, table, self.neighbors,
+                                               poison=self.split_horizon == 'poison', infinity=self.infinity)
+                if binary:
+                    view = views.view(neighbor_address) if views else table
+                    try:
+                        message = (BINARY_CONTENT_TYPE, encode_binary_update(self.my_address, view))
+                    except ValueError as e:
+                        # Tabela que não cabe no formato binário: vai em JSON
+                        log.warning("Atualização para %s enviada em JSON: %s", neighbor_address, e)
+                if message is None and views:
+                    message = ('application/json', views.json_payload(neighbor_address))
+                elif message is None:
+                    message = ('application/json', json.dumps({
+                        "sender_address": self.my_address,
+                        "routing_table": table
+                    }).encode('utf-8'))
+                cache[key] = message
+            messages[neighbor_address] = message
+        return messages
+
+    def send_updates_to_neighbors(self):
+        """
+        Envia a tabela de roteamento para todos os vizinhos (com Split Horizon, se
+        ativado; sem ele, como no enunciado, para permitir a simulação de falhas).
+        """
+        with self._advertise_lock:
+            tabela_para_enviar = self._get_advertisement()
+            self._last_advertised = tabela_para_enviar
+            messages = self._build_messages(tabela_para_enviar, cache=self._advertisement[2])
+        self.sender.send(messages)
+
+    def render_metrics(self):
+        """Retorna as métricas do roteador no formato de texto do Prometheus."""
+        return self.metrics.render(gauges=(
+            ('roteador_routing_table_routes', "Rotas na tabela de roteamento (inclusive em hold-down).",
+             len(self.routing_table)),
+            ('roteador_routing_table_version', "Versão da tabela (incrementada a cada alteração).",
+             self.routing_table.version),
+            ('roteador_seconds_since_last_change', "Segundos desde a última mudança na tabela.",
+             max(0.0, self.clock() - self.last_change)),
+            ('roteador_summarization_ratio', "Rotas anunciadas / rotas na tabela na última sumarização.",
+             self._summary_ratio),
+            ('roteador_damped_routes', "Rotas suprimidas pelo amortecimento de oscilações.",
+             len(self.damping.suppressed) if self.damping is not None else 0),
+        ))
+
+    def save_snapshot(self):
+        """
+        Grava as rotas válidas (as em hold-down ficam de fora) em snapshot_file.
+
+        :return: True se gravou; False se a tabela não mudou desde o último snapshot.
+        """
+        with self._snapshot_lock:
+            with self.table_lock:
+                version = self.routing_table.version
+                if version == self._snapshot_version:
+                    return False
+                entries = self.routing_table.entries()
+            table = {
+                network: {'cost': cost, 'next_hop': next_hop}
+                for network, _, cost, next_hop in entries
+                if cost < self.infinity
+            }
+            write_snapshot(self.snapshot_file, self.my_address, table, self.clock())
+            self._snapshot_version = version
+        log.debug("Snapshot com %d rota(s) gravado em %s", len(table), self.snapshot_file)
+        return True
+
+    def load_snapshot(self):
+        """
+        Carrega as rotas de snapshot_file (warm start). Só são aproveitadas rotas
+        válidas cujo next_hop ainda é um vizinho e que não conflitam com as rotas
+        iniciais (rede local e vizinhos diretos). Elas mantêm o timestamp do
+        snapshot, marcando-as como não confirmadas, e expiram em stale_timeout
+        segundos se o vizinho não voltar a anunciá-las; quando ele anuncia, são
+        renovadas ou corrigidas pela relaxação normal.
+
+        :return: Número de rotas carregadas (0 se não houver snapshot utilizável).
+        """
+        try:
+            created_at, sender_address, routes = read_snapshot(self.snapshot_file)
+        except FileNotFoundError:
+            log.info("Snapshot %s não encontrado; iniciando com a tabela vazia", self.snapshot_file)
+            return 0
+        except (OSError, ValueError) as e:
+            log.warning("Snapshot %s ignorado: %s", self.snapshot_file, e)
+            return 0
+        if sender_address != self.my_address:
+            log.warning("Snapshot %s pertence a %s; ignorado", self.snapshot_file, sender_address)
+            return 0
+
+        loaded = []
+        with self.table_lock:
+            for network, cost, next_hop in routes:
+                if network in self.routing_table or next_hop not in self.neighbors or cost >= self.infinity:
+                    continue
+                loaded.append(self.routing_table.set_route(network, cost, next_hop, created_at))
+            if loaded:
+                self._schedule_expiries(loaded, self.clock() + self.stale_timeout)
+
+        log.info("Warm start: %d rota(s) carregada(s) do snapshot de %s (%.0f s atrás)",
+                 len(loaded), time.strftime('%H:%M:%S', time.localtime(created_at)),
+                 max(0.0, self.clock() - created_at))
+        return len(loaded)
+
+    def _snapshot_loop(self):
+        """Loop que grava um snapshot da tabela em intervalos regulares."""
+        while True:
+            time.sleep(self.snapshot_interval)
+            self._save_snapshot_logged()
+
+    def _save_snapshot_logged(self):
+        """Grava um snapshot, registrando no log (em vez de propagar) falhas de escrita."""
+        try:
+            self.save_snapshot()
+        except (OSError, ValueError) as e:
+            log.error("Erro ao gravar o snapshot %s: %s", self.snapshot_file, e)
+
+    def _schedule_triggered_update(self):
+        """Sinaliza que a tabela mudou e uma atualização disparada deve ser enviada."""
+        if self.triggered_delay is not None:
+            self._triggered_event.set()
+
+    def _triggered_update_loop(self):
+        """Loop que envia atualizações disparadas assim que a tabela muda."""
+        while True:
+            self._triggered_event.wait()
+            # Janela de agregação: mudanças que chegarem enquanto esperamos
+            # saem na mesma mensagem, limitando a taxa de atualizações
+            time.sleep(self.triggered_delay)
+            self._triggered_event.clear()
             try:
-                # Não precisa mais imprimir aqui, para manter o log limpo
-                # print(f"Enviando tabela para {neighbor_address}")
-                requests.post(url, json=payload, timeout=5)
-            except requests.exceptions.RequestException:
-                # Para o experimento de falha, é melhor simplesmente ignorar
-                # os erros de conexão com o roteador que foi derrubado.
-                pass
+                self.send_triggered_update()
+            except Exception as e:
+                log.error("Erro durante a atualização disparada: %s", e)
+
+    def send_triggered_update(self):
+        """
+        Envia aos vizinhos apenas as rotas que mudaram desde o último anúncio.
+        Rotas que deixaram de ser anunciadas vão com custo infinito, para que os
+        vizinhos as retirem sem esperar o timeout. O formato da mensagem é o
+        mesmo das atualizações periódicas, inclusive o Split Horizon.
+        """
+        with self._advertise_lock:
+            tabela_atual = self._get_advertisement()
+            delta = {
+                network: route_info
+                for network, route_info in tabela_atual.items()
+                if self._last_advertised.get(network) != route_info
+            }
+            for network, route_info in self._last_advertised.items():
+                # Rotas que já tinham sido anunciadas como inalcançáveis não precisam ir de novo
+                if network not in tabela_atual and route_info['cost'] < self.infinity:
+                    delta[network] = {'cost': self.infinity, 'next_hop': self.my_address}
+            self._last_advertised = tabela_atual
+
+        if not delta:
+            return
+
+        log.info("Enviando atualização disparada com %d rota(s) alterada(s)", len(delta))
+        self.sender.send(self._build_messages(delta))
 
 # --- API Endpoints ---
 # Instância do Flask e do Roteador (serão inicializadas no main)
 app = Flask(__name__)
 router_instance = None
 
+# Limites das atualizações recebidas: tamanho do corpo (o Flask responde 413 acima
+# dele) e número de rotas, nos dois formatos. None desativa o limite.
+app.config['MAX_CONTENT_LENGTH'] = 64 * 1024 * 1024
+app.config['MAX_UPDATE_ROUTES'] = 1000000
+
+# Prefixo das ETags de /routes: distingue a versão 5 da tabela desta execução da
+# versão 5 de uma execução anterior do roteador
+_ROUTES_ETAG_PREFIX = f"{int(time.time()):x}"
+
+def _routes_etag(variant):
+    """
+    ETag de /routes: a versão da tabela, a variante pedida (CRC da query string
+    normalizada e do tipo de mídia, para que filtros, páginas e formatos
+    diferentes não compartilhem a ETag) e, com custos dinâmicos, a geração do
+    estado dos enlaces (o campo 'enlaces' muda a cada medida, sem mudar a tabela).
+    """
+    etag = f"{_ROUTES_ETAG_PREFIX}-{router_instance.routing_table.version}-{variant:08x}"
+    if router_instance.link_estimators:
+        etag += f"-{router_instance.links_version}"
+    return etag
+
 @app.route('/routes', methods=['GET'])
 def get_routes():
-    """Endpoint para visualizar a tabela de roteamento atual."""
-    if router_instance:
-        return jsonify({
-            "message": "Tabela de roteamento atual",
-            "vizinhos": router_instance.neighbors,
-            "my_network": router_instance.my_network,
-            "my_address": router_instance.my_address,
-            "update_interval": router_instance.update_interval,
-            "routing_table": router_instance.routing_table
-        })
-    return jsonify({"error": "Roteador não inicializado"}), 500
+    """
+    Endpoint para visualizar a tabela de roteamento atual.
+
+    Parâmetros opcionais (query string):
+      within=10.0.0.0/8   só as redes contidas no prefixo
+      next_hop=ip:porta   só as rotas com esse next_hop
+      limit=N, cursor=C   paginação: até N rotas em ordem de rede, depois de C
+                          (o next_cursor da página anterior)
+      format=ndjson       uma rota por linha, enviada em streaming (também
+                          com Accept: application/x-ndjson)
+
+    A resposta leva uma ETag fraca ligada à versão da tabela, aos parâmetros e
+    ao formato da resposta (e ao estado dos enlaces, com custos dinâmicos); com
+    If-None-Match igual, a resposta é 304 sem montar a tabela. Como o formato
+    pode vir do Accept, as respostas levam Vary: Accept. Renovações de rotas sem
+    mudança não alteram a versão, então o timestamp das rotas pode estar defasado.
+    """
+    if not router_instance:
+        return jsonify({"error": "Roteador não inicializado"}), 500
+
+    ndjson = (request.args.get('format') == 'ndjson'
+              or request.accept_mimetypes.best == 'application/x-ndjson')
+    # Parâmetros em ordem, para que a mesma consulta tenha a mesma ETag; o
+    # 'format' entra pelo tipo de mídia escolhido
+    query = urlencode(sorted((key, value) for key, value in request.args.items(multi=True) if key != 'format'))
+    variant = zlib.crc32(f"{query} {'ndjson' if ndjson else 'json'}".encode('utf-8'))
+
+    etag = _routes_etag(variant)
+    if request.if_none_match.contains_weak(etag):
+        return '', 304, {'ETag': f'W/"{etag}"', 'Vary': 'Accept'}
+
+    within = request.args.get('within')
+    if within is not None:
+        within = network_to_int(within)
+        if within is None:
+            return jsonify({"error": "Parâmetro 'within' deve ser uma rede (ex: 10.0.0.0/8)"}), 400
+    limit = request.args.get('limit')
+    if limit is not None:
+        if not limit.isdigit() or int(limit) == 0:
+            return jsonify({"error": "Parâmetro 'limit' deve ser um inteiro positivo"}), 400
+        limit = int(limit)
+
+    with router_instance.table_lock:
+        # A versão é lida de novo: a tabela pode ter mudado desde a checagem acima
+        etag = _routes_etag(variant)
+        routes, next_cursor = router_instance.routing_table.select(
+            within=within,
+            next_hop=request.args.get('next_hop'),
+            after=request.args.get('cursor'),
+            limit=limit
+        )
+
+    headers = {'ETag': f'W/"{etag}"', 'Vary': 'Accept'}
+    if next_cursor is not None:
+        headers['X-Next-Cursor'] = next_cursor
+
+    if ndjson:
+        def lines():
+            for network, route_info in routes:
+                yield json.dumps({"network": network, **route_info}) + '\n'
+        return Response(lines(), mimetype='application/x-ndjson', headers=headers)
+
+    body = {
+        "message": "Tabela de roteamento atual",
+        "vizinhos": router_instance.neighbors,
+        "my_network": router_instance.my_network,
+        "my_address": router_instance.my_address,
+        "update_interval": router_instance.update_interval,
+        "refresh_interval": router_instance.refresh_interval,
+        "routing_table": dict(routes)
+    }
+    if router_instance.link_estimators:
+        body["enlaces"] = router_instance.link_status()
+    if limit is not None:
+        body["next_cursor"] = next_cursor
+    return jsonify(body), 200, headers
+
+@app.route('/lookup', methods=['GET'])
+def lookup_route():
+    """Endpoint que retorna a rota usada para encaminhar um endereço (?dst=ip)."""
+    if not router_instance:
+        return jsonify({"error": "Roteador não inicializado"}), 500
+
+    dst = request.args.get('dst', '')
+    if not is_valid_ip(dst):
+        return jsonify({"error": "Parâmetro 'dst' ausente ou inválido"}), 400
+
+    route = router_instance.lookup(dst)
+    if route is None:
+        return jsonify({"error": f"Nenhuma rota para {dst}"}), 404
+
+    return jsonify({"destination": dst, **route})
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Endpoint com as métricas do roteador no formato do Prometheus."""
+    if not router_instance:
+        return jsonify({"error": "Roteador não inicializado"}), 500
+    return router_instance.render_metrics(), 200, {'Content-Type': METRICS_CONTENT_TYPE}
+
+@app.route('/damping', methods=['GET'])
+def get_damping():
+    """
+    Endpoint que lista as redes com penalidade de oscilação: a penalidade atual,
+    se a rede está suprimida (fora dos anúncios) e em quantos segundos ela volta
+    a ser anunciada se não oscilar de novo.
+    """
+    if not router_instance:
+        return jsonify({"error": "Roteador não inicializado"}), 500
+    if router_instance.damping is None:
+        return jsonify({"error": "Amortecimento de oscilações desativado (use --damping)"}), 404
+
+    damping = router_instance.damping
+    status = router_instance.damping_status()
+    return jsonify({
+        "half_life": damping.half_life,
+        "suppress_limit": damping.suppress_limit,
+        "reuse_limit": damping.reuse_limit,
+        "suppressed": sum(1 for info in status.values() if info['suppressed']),
+        "networks": status
+    })
 
 @app.route('/receive_update', methods=['POST'])
 def receive_update():
-    """Endpoint que recebe atualizações de roteamento de um vizinho."""
+    """
+    Endpoint que recebe atualizações de roteamento de um vizinho.
+    Aceita o formato JSON padrão e o formato binário (BINARY_CONTENT_TYPE).
+    """
+    started = time.perf_counter()
+    if request.mimetype == BINARY_CONTENT_TYPE:
+        update_format = 'binary'
+        response, status = _receive_binary_update()
+    else:
+        update_format = 'json'
+        response, status = _receive_json_update()
+    metrics = router_instance.metrics
+    metrics.observe('roteador_receive_update_seconds', time.perf_counter() - started, format=update_format)
+    if status != 200:
+        metrics.inc('roteador_receive_update_errors_total', format=update_format)
+    response.headers['Accept-Post'] = f"application/json, {BINARY_CONTENT_TYPE}"
+    return response, status
+
+def _receive_binary_update():
+    """Processa uma atualização no formato binário."""
+    try:
+        sender_address, routes = decode_binary_update(request.get_data(), app.config['MAX_UPDATE_ROUTES'])
+    except UpdateTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if sender_address not in router_instance.neighbors:
+        log.warning("Atualização recebida de %s, mas não é um vizinho conhecido", sender_address)
+        return jsonify({"status": "error", "message": "Unknown neighbor"}), 400
+
+    try:
+        table_changed = router_instance.apply_routes(sender_address, routes)
+    except IndexError:
+        return jsonify({"error": "Índice fora da tabela de strings"}), 400
+
+    if table_changed:
+        log_table("Nova tabela de roteamento:", router_instance.routing_table)
+    return jsonify({"status": "success", "message": "Update received"}), 200
+
+def _receive_json_update():
+    """Processa uma atualização no formato JSON padrão."""
+    if request.content_length is None or request.content_length > STREAMING_MIN_BYTES:
+        return _receive_json_update_streaming()
+
     if not request.json:
         return jsonify({"error": "Invalid request"}), 400
 
@@ -288,76 +2940,312 @@ def receive_update():
     if not sender_address or not isinstance(sender_table, dict):
         return jsonify({"error": "Missing sender_address or routing_table"}), 400
 
-    print(f"Recebida atualização de {sender_address}:")
-    print(json.dumps(sender_table, indent=4))
+    max_routes = app.config['MAX_UPDATE_ROUTES']
+    if max_routes is not None and len(sender_table) > max_routes:
+        return jsonify({"error": f"Atualização com mais de {max_routes} rotas"}), 413
+
+    for network, route_info in sender_table.items():
+        error = route_error(network, route_info)
+        if error is not None:
+            return jsonify({"error": error}), 400
+
+    log_table(f"Recebida atualização de {sender_address}:", sender_table)
 
     # Verifica se o remetente é um vizinho conhecido
     if sender_address not in router_instance.neighbors:
-        print(f"Atualização recebida de {sender_address}, mas não é um vizinho conhecido")
+        log.warning("Atualização recebida de %s, mas não é um vizinho conhecido", sender_address)
         return jsonify({"status": "error", "message": "Unknown neighbor"}), 400
     
-    # Obtém o custo do link direto para este vizinho
-    direct_link_cost = router_instance.neighbors[sender_address]
-    
-    # Flag para verificar se a tabela mudou
-    table_changed = False
-    
-    # Processa cada rota na tabela recebida
-    for network, route_info in sender_table.items():
-
-        if network == router_instance.my_address:
-            continue
-
-        if is_subnet(router_instance.my_network, network):
-            print(f"INFO: Ignorando rota sumarizada '{network}' de {sender_address} pois contém minha rede local.")
-            continue
+    table_changed = router_instance.apply_update(sender_address, sender_table)
 
-        # Calcula o novo custo para chegar à rede através deste vizinho
-        new_cost = direct_link_cost + route_info['cost']
-        
-        # Verifica se já conhecemos esta rede
-        if network in router_instance.routing_table:
-            current_route = router_instance.routing_table[network]
-            current_cost = current_route['cost']
-            current_next_hop = current_route['next_hop']
-            
-            # Atualiza se o novo caminho for melhor OU se o next_hop for o sender
-            if (new_cost < current_cost) or (current_next_hop == sender_address):
-                if new_cost != current_cost or current_next_hop != sender_address:
-                    router_instance.routing_table[network] = {
-                        'cost': new_cost,
-                        'next_hop': sender_address,
-                        'timestamp': time.time()
-                    }
-                    table_changed = True
-                    print(f"Rota atualizada: {network} -> custo {new_cost} via {sender_address}")
-        else:
-            # Nova rede descoberta
-            router_instance.routing_table[network] = {
-                'cost': new_cost,
-                'next_hop': sender_address,
-                'timestamp': time.time()
-            }
-            table_changed = True
-            print(f"Nova rota descoberta: {network} -> custo {new_cost} via {sender_address}")
-    
-    # Se a tabela mudou, imprime a nova tabela
+    # Se a tabela mudou, registra a nova tabela (apenas em DEBUG)
     if table_changed:
-        print("Nova tabela de roteamento:")
-        print(json.dumps(router_instance.routing_table, indent=4))
+        log_table("Nova tabela de roteamento:", router_instance.routing_table)
     else:
-        print("Tabela de roteamento não mudou")
-        print(json.dumps(router_instance.routing_table, indent=4))
+        log.debug("Tabela de roteamento não mudou")
+
+    return jsonify({"status": "success", "message": "Update received"}), 200
+
+def _receive_json_update_streaming():
+    """
+    Processa uma atualização JSON grande lendo o corpo em streaming (veja
+    JsonUpdateStream): as rotas são aplicadas em lotes à medida que chegam.
+    """
+    update_stream = JsonUpdateStream(request.stream, max_routes=app.config['MAX_UPDATE_ROUTES'])
+    try:
+        sender_address = update_stream.read_sender()
+    except UpdateTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if sender_address not in router_instance.neighbors:
+        log.warning("Atualização recebida de %s, mas não é um vizinho conhecido", sender_address)
+        return jsonify({"status": "error", "message": "Unknown neighbor"}), 400
+
+    try:
+        table_changed = router_instance.apply_route_batches(sender_address, update_stream.batches())
+    except UpdateTooLarge as e:
+        log.warning("Atualização de %s interrompida: %s", sender_address, e)
+        return jsonify({"error": str(e)}), 413
+    except ValueError as e:
+        log.warning("Atualização de %s interrompida: %s", sender_address, e)
+        return jsonify({"error": str(e)}), 400
 
+    if table_changed:
+        log_table("Nova tabela de roteamento:", router_instance.routing_table)
     return jsonify({"status": "success", "message": "Update received"}), 200
 
+# --- Servidor assíncrono ---
+# Alternativa ao servidor de desenvolvimento do Flask (Werkzeug), que cria uma
+# thread por conexão. Aqui um único loop asyncio aceita as conexões, faz o
+# parsing do HTTP/1.1 com keep-alive e executa o app Flask (WSGI) em um pool
+# pequeno de threads. As alterações na tabela continuam serializadas pelo
+# table_lock do roteador.
+
+class _AsyncBodyReader(io.RawIOBase):
+    """
+    Corpo de uma requisição, lido do StreamReader sob demanda pela thread que
+    executa o app WSGI: cada leitura é agendada no loop do asyncio e a thread
+    espera o resultado. Assim o corpo não precisa estar inteiro na memória, e
+    o JsonUpdateStream aplica as rotas enquanto elas chegam.
+
+    Com length=None o corpo vem com Transfer-Encoding: chunked e é decodificado
+    aqui; os pedaços que passariam de max_body bytes são recusados antes de
+    serem lidos, com o RequestEntityTooLarge do Werkzeug (o Flask responde 413).
+    """
+
+    def __init__(self, reader, loop, length=None, max_body=None):
+        self._reader = reader
+        self._loop = loop
+        self._chunked = length is None
+        self._remaining = 0 if length is None else length
+        self._chunks = 0
+        self.max_body = max_body
+        self.received = 0
+        self.done = length == 0
+
+    def readable(self):
+        return True
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _next_chunk(self):
+        """Lê o cabeçalho do próximo pedaço (e o CRLF do anterior); retorna o tamanho."""
+        if self._chunks:
+            await self._reader.readexactly(2)
+        self._chunks += 1
+        line = await self._reader.readline()
+        try:
+            size = int(line.split(b';', 1)[0].strip(), 16)
+        except ValueError:
+            raise ValueError(f"Tamanho de pedaço inválido no corpo chunked: {line[:20]!r}")
+        if size == 0:
+            # Trailers, que são ignorados, até a linha vazia
+            while await self._reader.readline() not in (b'\r\n', b'\n', b''):
+                pass
+        elif self.max_body is not None and self.received + size > self.max_body:
+            raise RequestEntityTooLarge(f"Corpo com mais de {self.max_body} bytes")
+        return size
+
+    def readinto(self, buffer):
+        if self.done:
+            return 0
+        if self._chunked and self._remaining == 0:
+            self._remaining = self._run(self._next_chunk())
+            if self._remaining == 0:
+                self.done = True
+                return 0
+        data = self._run(self._reader.read(min(len(buffer), self._remaining)))
+        if not data:
+            raise ConnectionError("Conexão encerrada no meio do corpo da requisição")
+        size = len(data)
+        buffer[:size] = data
+        self._remaining -= size
+        self.received += size
+        if not self._chunked and self._remaining == 0:
+            self.done = True
+        return size
+
+def _build_wsgi_environ(method, target, version, headers, body, content_length, server_address, peer):
+    """
+    Monta o environ WSGI (PEP 3333) de uma requisição. O corpo é um stream que
+    termina sozinho no fim da requisição (wsgi.input_terminated); content_length
+    é None nos corpos chunked.
+    """
+    path, _, query = target.partition('?')
+    environ = {
+        'REQUEST_METHOD': method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': unquote(path, encoding='latin-1'),
+        'QUERY_STRING': query,
+        'SERVER_NAME': server_address[0],
+        'SERVER_PORT': str(server_address[1]),
+        'SERVER_PROTOCOL': version,
+        'REMOTE_ADDR': peer[0] if peer else '',
+        'CONTENT_TYPE': headers.get('content-type', ''),
+        'CONTENT_LENGTH': '' if content_length is None else str(content_length),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': body,
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in headers.items():
+        if name not in ('content-type', 'content-length'):
+            environ['HTTP_' + name.upper().replace('-', '_')] = value
+    return environ
+
+def _call_wsgi_app(wsgi_app, environ):
+    """Executa o app WSGI e retorna (status, headers, corpo em bytes)."""
+    response = {}
+
+    def start_response(status, response_headers, exc_info=None):
+        response['status'] = status
+        response['headers'] = response_headers
+
+    result = wsgi_app(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return response['status'], response['headers'], body
+
+async def _handle_http_connection(wsgi_app, executor, server_address, reader, writer, max_body=None):
+    """
+    Atende uma conexão HTTP/1.1, processando requisições até o cliente fechar.
+    O corpo é entregue ao app como um stream (veja _AsyncBodyReader), inclusive
+    com Transfer-Encoding: chunked; outras codificações são recusadas (501).
+    Corpos com Content-Length maior que max_body bytes são recusados (413) sem
+    serem lidos. Se o app não ler o corpo inteiro, a conexão é fechada depois
+    da resposta, já que o resto do corpo ainda está no socket.
+    """
+    peer = writer.get_extra_info('peername')
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            try:
+                method, target, version = request_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+            except ValueError:
+                writer.write(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                break
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            transfer_encoding = headers.get('transfer-encoding', '').lower()
+            if transfer_encoding and transfer_encoding != 'chunked':
+                writer.write(b'HTTP/1.1 501 Not Implemented\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                break
+            if transfer_encoding:
+                # Com chunked, o Content-Length (se vier) é ignorado
+                length = None
+            else:
+                try:
+                    length = int(headers.get('content-length', 0) or 0)
+                except ValueError:
+                    writer.write(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                    break
+                if max_body is not None and length > max_body:
+                    writer.write(b'HTTP/1.1 413 Payload Too Large\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                    break
+            if headers.get('expect', '').lower() == '100-continue':
+                writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+            body = _AsyncBodyReader(reader, loop, length, max_body)
+
+            connection = headers.get('connection', '').lower()
+            keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+
+            environ = _build_wsgi_environ(method, target, version, headers, body, length, server_address, peer)
+            status, response_headers, response_body = await loop.run_in_executor(
+                executor, _call_wsgi_app, wsgi_app, environ
+            )
+            if not body.done:
+                keep_alive = False
+
+            head = [f'HTTP/1.1 {status}']
+            for name, value in response_headers:
+                if name.lower() not in ('content-length', 'connection'):
+                    head.append(f'{name}: {value}')
+            head.append(f'Content-Length: {len(response_body)}')
+            head.append('Connection: ' + ('keep-alive' if keep_alive else 'close'))
+            writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + response_body)
+            await writer.drain()
+
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+def run_async_server(wsgi_app, host, port, workers=4, max_body=None):
+    """
+    Serve o app WSGI com um servidor HTTP/1.1 baseado em asyncio.
+
+    :param workers: Número de threads que executam os handlers do Flask.
+    :param max_body: Tamanho máximo em bytes do corpo das requisições.
+    """
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='http')
+
+    async def main():
+        server = await asyncio.start_server(
+            lambda reader, writer: _handle_http_connection(wsgi_app, executor, (host, port), reader, writer, max_body),
+            host, port, backlog=1024
+        )
+        async with server:
+            await server.serve_forever()
+
+    log.info("Servidor asyncio escutando em http://%s:%s", host, port)
+    asyncio.run(main())
+
 if __name__ == '__main__':
     parser = ArgumentParser(description="Simulador de Roteador com Vetor de Distância")
     parser.add_argument('-p', '--port', type=int, default=5000, help="Porta para executar o roteador.")
     parser.add_argument('-f', '--file', type=str, required=True, help="Arquivo CSV de configuração de vizinhos.")
     parser.add_argument('--network', type=str, required=True, help="Rede administrada por este roteador (ex: 10.0.1.0/24).")
     parser.add_argument('--interval', type=int, default=10, help="Intervalo de atualização periódica em segundos.")
+    parser.add_argument('--absorb', action='store_true', help="Absorve rotas mais específicas em super-redes com o mesmo next_hop ao sumarizar.")
+    parser.add_argument('--triggered-delay', type=float, default=1.0, help="Janela em segundos para agrupar mudanças em uma atualização disparada.")
+    parser.add_argument('--no-triggered', action='store_true', help="Desativa as atualizações disparadas (apenas atualizações periódicas).")
+    parser.add_argument('--refresh-interval', type=float, help=f"Intervalo em segundos entre os envios da tabela completa, base dos prazos de expiração (padrão: --interval sem atualizações disparadas, {REFRESH_INTERVAL_FACTOR}x --interval com elas).")
+    parser.add_argument('--split-horizon', choices=['off', 'simple', 'poison'], default='off', help="Split Horizon: 'simple' omite de cada vizinho as rotas aprendidas dele; 'poison' as anuncia com custo infinito (poisoned reverse).")
+    parser.add_argument('--infinity', type=int, default=INFINITY, help="Custo que representa uma rede inalcançável.")
+    parser.add_argument('--snapshot-file', type=str, help="Grava snapshots da tabela neste arquivo (padrão com --warm-start: roteador_<porta>.snapshot).")
+    parser.add_argument('--snapshot-interval', type=float, default=30, help="Intervalo em segundos entre os snapshots da tabela.")
+    parser.add_argument('--warm-start', action='store_true', help="Carrega a tabela do snapshot ao iniciar e a anuncia imediatamente.")
+    parser.add_argument('--max-update-bytes', type=int, default=app.config['MAX_CONTENT_LENGTH'], help="Tamanho máximo em bytes de uma atualização recebida; 0 desativa o limite.")
+    parser.add_argument('--max-update-routes', type=int, default=app.config['MAX_UPDATE_ROUTES'], help="Número máximo de rotas de uma atualização recebida; 0 desativa o limite.")
+    parser.add_argument('--dynamic-costs', action='store_true', help="Deriva os custos dos enlaces do RTT e das perdas dos envios (o custo do CSV vira o piso).")
+    parser.add_argument('--rtt-unit', type=float, default=LINK_RTT_UNIT, help="Com --dynamic-costs, segundos de RTT suavizado que valem um ponto de custo.")
+    parser.add_argument('--cost-hysteresis', type=float, default=LINK_COST_HYSTERESIS, help="Com --dynamic-costs, diferença mínima entre o custo estimado e o atual para trocá-lo.")
+    parser.add_argument('--damping', action='store_true', help="Amortece oscilações: redes que oscilam demais deixam de ser anunciadas até estabilizarem (lista em /damping).")
+    parser.add_argument('--damping-half-life', type=float, default=DAMPING_HALF_LIFE, help="Com --damping, meia-vida em segundos da penalidade de oscilação.")
+    parser.add_argument('--json-only', action='store_true', help="Envia sempre JSON, mesmo para vizinhos que aceitam o formato binário.")
+    parser.add_argument('--server', choices=['flask', 'asyncio'], default='flask', help="Servidor HTTP: 'flask' (desenvolvimento) ou 'asyncio' (alto volume de atualizações).")
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default='INFO', help="Nível de log; DEBUG inclui as tabelas completas.")
+    parser.add_argument('--log-file', type=str, help="Grava o log neste arquivo, de forma assíncrona, em vez do terminal.")
+    parser.add_argument('--log-rate', type=int, default=20, help="Máximo de mensagens de log (abaixo de WARNING) por segundo; 0 desativa o limite.")
     args = parser.parse_args()
+    if args.warm_start and not args.snapshot_file:
+        args.snapshot_file = f"roteador_{args.port}.snapshot"
+
+    setup_logging(args.log_level, args.log_file, args.log_rate)
+    app.config['MAX_CONTENT_LENGTH'] = args.max_update_bytes or None
+    app.config['MAX_UPDATE_ROUTES'] = args.max_update_routes or None
 
     # Leitura do arquivo de configuração de vizinhos
     neighbors_config = {}
@@ -367,26 +3255,47 @@ if __name__ == '__main__':
             for row in reader:
                 neighbors_config[row['vizinho']] = int(row['custo'])
     except FileNotFoundError:
-        print(f"Erro: Arquivo de configuração '{args.file}' não encontrado.")
+        log.error("Arquivo de configuração '%s' não encontrado.", args.file)
         exit(1)
     except (KeyError, ValueError) as e:
-        print(f"Erro no formato do arquivo CSV: {e}. Verifique as colunas 'vizinho' e 'custo'.")
+        log.error("Erro no formato do arquivo CSV: %s. Verifique as colunas 'vizinho' e 'custo'.", e)
         exit(1)
 
     my_full_address = f"127.0.0.1:{args.port}"
-    print("--- Iniciando Roteador ---")
-    print(f"Endereço: {my_full_address}")
-    print(f"Rede Local: {args.network}")
-    print(f"Vizinhos Diretos: {neighbors_config}")
-    print(f"Intervalo de Atualização: {args.interval}s")
-    print("--------------------------")
+    log.info("--- Iniciando Roteador ---")
+    log.info("Endereço: %s", my_full_address)
+    log.info("Rede Local: %s", args.network)
+    log.info("Vizinhos Diretos: %s", neighbors_config)
+    log.info("Intervalo de Atualização: %ss", args.interval)
 
     router_instance = Router(
         my_address=my_full_address,
         neighbors=neighbors_config,
         my_network=args.network,
-        update_interval=args.interval
+        update_interval=args.interval,
+        absorb_routes=args.absorb,
+        triggered_delay=None if args.no_triggered else args.triggered_delay,
+        refresh_interval=args.refresh_interval,
+        binary_updates=not args.json_only,
+        split_horizon=None if args.split_horizon == 'off' else args.split_horizon,
+        infinity=args.infinity,
+        snapshot_file=args.snapshot_file,
+        snapshot_interval=args.snapshot_interval,
+        warm_start=args.warm_start,
+        dynamic_costs={'rtt_unit': args.rtt_unit, 'hysteresis': args.cost_hysteresis} if args.dynamic_costs else None,
+        damping={'half_life': args.damping_half_life,
+                 'max_suppress': 4 * args.damping_half_life} if args.damping else None
     )
+    log.info("Tabela completa a cada %ss (rotas expiram após %ss sem atualizações)",
+             router_instance.refresh_interval, router_instance.route_timeout)
 
-    # Inicia o servidor Flask
-    app.run(host='0.0.0.0', port=args.port, debug=False)
+    if args.snapshot_file:
+        # pkill encerra com SIGTERM; convertido em SystemExit, o encerramento passa
+        # pelo atexit e grava o último snapshot
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    # Inicia o servidor HTTP
+    if args.server == 'asyncio':
+        run_async_server(app, host='0.0.0.0', port=args.port, max_body=app.config['MAX_CONTENT_LENGTH'])
+    else:
+        app.run(host='0.0.0.0', port=args.port, debug=False)
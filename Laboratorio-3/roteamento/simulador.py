@@ -0,0 +1,563 @@
+"""
+Simulador em processo de uma rede de roteadores de vetor de distância.
+
+Executa vários objetos Router (de roteador.py) no mesmo processo, sem HTTP e
+sem threads: as mensagens passam por um transporte em memória com atraso e
+perda configuráveis, e o tempo é um relógio virtual avançado por um
+escalonador de eventos discretos. Assim, topologias grandes convergem em
+segundos de tempo real, mesmo com intervalos de atualização de vários
+segundos de tempo simulado.
+
+Uso:
+    python simulador.py grupo7/topologia.json
+    python simulador.py grupo7/topologia.json --loss 0.1 --fail R1 R2 --show R4
+"""
+import csv
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import time
+from argparse import ArgumentParser
+
+from roteador import INFINITY, Router, decode_binary_update, int_to_ip, network_to_int, setup_logging
+
+log = logging.getLogger('roteador')
+
+
+class VirtualClock:
+    """Relógio virtual: devolve o instante atual da simulação, em segundos."""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+
+class InMemoryTransport:
+    """
+    Substitui o NeighborSender de um roteador dentro do simulador: em vez de
+    fazer POSTs, entrega as mensagens ao simulador, que as agenda no destino.
+    """
+
+    def __init__(self, simulator, address, binary):
+        self.simulator = simulator
+        self.address = address
+        self.binary = binary
+
+    def mark_alive(self, neighbor_address):
+        pass
+
+    def accepts_binary(self, neighbor_address):
+        return self.binary
+
+    def send(self, messages):
+        """
+        :param messages: Dicionário vizinho -> (content_type, corpo em bytes).
+        :return: Dicionário vizinho -> True se a mensagem saiu (o link está ativo).
+        """
+        return {
+            neighbor_address: self.simulator.transmit(self.address, neighbor_address, content_type, body)
+            for neighbor_address, (content_type, body) in messages.items()
+        }
+
+
+class Simulator:
+    """
+    Rede simulada de roteadores com relógio virtual.
+
+    Cada roteador é criado com start_threads=False; o simulador agenda os eventos
+    que as threads fariam (envio periódico, atualização disparada após a janela
+    de agregação e verificação dos prazos de expiração) em um heap único.
+    """
+
+    def __init__(self, delay=0.01, jitter=0.0, loss=0.0, update_interval=10, triggered_delay=1.0,
+                 refresh_interval=None, binary=False, absorb_routes=False, split_horizon=None, infinity=INFINITY,
+                 expiry_resolution=0.5, seed=None):
+        """
+        :param delay: Atraso de cada link em segundos (tempo virtual).
+        :param jitter: Variação máxima somada ao atraso, sorteada por mensagem.
+        :param loss: Probabilidade de uma mensagem ser perdida.
+        :param update_interval: Intervalo das atualizações periódicas dos roteadores.
+        :param triggered_delay: Janela das atualizações disparadas (None desativa).
+        :param refresh_interval: Intervalo dos envios da tabela completa (veja Router).
+        :param binary: Se True, os roteadores trocam mensagens no formato binário.
+        :param absorb_routes: Repassado aos roteadores (veja Router).
+        :param split_horizon: Repassado aos roteadores: None, 'simple' ou 'poison'.
+        :param infinity: Custo que representa uma rede inalcançável nos roteadores.
+        :param expiry_resolution: Granularidade em segundos das verificações de
+                                  expiração, para não gerar um evento por rota renovada.
+        :param seed: Semente do gerador aleatório (perdas, jitter e fases dos timers).
+        """
+        self.delay = delay
+        self.jitter = jitter
+        self.loss = loss
+        self.update_interval = update_interval
+        self.triggered_delay = triggered_delay
+        self.refresh_interval = refresh_interval
+        self.binary = binary
+        self.absorb_routes = absorb_routes
+        self.split_horizon = split_horizon
+        self.infinity = infinity
+        self.expiry_resolution = expiry_resolution
+        self.random = random.Random(seed)
+
+        self.clock = VirtualClock()
+        self.routers = {}
+        self.names = {}
+        self.networks = {}
+        self.down_links = set()
+
+        # Heap de eventos (instante, sequência, roteador, função, argumentos); a
+        # sequência desempata eventos simultâneos na ordem em que foram agendados
+        self._events = []
+        self._sequence = itertools.count()
+        self._expiry_at = {}
+        self._triggered_pending = set()
+
+        self.last_change = 0.0
+        self.stats = {}
+        self.router_stats = {}
+        self.reset_stats()
+
+    @classmethod
+    def from_topology(cls, topology, **kwargs):
+        """
+        Cria o simulador a partir de um topologia.json (caminho) ou de uma lista de
+        entradas {'name', 'network', 'address', 'config_file'}. No lugar de
+        config_file, uma entrada pode trazer 'neighbors' ({endereço: custo}).
+        """
+        simulator = cls(**kwargs)
+        for entry in load_topology(topology):
+            simulator.add_router(entry['name'], entry['address'], entry['network'], entry['neighbors'])
+        return simulator
+
+    def add_router(self, name, address, network, neighbors):
+        """Cria um roteador na rede simulada e agenda seus timers."""
+        router = Router(
+            my_address=address,
+            neighbors=dict(neighbors),
+            my_network=network,
+            update_interval=self.update_interval,
+            absorb_routes=self.absorb_routes,
+            triggered_delay=self.triggered_delay,
+            refresh_interval=self.refresh_interval,
+            binary_updates=self.binary,
+            split_horizon=self.split_horizon,
+            infinity=self.infinity,
+            clock=self.clock,
+            sender=InMemoryTransport(self, address, self.binary),
+            start_threads=False
+        )
+        self.routers[address] = router
+        self.names[address] = name
+        self.networks[address] = network
+        self.router_stats[address] = _new_router_stats()
+
+        # Fase aleatória para os roteadores não enviarem todos no mesmo instante
+        self.schedule(self.clock.now + self.random.uniform(0, router.refresh_interval), address,
+                      self._periodic_update, address)
+        # Como na versão com threads, a tabela inicial é anunciada logo de início
+        self._request_triggered_update(address)
+        self._watch_expiry(address)
+        return router
+
+    def router(self, name):
+        """Retorna o roteador com este nome (ex: 'R1')."""
+        for address, router_name in self.names.items():
+            if router_name == name:
+                return self.routers[address]
+        raise KeyError(name)
+
+    # --- Escalonador ---
+
+    def schedule(self, at, owner, callback, *args):
+        """
+        Agenda callback(*args) para o instante virtual at. O tempo de CPU do
+        evento é contabilizado para o roteador owner (endereço).
+        """
+        heapq.heappush(self._events, (at, next(self._sequence), owner, callback, args))
+
+    def reset_stats(self):
+        """Zera os contadores globais e por roteador (ex: entre as fases de um benchmark)."""
+        self.stats = {'messages': 0, 'bytes': 0, 'dropped': 0, 'events': 0}
+        for address in self.routers:
+            self.router_stats[address] = _new_router_stats()
+
+    def run(self, until):
+        """Processa os eventos até o instante virtual until."""
+        events = self._events
+        while events and events[0][0] <= until:
+            self._step()
+        self.clock.now = max(self.clock.now, until)
+
+    def run_until_converged(self, quiet=None, max_time=3600):
+        """
+        Processa eventos até a rede ficar quiet segundos (virtuais) sem mudar
+        nenhuma tabela de roteamento.
+
+        :param quiet: Período sem mudanças que caracteriza a convergência
+                      (padrão: dois envios da tabela completa, refresh_interval).
+        :param max_time: Limite de tempo virtual a partir do instante atual.
+        :return: Instante da última mudança, ou None se não convergiu até o limite.
+        """
+        if quiet is None:
+            quiet = 2 * max((router.refresh_interval for router in self.routers.values()),
+                            default=self.update_interval)
+        deadline = self.clock.now + max_time
+        events = self._events
+        while events and events[0][0] <= deadline:
+            if events[0][0] - self.last_change >= quiet:
+                self.clock.now = self.last_change + quiet
+                return self.last_change
+            self._step()
+        self.clock.now = max(self.clock.now, deadline)
+        return None
+
+    def _step(self):
+        at, _, owner, callback, args = heapq.heappop(self._events)
+        self.clock.now = at
+        self.stats['events'] += 1
+        started = time.process_time()
+        callback(*args)
+        self.router_stats[owner]['cpu'] += time.process_time() - started
+
+    # --- Links ---
+
+    def _link_key(self, address_a, address_b):
+        return frozenset((address_a, address_b))
+
+    def fail_link(self, address_a, address_b):
+        """Derruba o link entre dois roteadores (endereços): as mensagens deixam de passar."""
+        self.down_links.add(self._link_key(address_a, address_b))
+
+    def restore_link(self, address_a, address_b):
+        """Restabelece um link derrubado com fail_link."""
+        self.down_links.discard(self._link_key(address_a, address_b))
+
+    def link_up(self, address_a, address_b):
+        return self._link_key(address_a, address_b) not in self.down_links
+
+    def transmit(self, source, destination, content_type, body):
+        """Coloca uma mensagem no link; chamada pelo InMemoryTransport do remetente."""
+        if destination not in self.routers or not self.link_up(source, destination):
+            return False
+
+        self.stats['messages'] += 1
+        self.stats['bytes'] += len(body)
+        router_stats = self.router_stats[source]
+        router_stats['messages_sent'] += 1
+        router_stats['bytes_sent'] += len(body)
+        if self.loss and self.random.random() < self.loss:
+            self.stats['dropped'] += 1
+            return True
+
+        delay = self.delay + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        self.schedule(self.clock.now + delay, destination, self._deliver, source, destination, content_type, body)
+        return True
+
+    # --- Eventos ---
+
+    def _deliver(self, source, destination, content_type, body):
+        """Entrega uma mensagem ao destino, como o endpoint /receive_update faria."""
+        # Mensagens em trânsito quando o link caiu também se perdem
+        if not self.link_up(source, destination):
+            self.stats['dropped'] += 1
+            return
+
+        router = self.routers[destination]
+        if source not in router.neighbors:
+            return
+        self.router_stats[destination]['messages_received'] += 1
+
+        if content_type == 'application/json':
+            update_data = json.loads(body)
+            changed = router.apply_update(update_data['sender_address'], update_data['routing_table'])
+        else:
+            sender_address, routes = decode_binary_update(body)
+            changed = router.apply_routes(sender_address, routes)
+        self._after_update(destination, changed)
+
+    def _after_update(self, address, changed):
+        if changed:
+            self.last_change = self.clock.now
+            self._request_triggered_update(address)
+        self._watch_expiry(address)
+
+    def _periodic_update(self, address):
+        self.routers[address].send_updates_to_neighbors()
+        self.schedule(self.clock.now + self.routers[address].refresh_interval, address,
+                      self._periodic_update, address)
+
+    def _request_triggered_update(self, address):
+        """Abre a janela de agregação da atualização disparada, se ainda não estiver aberta."""
+        if self.triggered_delay is None or address in self._triggered_pending:
+            return
+        self._triggered_pending.add(address)
+        self.schedule(self.clock.now + self.triggered_delay, address, self._triggered_update, address)
+
+    def _triggered_update(self, address):
+        self._triggered_pending.discard(address)
+        self.routers[address].send_triggered_update()
+
+    def _watch_expiry(self, address):
+        """Agenda a verificação de expiração do roteador para o prazo mais próximo."""
+        deadline = self.routers[address].next_expiry()
+        if deadline is None:
+            return
+        # Arredonda para cima na resolução, agrupando os prazos próximos em um só evento
+        resolution = self.expiry_resolution
+        if resolution:
+            deadline = -(-deadline // resolution) * resolution
+        scheduled = self._expiry_at.get(address)
+        if scheduled is not None and scheduled <= deadline:
+            return
+        self._expiry_at[address] = deadline
+        self.schedule(deadline, address, self._expire, address, deadline)
+
+    def _expire(self, address, deadline):
+        if self._expiry_at.get(address) != deadline:
+            # Substituída por uma verificação agendada para antes
+            return
+        del self._expiry_at[address]
+        changed = self.routers[address].expire_routes(self.clock.now)
+        self._after_update(address, changed)
+
+    # --- Verificação ---
+
+    def shortest_paths(self, source):
+        """Custos mínimos (Dijkstra) de source até cada roteador, considerando só links ativos."""
+        neighbors = {address: router.neighbors for address, router in self.routers.items()}
+        return shortest_paths(neighbors, source, self.infinity, self.link_up)
+
+    def verify(self):
+        """
+        Compara as tabelas com os caminhos mínimos da topologia.
+
+        :return: Lista de divergências (roteador, rede, custo esperado, custo obtido);
+                 vazia se a rede convergiu. Veja route_mismatches.
+        """
+        mismatches = []
+        for address, router in self.routers.items():
+            mismatches.extend(route_mismatches(self.names[address], router, self.networks,
+                                               self.shortest_paths(address)))
+        return mismatches
+
+
+def load_topology(topology):
+    """
+    Lê um topologia.json (caminho) ou uma lista de entradas {'name', 'network',
+    'address', 'config_file'}. No lugar de config_file, uma entrada pode trazer
+    'neighbors' ({endereço: custo}).
+
+    O endereço de cada roteador é montado como o roteador.py faz ao executar
+    (127.0.0.1:<porta>), já que é esse o endereço que os vizinhos usam nos CSVs;
+    do campo 'address' só vale a porta. Vizinhos que não são roteadores da
+    topologia são um erro de configuração (ValueError).
+
+    :return: Lista de entradas {'name', 'network', 'address', 'neighbors'}.
+    """
+    base_dir = None
+    if isinstance(topology, str):
+        base_dir = os.path.dirname(os.path.abspath(topology))
+        with open(topology, mode='r') as infile:
+            topology = json.load(infile)
+
+    entries = []
+    for entry in topology:
+        neighbors = entry.get('neighbors')
+        if neighbors is None:
+            neighbors = read_neighbors(_resolve_config(entry['config_file'], base_dir))
+        entries.append({
+            'name': entry['name'],
+            'network': entry['network'],
+            'address': router_address(entry['address']),
+            'neighbors': dict(neighbors)
+        })
+
+    addresses = {entry['address'] for entry in entries}
+    unknown = [
+        f"{entry['name']} -> {neighbor_address}"
+        for entry in entries for neighbor_address in entry['neighbors']
+        if neighbor_address not in addresses
+    ]
+    if unknown:
+        raise ValueError("Vizinhos que não são roteadores da topologia: " + ', '.join(unknown))
+    return entries
+
+
+def router_address(address):
+    """Endereço em que o roteador.py escuta para o 'address' da topologia: 127.0.0.1:<porta>."""
+    port = address.rsplit(':', 1)[-1]
+    if not port.isdigit():
+        raise ValueError(f"Endereço sem porta na topologia: {address}")
+    return f"127.0.0.1:{port}"
+
+
+def shortest_paths(neighbors, source, infinity=INFINITY, link_up=None):
+    """
+    Custos mínimos (Dijkstra) de source até cada roteador. Um link só é usado se
+    as duas pontas o declaram, já que as atualizações só atravessam links em que
+    cada lado envia para o outro; o custo é o declarado por quem envia o tráfego.
+
+    :param neighbors: Dicionário endereço -> {vizinho: custo do link}.
+    :param link_up: Função opcional (a, b) que diz se o link entre a e b está ativo.
+    :return: Dicionário endereço -> custo, só com os alcançáveis abaixo de infinity.
+    """
+    distances = {source: 0}
+    heap = [(0, source)]
+    while heap:
+        cost, address = heapq.heappop(heap)
+        if cost > distances[address]:
+            continue
+        for neighbor_address, link_cost in neighbors[address].items():
+            if address not in neighbors.get(neighbor_address, ()) or \
+                    (link_up is not None and not link_up(address, neighbor_address)):
+                continue
+            new_cost = cost + link_cost
+            # Caminhos que chegam ao infinito não são representáveis pelo protocolo
+            if new_cost < distances.get(neighbor_address, infinity):
+                distances[neighbor_address] = new_cost
+                heapq.heappush(heap, (new_cost, neighbor_address))
+    return distances
+
+
+def route_mismatches(name, router, networks, distances):
+    """
+    Compara a tabela de um roteador com os custos mínimos até os demais.
+
+    :param networks: Dicionário endereço -> rede de cada roteador da topologia.
+    :param distances: Resultado de shortest_paths a partir deste roteador.
+    :return: Lista de (nome, rede, custo esperado, custo obtido). O custo obtido é
+             None se não há rota; com sumarização, só as rotas exatas para a rede
+             têm o custo comparado.
+    """
+    mismatches = []
+    for other_address, network in networks.items():
+        if other_address == router.my_address:
+            continue
+        expected = distances.get(other_address)
+        route = router.lookup(_first_address(network))
+        if expected is None:
+            if route is not None and route['network'] == network:
+                mismatches.append((name, network, None, route['cost']))
+        elif route is None:
+            mismatches.append((name, network, expected, None))
+        elif route['network'] == network and route['cost'] != expected:
+            mismatches.append((name, network, expected, route['cost']))
+    return mismatches
+
+
+def _new_router_stats():
+    return {'messages_sent': 0, 'bytes_sent': 0, 'messages_received': 0, 'cpu': 0.0}
+
+
+def read_neighbors(config_file):
+    """Lê o CSV de vizinhos (colunas 'vizinho' e 'custo'), como o roteador faz."""
+    neighbors = {}
+    with open(config_file, mode='r') as infile:
+        for row in csv.DictReader(infile):
+            neighbors[row['vizinho']] = int(row['custo'])
+    return neighbors
+
+
+def _resolve_config(config_file, base_dir):
+    """
+    Os config_file do topologia.json são relativos a roteamento/ (ex: 'grupo7/R1.csv');
+    tenta também relativo à pasta do próprio topologia.json.
+    """
+    if os.path.exists(config_file) or base_dir is None:
+        return config_file
+    for directory in (os.path.dirname(base_dir), base_dir):
+        candidate = os.path.join(directory, config_file)
+        if os.path.exists(candidate):
+            return candidate
+    return config_file
+
+
+def _first_address(network):
+    """Primeiro endereço da rede, usado para consultar a rota por longest match."""
+    return int_to_ip(network_to_int(network)[0])
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="Simulador em processo de uma rede de roteadores de vetor de distância")
+    parser.add_argument('topology', help="Arquivo topologia.json (name, network, address, config_file).")
+    parser.add_argument('--delay', type=float, default=0.01, help="Atraso de cada link em segundos.")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Variação máxima somada ao atraso de cada mensagem.")
+    parser.add_argument('--loss', type=float, default=0.0, help="Probabilidade de perda de cada mensagem (0 a 1).")
+    parser.add_argument('--interval', type=float, default=10, help="Intervalo de atualização periódica em segundos.")
+    parser.add_argument('--triggered-delay', type=float, default=1.0, help="Janela das atualizações disparadas em segundos.")
+    parser.add_argument('--no-triggered', action='store_true', help="Desativa as atualizações disparadas.")
+    parser.add_argument('--refresh-interval', type=float, help="Intervalo dos envios da tabela completa em segundos (padrão: veja roteador.py).")
+    parser.add_argument('--binary', action='store_true', help="Troca as atualizações no formato binário.")
+    parser.add_argument('--absorb', action='store_true', help="Absorve rotas mais específicas ao sumarizar.")
+    parser.add_argument('--split-horizon', choices=['off', 'simple', 'poison'], default='off', help="Split Horizon dos roteadores (veja roteador.py).")
+    parser.add_argument('--infinity', type=int, default=INFINITY, help="Custo que representa uma rede inalcançável.")
+    parser.add_argument('--max-time', type=float, default=3600, help="Tempo virtual máximo para a convergência.")
+    parser.add_argument('--fail', nargs=2, metavar=('A', 'B'), help="Após convergir, derruba o link entre os roteadores A e B.")
+    parser.add_argument('--show', action='append', default=[], metavar='NOME', help="Mostra a tabela final deste roteador.")
+    parser.add_argument('--seed', type=int, help="Semente do gerador aleatório.")
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default='WARNING', help="Nível de log dos roteadores.")
+    args = parser.parse_args()
+
+    setup_logging(args.log_level, max_per_second=0)
+
+    simulator = Simulator.from_topology(
+        args.topology,
+        delay=args.delay,
+        jitter=args.jitter,
+        loss=args.loss,
+        update_interval=args.interval,
+        triggered_delay=None if args.no_triggered else args.triggered_delay,
+        refresh_interval=args.refresh_interval,
+        binary=args.binary,
+        absorb_routes=args.absorb,
+        split_horizon=None if args.split_horizon == 'off' else args.split_horizon,
+        infinity=args.infinity,
+        seed=args.seed
+    )
+
+    def report(title, start, converged_at, wall):
+        if converged_at is None:
+            print(f"{title}: não convergiu em {args.max_time:g}s de tempo virtual")
+        else:
+            print(f"{title}: convergiu em {max(0.0, converged_at - start):.3f}s virtuais "
+                  f"({wall:.2f}s reais)")
+        print(f"  mensagens: {simulator.stats['messages']}, bytes: {simulator.stats['bytes']}, "
+              f"perdidas: {simulator.stats['dropped']}, eventos: {simulator.stats['events']}")
+        mismatches = simulator.verify()
+        print(f"  divergências em relação aos caminhos mínimos: {len(mismatches)}")
+        for name, network, expected, got in mismatches[:10]:
+            print(f"    {name} -> {network}: esperado {expected}, obtido {got}")
+
+    unknown = [name for name in (args.fail or []) + args.show if name not in simulator.names.values()]
+    if unknown:
+        parser.error(f"roteador(es) desconhecido(s): {', '.join(unknown)}")
+
+    print(f"{len(simulator.routers)} roteador(es) carregado(s) de {args.topology}")
+    started = time.perf_counter()
+    report("Inicialização", 0.0, simulator.run_until_converged(max_time=args.max_time),
+           time.perf_counter() - started)
+
+    if args.fail:
+        address_a = simulator.router(args.fail[0]).my_address
+        address_b = simulator.router(args.fail[1]).my_address
+        failed_at = simulator.clock.now
+        simulator.fail_link(address_a, address_b)
+        simulator.last_change = failed_at
+        # A falha só é percebida quando as rotas expiram (route_timeout)
+        quiet = 2 * simulator.routers[address_a].refresh_interval + simulator.routers[address_a].route_timeout
+        started = time.perf_counter()
+        report(f"Falha {args.fail[0]}-{args.fail[1]}", failed_at,
+               simulator.run_until_converged(quiet=quiet, max_time=args.max_time),
+               time.perf_counter() - started)
+
+    for name in args.show:
+        router = simulator.router(name)
+        print(f"\nTabela de {name} ({router.my_address}):")
+        for network, route_info in sorted(router.routing_table.copy().items()):
+            print(f"  {network:<22} custo {route_info['cost']:<3} via {route_info['next_hop']}")
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import math
+
+from roteador import INFINITY, RouteDamping, Router
+
+SENDER = '127.0.0.1:5001'
+REDE = '10.0.9.0/24'
+
+
+class Relogio:
+    """Relógio controlado pelo teste (o roteador chama clock() para o horário)."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def close(a, b):
+    return math.isclose(a, b, abs_tol=0.05)
+
+
+def test_penalties():
+    """Testa penalidade, decaimento, supressão, liberação e descarte do RouteDamping"""
+
+    print("=== Teste das Penalidades de Oscilação ===")
+
+    damping = RouteDamping(half_life=10)
+    checks = []
+    # Retirada + reanúncio no mesmo instante: 1500, abaixo do limite de supressão
+    checks.append((not damping.penalize(REDE, damping.withdraw_penalty, 0.0), "1ª retirada não suprime"))
+    checks.append((not damping.penalize(REDE, damping.readvertise_penalty, 0.0), "reanúncio não suprime"))
+    version = damping.version
+    # Segunda retirada: 2500, passa de suppress_limit (2000)
+    checks.append((damping.penalize(REDE, damping.withdraw_penalty, 0.0), "2ª retirada suprime"))
+    checks.append((REDE in damping.suppressed and damping.version == version + 1, "rede suprimida e versão nova"))
+    # Outra penalidade com a rede já suprimida não a suprime de novo
+    checks.append((not damping.penalize(REDE, 0, 0.0) and damping.version == version + 1, "supressão só uma vez"))
+
+    # Uma meia-vida depois, metade da penalidade
+    status = damping.status(10.0)[REDE]
+    reuse_in = 10 * math.log2(1250 / damping.reuse_limit)
+    checks.append((close(status['penalty'], 1250) and status['suppressed'], f"decaimento: {status}"))
+    checks.append((close(status['reuse_in'], reuse_in), f"tempo até a liberação: {status['reuse_in']}"))
+
+    # Liberação quando a penalidade cai abaixo de reuse_limit (750), em 10 + reuse_in s
+    checks.append((damping.release(10 + reuse_in - 0.1) == [] and REDE in damping.suppressed, "ainda suprimida"))
+    version = damping.version
+    released = damping.release(10 + reuse_in + 0.1)
+    checks.append((released == [REDE] and not damping.suppressed and damping.version == version + 1, "liberada"))
+    checks.append((damping.known(REDE), "penalidade mantida depois da liberação"))
+
+    # O registro é descartado abaixo de metade de reuse_limit (375): 2500 -> 375 em 10*log2(2500/375) s
+    forget_at = 10 * math.log2(2500 / (damping.reuse_limit / 2))
+    damping.release(forget_at - 0.1)
+    checks.append((damping.known(REDE), "registro mantido acima de reuse_limit/2"))
+    damping.release(forget_at + 0.1)
+    checks.append((not damping.known(REDE) and damping.status(forget_at) == {}, "registro descartado"))
+
+    # Teto da penalidade: nenhuma rede fica suprimida mais que max_suppress depois da última oscilação
+    damping = RouteDamping(half_life=10, max_suppress=40)
+    for _ in range(50):
+        damping.penalize(REDE, damping.withdraw_penalty, 100.0)
+    checks.append((close(damping.status(100.0)[REDE]['penalty'], damping.max_penalty), "penalidade no teto"))
+    checks.append((damping.release(139.9) == [] and damping.release(140.1) == [REDE], "supressão limitada a max_suppress"))
+
+    ok = True
+    for passed, name in checks:
+        if not passed:
+            print(f"❌ {name}")
+            ok = False
+    if ok:
+        print(f"✅ {len(checks)} verificações das penalidades")
+    return ok
+
+
+def test_router_damping():
+    """Testa o amortecimento no roteador: a rede que oscila sai do anúncio e volta depois de decair"""
+
+    print("=== Teste do Amortecimento no Roteador ===")
+
+    clock = Relogio()
+    # Intervalo longo: as rotas não expiram durante o teste
+    router = Router('127.0.0.1:5000', {SENDER: 1}, '10.0.0.0/24', update_interval=100,
+                    clock=clock, start_threads=False, triggered_delay=None, damping={'half_life': 10})
+
+    def announce(cost):
+        router.apply_update(SENDER, {REDE: {'cost': cost, 'next_hop': SENDER}})
+
+    def penalty():
+        return router.damping_status().get(REDE, {}).get('penalty', 0)
+
+    ok = True
+    announce(1)
+    # Mudança de custo de uma rota alcançável não é oscilação
+    clock.now = 0.5
+    announce(3)
+    if penalty() != 0:
+        print(f"❌ primeiro anúncio ou mudança de custo penalizados: {penalty()}")
+        ok = False
+
+    # Retirada (custo infinito), reanúncio e nova retirada: passa de suppress_limit
+    for now, cost in ((1.0, INFINITY), (2.0, 1), (3.0, INFINITY), (4.0, 1)):
+        clock.now = now
+        announce(cost)
+    status = router.damping_status()[REDE]
+    if not status['suppressed'] or router.routing_table[REDE]['cost'] != 2:
+        print(f"❌ rede não suprimida ou fora da tabela: {status}")
+        ok = False
+    if REDE in router._get_advertisement() or '10.0.0.0/24' not in router._get_advertisement():
+        print(f"❌ anúncio com a rede suprimida (ou sem a rede local): {router._get_advertisement()}")
+        ok = False
+
+    # A rota continua na tabela e volta ao anúncio quando a penalidade cai abaixo de reuse_limit
+    clock.now = 4.0 + status['reuse_in'] - 0.5
+    if REDE in router._get_advertisement():
+        print("❌ rede liberada antes do prazo")
+        ok = False
+    clock.now = 4.0 + status['reuse_in'] + 0.5
+    advertisement = router._get_advertisement()
+    if advertisement.get(REDE) != {'cost': 2, 'next_hop': SENDER}:
+        print(f"❌ rede não voltou ao anúncio: {advertisement.get(REDE)}")
+        ok = False
+    if '10.0.0.0/24' in router.damping_status():
+        print("❌ rede local penalizada")
+        ok = False
+
+    if ok:
+        print("✅ Rede suprimida depois das oscilações e liberada no prazo")
+    return ok
+
+
+if __name__ == '__main__':
+    test_penalties()
+    test_router_damping()
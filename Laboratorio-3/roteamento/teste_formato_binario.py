@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import struct
+import zlib
+
+import roteador
+from roteador import (BINARY_CONTENT_TYPE, Router, RouteBatch, UpdateTooLarge,
+                      decode_binary_update, encode_binary_update)
+
+SENDER = '127.0.0.1:5001'
+
+
+def decode(payload, max_routes=None):
+    """Decodifica e materializa as rotas em {rede: (custo, next_hop)}."""
+    sender_address, routes = decode_binary_update(payload, max_routes)
+    return sender_address, {network: (cost, next_hop) for network, cost, next_hop in routes}
+
+
+def test_round_trip():
+    """Testa a codificação e decodificação de tabelas pequenas e grandes"""
+
+    print("=== Teste de Ida e Volta do Formato Binário ===")
+
+    table = {
+        '10.0.1.0/24': {'cost': 0, 'next_hop': '10.0.1.0/24'},
+        '10.0.2.0/23': {'cost': 3, 'next_hop': '127.0.0.1:5002'},
+        '0.0.0.0/0': {'cost': 7, 'next_hop': '127.0.0.1:5003'},
+        '192.168.1.1/32': {'cost': 15, 'next_hop': '127.0.0.1:5002'},
+        '127.0.0.1:5002': {'cost': 1, 'next_hop': '127.0.0.1:5002'},
+        # Fora da forma canônica: chega com a mesma chave, como no JSON
+        '10.0.0.5/24': {'cost': 2, 'next_hop': '127.0.0.1:5002'},
+        'rede-sem-formato': {'cost': 4, 'next_hop': '127.0.0.1:5003'},
+    }
+    sender_address, routes = decode(encode_binary_update(SENDER, table))
+    expected = {network: (info['cost'], info['next_hop']) for network, info in table.items()}
+    if sender_address != SENDER or routes != expected:
+        print(f"❌ Tabela pequena: {routes}")
+        return False
+    print("✅ Tabela pequena (redes, endereços e chaves não canônicas)")
+
+    # Acima de BATCH_MIN_ROUTES rotas, com NumPy, vem um RouteBatch; acima do
+    # limiar, o corpo vai comprimido
+    table = {
+        f"10.{i >> 8 & 255}.{i & 255}.0/24": {'cost': i % 16, 'next_hop': f"127.0.0.1:{5002 + i % 3}"}
+        for i in range(5000)
+    }
+    payload = encode_binary_update(SENDER, table)
+    if not payload[3] & roteador.BINARY_FLAG_ZLIB:
+        print("❌ Corpo grande não foi comprimido")
+        return False
+    sender_address, routes = decode_binary_update(payload)
+    if roteador.np is not None and not isinstance(routes, RouteBatch):
+        print("❌ Tabela grande não foi decodificada em lote")
+        return False
+    routes = {network: (cost, next_hop) for network, cost, next_hop in routes}
+    if routes != {network: (info['cost'], info['next_hop']) for network, info in table.items()}:
+        print("❌ Tabela grande")
+        return False
+    print("✅ Tabela grande (comprimida e decodificada em lote)")
+    return True
+
+
+def test_encode_limits():
+    """Testa os limites do formato: custos fora de uint16 e tabela de strings"""
+
+    print("=== Teste dos Limites do Formato Binário ===")
+
+    table = {
+        '10.0.1.0/24': {'cost': -49, 'next_hop': SENDER},
+        '10.0.2.0/24': {'cost': 70000, 'next_hop': SENDER},
+    }
+    _, routes = decode(encode_binary_update(SENDER, table))
+    if routes != {'10.0.1.0/24': (0, SENDER), '10.0.2.0/24': (0xFFFF, SENDER)}:
+        print(f"❌ Custos não limitados a 0-65535: {routes}")
+        return False
+    print("✅ Custos limitados a 0-65535")
+
+    too_many = {f"chave-{i}": {'cost': 1, 'next_hop': SENDER} for i in range(0xFFFF)}
+    too_long = {'10.0.1.0/24': {'cost': 1, 'next_hop': 'x' * 0x10000}}
+    for name, table in (('strings demais', too_many), ('string longa demais', too_long)):
+        try:
+            encode_binary_update(SENDER, table)
+        except ValueError:
+            print(f"✅ {name}: ValueError")
+        else:
+            print(f"❌ {name}: codificado sem erro")
+            return False
+    return True
+
+
+def test_malformed():
+    """Testa mensagens binárias malformadas: todas devem virar ValueError"""
+
+    print("=== Teste de Mensagens Binárias Malformadas ===")
+
+    valid = encode_binary_update(SENDER, {'10.0.1.0/24': {'cost': 1, 'next_hop': SENDER}})
+    header = struct.Struct('!2sBBHI')
+    body = b'\x00\x01a'
+    cases = {
+        'vazia': b'',
+        'cabeçalho cortado': valid[:5],
+        'assinatura errada': b'XX' + valid[2:],
+        'versão desconhecida': valid[:2] + b'\x02' + valid[3:],
+        'sem strings': header.pack(b'DV', 1, 0, 0, 0),
+        'rota cortada': valid[:-1],
+        'bytes sobrando': valid + b'\x00',
+        'zlib inválido': header.pack(b'DV', 1, roteador.BINARY_FLAG_ZLIB, 1, 0) + b'nao e zlib',
+        'string cortada': header.pack(b'DV', 1, 0, 2, 0) + body,
+        'UTF-8 inválido': header.pack(b'DV', 1, 0, 1, 0) + b'\x00\x01\xff',
+        'next_hop fora da tabela': header.pack(b'DV', 1, 0, 1, 1) + body + struct.pack('!IBHH', 0, 8, 1, 9),
+        'chave fora da tabela': header.pack(b'DV', 1, 0, 1, 1) + body + struct.pack('!IBHH', 7, 0xFF, 1, 0),
+    }
+    # O mesmo índice inválido em um lote grande (RouteBatch) e comprimido
+    records = struct.pack('!IBHH', 0, 8, 1, 0) * 299 + struct.pack('!IBHH', 0, 8, 1, 9)
+    cases['índice inválido em lote'] = (header.pack(b'DV', 1, roteador.BINARY_FLAG_ZLIB, 1, 300)
+                                        + zlib.compress(body + records))
+
+    ok = True
+    for name, payload in cases.items():
+        try:
+            # Índices inválidos só aparecem ao consumir o iterador (IndexError)
+            decode(payload)
+        except (ValueError, IndexError):
+            continue
+        print(f"❌ {name}: aceita")
+        ok = False
+
+    try:
+        decode(valid, max_routes=0)
+    except UpdateTooLarge:
+        pass
+    else:
+        print("❌ max_routes: aceita")
+        ok = False
+
+    if ok:
+        print(f"✅ {len(cases) + 1} mensagens malformadas recusadas")
+    return ok
+
+
+def test_receive_invalid_costs():
+    """Testa /receive_update com custos negativos ou não inteiros: 400, tabela intacta"""
+
+    print("=== Teste de Custos Inválidos em /receive_update ===")
+
+    router = Router('127.0.0.1:5000', {SENDER: 1}, '10.0.0.0/24', start_threads=False)
+    roteador.router_instance = router
+    client = roteador.app.test_client()
+
+    ok = True
+    for cost in (-50, 1.5, '3', True, None):
+        response = client.post('/receive_update', json={
+            'sender_address': SENDER,
+            'routing_table': {'10.0.9.0/24': {'cost': cost, 'next_hop': '127.0.0.1:5009'}},
+        })
+        if response.status_code != 400 or '10.0.9.0/24' in router.routing_table:
+            print(f"❌ custo {cost!r}: status {response.status_code}")
+            ok = False
+
+    # Mesmo caso no caminho de streaming (corpo acima de STREAMING_MIN_BYTES)
+    body = (b'{"sender_address": "127.0.0.1:5001",' + b' ' * roteador.STREAMING_MIN_BYTES
+            + b'"routing_table": {"10.0.9.0/24": {"cost": -50, "next_hop": "127.0.0.1:5009"}}}')
+    response = client.post('/receive_update', data=body, content_type='application/json')
+    if response.status_code != 400 or '10.0.9.0/24' in router.routing_table:
+        print(f"❌ streaming: status {response.status_code}")
+        ok = False
+
+    # Depois das recusas, o anúncio binário continua sendo montado
+    response = client.post('/receive_update', json={
+        'sender_address': SENDER,
+        'routing_table': {'10.0.9.0/24': {'cost': 2, 'next_hop': '127.0.0.1:5009'}},
+    })
+    payload = encode_binary_update(router.my_address, router._get_advertisement())
+    _, routes = decode(payload)
+    if response.status_code != 200 or routes.get('10.0.9.0/24') != (3, SENDER):
+        print(f"❌ rota válida: status {response.status_code}, anúncio {routes}")
+        ok = False
+
+    response = client.post('/receive_update', data=b'DV', content_type=BINARY_CONTENT_TYPE)
+    if response.status_code != 400:
+        print(f"❌ binário malformado: status {response.status_code}")
+        ok = False
+
+    if ok:
+        print("✅ Custos inválidos recusados com 400")
+    return ok
+
+
+if __name__ == '__main__':
+    test_round_trip()
+    test_encode_limits()
+    test_malformed()
+    test_receive_invalid_costs()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import io
+import json
+
+from roteador import JsonUpdateStream, UpdateTooLarge
+
+SENDER = '127.0.0.1:5001'
+
+# Corpos no formato que os roteadores enviam e em formatos que caem no caminho
+# geral: chaves em outra ordem, escapes, espaços, caracteres de vários bytes em
+# UTF-8, campos desconhecidos e routing_table antes do sender_address
+CORPOS = {
+    'formato dos roteadores': json.dumps({
+        'sender_address': SENDER,
+        'routing_table': {f'10.0.{i}.0/24': {'cost': i * 7, 'next_hop': f'127.0.0.1:{5000 + i}'} for i in range(40)},
+    }),
+    'formato livre': (
+        '{\n  "versao": [1, {"a": null}, "x\\"y"],\n  "sender_address" : "127.0.0.1:5001",\n'
+        '  "routing_table": {\n'
+        '    "10.0.1.0/24": {"next_hop": "127.0.0.1:5002", "cost": 12},\n'
+        '    "10.0.2.0/24" :{ "cost" :3 , "next_hop":"127.0.0.1:50\\u00303" }  ,\n'
+        '    "rede-ção": {"cost": 1234567, "next_hop": "vizinho-é", "extra": true},\n'
+        '    "10.0.3.0/24": {"cost": 0, "next_hop": "127.0.0.1:5002"}\n'
+        '  },\n  "fim": -1.5e3\n}\n'
+    ),
+    'routing_table antes do remetente': json.dumps({
+        'routing_table': {f'192.168.{i}.0/24': {'cost': i, 'next_hop': SENDER} for i in range(10)},
+        'sender_address': SENDER,
+    }, indent=1),
+    'tabela vazia': '{"sender_address": "127.0.0.1:5001", "routing_table": {}}',
+}
+
+# Corpos inválidos: todos devem virar ValueError, qualquer que seja o pedaço
+INVALIDOS = {
+    'cortado': CORPOS['formato dos roteadores'][:-20],
+    'sem routing_table': '{"sender_address": "127.0.0.1:5001"}',
+    'sem sender_address': '{"routing_table": {}}',
+    'custo negativo': '{"sender_address": "a", "routing_table": {"10.0.0.0/24": {"cost": -1, "next_hop": "b"}}}',
+    'custo não inteiro': '{"sender_address": "a", "routing_table": {"10.0.0.0/24": {"cost": 1.5, "next_hop": "b"}}}',
+    'next_hop não string': '{"sender_address": "a", "routing_table": {"10.0.0.0/24": {"cost": 1, "next_hop": 5}}}',
+    'conteúdo após o objeto': '{"sender_address": "a", "routing_table": {}} {}',
+    'vírgula sobrando': '{"sender_address": "a", "routing_table": {"10.0.0.0/24": {"cost": 1, "next_hop": "b"},}}',
+}
+
+
+def read_all(body, chunk_size, batch_size=3, max_routes=None):
+    """Lê o corpo com JsonUpdateStream; retorna (remetente, lotes)."""
+    stream = JsonUpdateStream(io.BytesIO(body), max_routes=max_routes, chunk_size=chunk_size)
+    sender_address = stream.read_sender()
+    return sender_address, list(stream.batches(batch_size))
+
+
+def test_chunk_boundaries():
+    """Testa o stream com pedaços de todos os tamanhos: mesmas rotas que json.loads"""
+
+    print("=== Teste de Limites dos Pedaços do Stream JSON ===")
+
+    ok = True
+    for name, text in CORPOS.items():
+        body = text.encode('utf-8')
+        parsed = json.loads(text)
+        expected = [(network, info['cost'], info['next_hop']) for network, info in parsed['routing_table'].items()]
+        # Todos os tamanhos até 64 bytes (cortes em cada posição de strings,
+        # números e caracteres de vários bytes) e alguns maiores, até o corpo inteiro
+        sizes = list(range(1, 65)) + [100, 257, 1000, len(body), len(body) + 1]
+        for chunk_size in sizes:
+            sender_address, batches = read_all(body, chunk_size)
+            routes = [route for batch in batches for route in batch]
+            if sender_address != parsed['sender_address'] or routes != expected:
+                print(f"❌ {name}, pedaços de {chunk_size} bytes: {len(routes)} rota(s), esperado {len(expected)}")
+                ok = False
+                break
+            if any(not batch or len(batch) > 3 for batch in batches):
+                print(f"❌ {name}, pedaços de {chunk_size} bytes: lotes de {[len(batch) for batch in batches]}")
+                ok = False
+                break
+        else:
+            print(f"✅ {name}: {len(expected)} rota(s) iguais às de json.loads em {len(sizes)} tamanhos de pedaço")
+    return ok
+
+
+def test_invalid_bodies():
+    """Testa corpos inválidos e o limite de rotas com pedaços de vários tamanhos"""
+
+    print("=== Teste de Corpos JSON Inválidos no Stream ===")
+
+    ok = True
+    cases = {name: text.encode('utf-8') for name, text in INVALIDOS.items()}
+    # UTF-8 inválido no meio de uma chave
+    cases['UTF-8 inválido'] = b'{"sender_address": "a\xff", "routing_table": {}}'
+    for name, body in cases.items():
+        for chunk_size in (1, 2, 5, 64 * 1024):
+            try:
+                read_all(body, chunk_size)
+            except ValueError:
+                continue
+            print(f"❌ {name}, pedaços de {chunk_size} bytes: aceito")
+            ok = False
+            break
+
+    body = CORPOS['formato dos roteadores'].encode('utf-8')
+    for chunk_size in (1, 7, 64 * 1024):
+        try:
+            read_all(body, chunk_size, max_routes=39)
+        except UpdateTooLarge:
+            continue
+        print(f"❌ max_routes, pedaços de {chunk_size} bytes: aceito")
+        ok = False
+    _, batches = read_all(body, 7, max_routes=40)
+    if sum(len(batch) for batch in batches) != 40:
+        print("❌ max_routes igual ao número de rotas: recusado")
+        ok = False
+
+    if ok:
+        print(f"✅ {len(cases)} corpos inválidos recusados e limite de rotas respeitado")
+    return ok
+
+
+if __name__ == '__main__':
+    test_chunk_boundaries()
+    test_invalid_bodies()
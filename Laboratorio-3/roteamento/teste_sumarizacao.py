@@ -91,5 +91,56 @@ def test_summarization():
         process.wait()
         print("Roteador parado.")
 
+def test_overlapping_aggregation():
+    """Testa a fusão de blocos irmãos que coincidem com uma super-rede já existente"""
+
+    print("=== Teste de Agregação com Super-rede Existente ===")
+
+    from roteador import network_to_int, summarize_entries
+
+    def entries(routes):
+        return [(network, network_to_int(network), cost, next_hop) for network, cost, next_hop in routes]
+
+    # 10.0.0.0/24 + 10.0.1.0/24 formam 10.0.0.0/23, que já está na tabela com
+    # custo maior (ex: o próprio resumo devolvido pelo vizinho): o anúncio deve
+    # ser um só, com o custo das rotas fundidas
+    routes = entries([
+        ('10.0.0.0/23', 5, '127.0.0.1:5001'),
+        ('10.0.0.0/24', 1, '127.0.0.1:5001'),
+        ('10.0.1.0/24', 1, '127.0.0.1:5001'),
+    ])
+    summarized = summarize_entries(routes)
+    print(f"mesmo next_hop: {summarized}")
+    if summarized != {'10.0.0.0/23': {'cost': 1, 'next_hop': '127.0.0.1:5001'}}:
+        print("❌ Sumarização incorreta")
+        return False
+    print("✅ Super-rede anunciada uma vez, com o custo das rotas fundidas")
+
+    # O mesmo prefixo aprendido de outro vizinho não pode impor o seu custo ao agregado
+    routes = entries([
+        ('10.0.0.0/23', 6, '127.0.0.1:5002'),
+        ('10.0.0.0/24', 1, '127.0.0.1:5001'),
+        ('10.0.1.0/24', 2, '127.0.0.1:5001'),
+    ])
+    summarized = summarize_entries(routes)
+    print(f"outro next_hop: {summarized}")
+    if summarized != {'10.0.0.0/23': {'cost': 2, 'next_hop': '127.0.0.1:5001'}}:
+        print("❌ Sumarização incorreta")
+        return False
+    print("✅ Fica o agregado, que tem o menor custo")
+
+    # Com absorb, as sub-redes continuam absorvidas pela super-rede, com o maior custo
+    summarized = summarize_entries(entries([
+        ('10.0.0.0/22', 5, '127.0.0.1:5001'),
+        ('10.0.1.0/24', 1, '127.0.0.1:5001'),
+    ]), absorb=True)
+    print(f"absorb: {summarized}")
+    if summarized != {'10.0.0.0/22': {'cost': 5, 'next_hop': '127.0.0.1:5001'}}:
+        print("❌ Sumarização incorreta")
+        return False
+    print("✅ Sub-rede absorvida pela super-rede")
+    return True
+
 if __name__ == '__main__':
+    test_overlapping_aggregation()
     test_summarization()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import random
+
+from roteador import Router, RoutingTable, ip_to_int, network_to_int, prefix_text
+
+SENDER = '127.0.0.1:5001'
+HOPS = ['127.0.0.1:5001', '127.0.0.1:5002', '127.0.0.1:5003']
+
+
+class Relogio:
+    """Relógio controlado pelo teste (o roteador chama clock() para o horário)."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def random_table(rng, size):
+    """Tabela aleatória {rede: (custo, next_hop)} com prefixos de vários tamanhos e chaves 'ip:porta'."""
+    table = {}
+    while len(table) < size:
+        length = rng.choice((8, 16, 20, 23, 24, 24, 24, 28, 32))
+        address = rng.choice((10 << 24, 172 << 24 | 16 << 16, 192 << 24 | 168 << 16)) | rng.getrandbits(16)
+        network = prefix_text(address >> (32 - length) << (32 - length), length)
+        table[network] = (rng.randrange(16), rng.choice(HOPS))
+    for port in (5001, 5002):
+        table[f'127.0.0.1:{port}'] = (1, f'127.0.0.1:{port}')
+    return table
+
+
+def order_key(network):
+    """Ordem esperada de select: redes por (endereço, prefixo), depois as outras chaves."""
+    parsed = network_to_int(network)
+    return (1, 0, 0, network) if parsed is None else (0, parsed.network, parsed.length, '')
+
+
+def test_dict_view():
+    """Testa a RoutingTable como dicionário, com as redes normalizadas"""
+
+    print("=== Teste da Tabela como Dicionário ===")
+
+    table = RoutingTable()
+    table['10.0.1.0/24'] = {'cost': 2, 'next_hop': SENDER, 'timestamp': 5.0}
+    table.set_route('127.0.0.1:5002', 1, '127.0.0.1:5002', 6.0)
+    # Bits de host ligados: mesma rota que 10.0.1.0/24
+    table.set_route('10.0.1.7/24', 3, SENDER, 7.0)
+
+    checks = [
+        (len(table) == 2, "duas rotas"),
+        (table['10.0.1.0/24'] == {'cost': 3, 'next_hop': SENDER, 'timestamp': 7.0}, "rota normalizada"),
+        ('10.0.1.99/24' in table and '10.0.1.0/25' not in table, "busca pela forma canônica"),
+        (sorted(table) == ['10.0.1.0/24', '127.0.0.1:5002'], "iteração com as chaves canônicas"),
+        (table.get_entry('127.0.0.1:5002') == (1, '127.0.0.1:5002'), "get_entry de chave 'ip:porta'"),
+        (table.copy() == dict(table.items()), "copy igual aos itens"),
+    ]
+    version = table.version
+    del table['10.0.1.0/24']
+    checks.append((len(table) == 1 and table.version > version and table.get('10.0.1.0/24') is None, "remoção"))
+    # A entrada liberada é reaproveitada sem herdar os dados antigos
+    table.set_route('10.0.9.0/24', 4, '127.0.0.1:5003', 8.0)
+    checks.append((table['10.0.9.0/24'] == {'cost': 4, 'next_hop': '127.0.0.1:5003', 'timestamp': 8.0},
+                   "entrada reaproveitada"))
+
+    ok = True
+    for passed, name in checks:
+        if not passed:
+            print(f"❌ {name}")
+            ok = False
+    if ok:
+        print(f"✅ {len(checks)} verificações do dicionário")
+    return ok
+
+
+def test_select():
+    """Testa select (filtros e paginação) contra a filtragem direta da tabela"""
+
+    print("=== Teste de select ===")
+
+    rng = random.Random(3)
+    routes = random_table(rng, 600)
+    table = RoutingTable()
+    for network, (cost, next_hop) in routes.items():
+        table.set_route(network, cost, next_hop, 0.0)
+    ordered = sorted(routes, key=order_key)
+
+    cases = [(None, None), (None, HOPS[1]), ((10 << 24, 8), None), ((10 << 24 | 1 << 8, 24), None),
+             ((172 << 24 | 16 << 16, 12), HOPS[0]), ((0, 0), None)]
+    for within, next_hop in cases:
+        within_prefix = None if within is None else network_to_int(prefix_text(*within))
+        expected = [
+            network for network in ordered
+            if (next_hop is None or routes[network][1] == next_hop)
+            and (within is None or (network_to_int(network) is not None
+                                    and within_prefix.contains(network_to_int(network))))
+        ]
+
+        page, cursor = table.select(within=within, next_hop=next_hop)
+        full = [network for network, _ in page]
+        # Em páginas de 7, continuando do cursor da página anterior
+        paged, cursor = [], None
+        while True:
+            page, cursor = table.select(within=within, next_hop=next_hop, after=cursor, limit=7)
+            paged.extend(network for network, _ in page)
+            if cursor is None:
+                break
+        if full != expected or paged != expected:
+            print(f"❌ within={within}, next_hop={next_hop}: {len(full)}/{len(paged)} rotas, esperado {len(expected)}")
+            return False
+        if any(table[network]['cost'] != routes[network][0] for network in full):
+            print(f"❌ within={within}, next_hop={next_hop}: custo diferente")
+            return False
+
+    # Cursor de uma rota que foi removida: continua da posição dela na ordem
+    removed = ordered[100]
+    del table[removed]
+    page, _ = table.select(after=removed, limit=3)
+    if [network for network, _ in page] != ordered[101:104]:
+        print(f"❌ cursor removido: {page}")
+        return False
+    print(f"✅ select igual à filtragem direta em {len(cases)} filtros, com e sem paginação")
+    return True
+
+
+def test_lookup():
+    """Testa a busca do maior prefixo contra a busca linear"""
+
+    print("=== Teste de lookup ===")
+
+    rng = random.Random(4)
+    routes = random_table(rng, 400)
+    table = RoutingTable()
+    for network, (cost, next_hop) in routes.items():
+        table.set_route(network, cost, next_hop, 0.0)
+    prefixes = [(network, network_to_int(network)) for network in routes if network_to_int(network)]
+
+    def linear(ip_int, usable):
+        best = None
+        for network, parsed in prefixes:
+            contains = (ip_int ^ parsed.network) >> (32 - parsed.length) == 0
+            if contains and usable(routes[network][0]) and (best is None or parsed.length > best[1].length):
+                best = (network, parsed)
+        return None if best is None else best[0]
+
+    for usable in (lambda cost: True, lambda cost: cost < 8):
+        for _ in range(2000):
+            # Endereços dentro das redes da tabela e fora delas
+            if rng.random() < 0.8:
+                ip_int = rng.choice(prefixes)[1].network | rng.getrandbits(8)
+            else:
+                ip_int = rng.getrandbits(32)
+            match = table.lookup(ip_int, usable=lambda route: usable(route['cost']))
+            expected = linear(ip_int, usable)
+            if (match[0] if match else None) != expected:
+                print(f"❌ {ip_int:#x}: {match}, esperado {expected}")
+                return False
+
+    # As chaves 'ip:porta' não entram na busca
+    table = RoutingTable()
+    table.set_route('127.0.0.1:5001', 1, SENDER, 0.0)
+    if table.lookup(ip_to_int('127.0.0.1')) is not None:
+        print("❌ chave 'ip:porta' encontrada por lookup")
+        return False
+    print("✅ lookup igual à busca linear (com e sem filtro de rotas usáveis)")
+    return True
+
+
+def test_expiry():
+    """Testa os prazos de expiração: envenenamento, hold-down, renovação e compactação do heap"""
+
+    print("=== Teste de Expiração de Rotas ===")
+
+    clock = Relogio()
+    router = Router('127.0.0.1:5000', {SENDER: 1}, '10.0.0.0/24', update_interval=1,
+                    clock=clock, start_threads=False, triggered_delay=None)
+    table = router.routing_table
+    # 200 rotas chegam em lote (RouteBatch); as renovações de 100, rota a rota
+    networks = [f'10.1.{i}.0/24' for i in range(200)]
+    router.apply_update(SENDER, {network: {'cost': 1, 'next_hop': SENDER} for network in networks})
+
+    # Metade é renovada no meio do prazo
+    clock.now = router.route_timeout / 2
+    router.apply_update(SENDER, {network: {'cost': 1, 'next_hop': SENDER} for network in networks[:100]})
+
+    ok = True
+    clock.now = router.route_timeout
+    router.expire_routes()
+    poisoned = [network for network in networks if table[network]['cost'] >= router.infinity]
+    if poisoned != networks[100:]:
+        print(f"❌ envenenadas no primeiro prazo: {len(poisoned)}, esperado 100")
+        ok = False
+    if table['10.0.0.0/24']['cost'] != 0:
+        print("❌ rede local expirou")
+        ok = False
+
+    # A metade válida continua sendo anunciada durante o hold-down da outra
+    clock.now = router.route_timeout + 1
+    router.apply_update(SENDER, {network: {'cost': 1, 'next_hop': SENDER} for network in networks[:100]})
+    clock.now = router.route_timeout + router.gc_timeout
+    router.expire_routes()
+    remaining = [network for network in networks if network in table]
+    if remaining != networks[:100] or any(table[network]['cost'] >= router.infinity for network in remaining):
+        print(f"❌ após o hold-down: {len(remaining)} rota(s), esperado 100 válidas")
+        ok = False
+    if router.next_expiry() is None or router.next_expiry() <= clock.now:
+        print(f"❌ próximo prazo: {router.next_expiry()}")
+        ok = False
+
+    # Renovações repetidas não acumulam entradas no heap
+    for _ in range(200):
+        clock.now += 0.1
+        router.apply_update(SENDER, {network: {'cost': 1, 'next_hop': SENDER} for network in networks[:100]})
+    if router._scheduled > 2 * len(table) + 64:
+        print(f"❌ heap com {router._scheduled} entradas para {len(table)} rotas")
+        ok = False
+    clock.now += router.route_timeout - 0.05
+    if router.expire_routes():
+        print("❌ rotas renovadas expiraram antes do prazo")
+        ok = False
+    clock.now += 0.1
+    router.expire_routes()
+    if any(table[network]['cost'] < router.infinity for network in networks[:100]):
+        print("❌ rotas renovadas não expiraram no prazo")
+        ok = False
+
+    if ok:
+        print("✅ Rotas envenenadas, removidas e renovadas nos prazos certos")
+    return ok
+
+
+if __name__ == '__main__':
+    test_dict_view()
+    test_select()
+    test_lookup()
+    test_expiry()